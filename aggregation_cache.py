@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+LRU Cache for Aggregation Results Shared Across Analysis Sections
+"""
+
+import threading
+from collections import OrderedDict
+
+class AggregationCache:
+    """
+    Thread-safe least-recently-used cache with hit/miss counters
+
+    Keys must be hashable; EcommerceAnalyzer uses (data version, group keys,
+    filters, column, function) so every aggregate series is cached on its
+    own and reused by any section that asks for it.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None (counted as a miss)"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries; the counters are kept"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Counters as a dict"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries),
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
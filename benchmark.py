@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Reproducible Benchmarks of the E-Commerce Pipelines Across Scale Factors
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import platform
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import config
+import instrumentation
+from data_preprocessing import DataPreprocessor
+from ecommerce_data_analysis import ANALYSIS_STAGES, EcommerceAnalyzer
+from setup_database import DEFAULT_CHUNK_SIZE, generate_sample_data
+
+# Scale factor 1 is the 15,000-order sample; 10, 100 and 1000 give 150k,
+# 1.5M and 15M orders (the last two take a long time and a lot of memory)
+DEFAULT_SCALE_FACTORS = [1, 10]
+
+SQLITE_QUERIES_FILE = 'ecommerce_analysis_queries_sqlite.sql'
+BASELINE_FILE = 'benchmark_baseline.json'
+BENCHMARK_DIR = 'benchmarks/'
+
+# A timing regresses when it is this much slower than the baseline...
+DEFAULT_THRESHOLD = 0.10
+# ...and at least this many seconds slower, so timer noise is not flagged
+DEFAULT_MIN_SECONDS = 0.01
+
+def load_queries(path=SQLITE_QUERIES_FILE):
+    """(name, sql) of every '-- QUERY n: title' block of a query file"""
+    with open(path) as f:
+        text = f.read()
+    queries = []
+    for match in re.finditer(r'^-- QUERY (\d+): (.+?)\n(.*?)(?=^-- QUERY |\Z)', text,
+                             re.MULTILINE | re.DOTALL):
+        number, title, sql = match.groups()
+        slug = re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_')
+        queries.append((f'query_{int(number):02d}_{slug}', sql.strip()))
+    return queries
+
+def environment():
+    """Versions and machine details stored with every result"""
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count()
+    }
+
+def measure(func, *args, repeat=1, **kwargs):
+    """
+    Time func(*args, **kwargs) repeat times, silencing its output
+
+    Returns the timing entry (best, median and every run, in seconds) and
+    the result of the last run.
+    """
+    runs = []
+    result = None
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            runs.append(time.perf_counter() - started)
+    timing = {'seconds': round(min(runs), 6), 'median_seconds': round(float(np.median(runs)), 6),
+              'runs': [round(run, 6) for run in runs]}
+    return timing, result
+
+def _report(name, timing):
+    print(f"   • {name}: {timing['seconds']:.3f}s")
+
+def _cold_start(analyzer):
+    """Drop everything an analyzer caches between sections"""
+    analyzer.invalidate()
+    analyzer.revenue_store = None
+    analyzer.pending_charts = []
+
+def benchmark_scale_factor(scale_factor, repeat=1, workers=1, execution_mode='pandas',
+                           seed=42, chunk_size=DEFAULT_CHUNK_SIZE, queries=None):
+    """
+    Benchmark every stage on a database generated at one scale factor
+
+    Timed, in pipeline order: generate_sample_data, export_clean_data,
+    loading the analyzer's fact table, each ANALYSIS_STAGES section (with
+    the aggregates of earlier sections cached, as in a real run, and
+    charts rendered headless) and each SQL query. The database is
+    generated once; the other steps are repeated and the best run kept.
+    """
+    db_path = f'ecommerce_sf{scale_factor:g}.db'
+    timings = {}
+    print(f"\n📏 Scale factor {scale_factor:g}")
+
+    timings['setup.generate_sample_data'], counts = measure(
+        generate_sample_data, scale_factor, chunk_size, seed, db_path, workers)
+    _report('setup.generate_sample_data', timings['setup.generate_sample_data'])
+
+    preprocessor = DataPreprocessor(db_path)
+    timings['preprocess.export_clean_data'], _ = measure(
+        preprocessor.export_clean_data, None, config.PROCESSED_FORMAT, workers, repeat=repeat)
+    preprocessor.close_connection()
+    _report('preprocess.export_clean_data', timings['preprocess.export_clean_data'])
+
+    with redirect_stdout(io.StringIO()):
+        analyzer = EcommerceAnalyzer(db_path, execution_mode, headless=True)
+    timings['analysis.load_fact_data'], _ = measure(analyzer.load_fact_data, full_refresh=True,
+                                                     repeat=repeat)
+    _report('analysis.load_fact_data', timings['analysis.load_fact_data'])
+
+    stage_runs = {name: [] for name, _, _ in ANALYSIS_STAGES}
+    for _ in range(repeat):
+        _cold_start(analyzer)
+        for name, method, _ in ANALYSIS_STAGES:
+            kwargs = {'workers': workers} if method == 'render_charts' else {}
+            timing, _ = measure(getattr(analyzer, method), **kwargs)
+            stage_runs[name].extend(timing['runs'])
+    for name, runs in stage_runs.items():
+        timings[f'analysis.{name}'] = {'seconds': round(min(runs), 6),
+                                       'median_seconds': round(float(np.median(runs)), 6),
+                                       'runs': runs}
+        _report(f'analysis.{name}', timings[f'analysis.{name}'])
+    with redirect_stdout(io.StringIO()):
+        analyzer.close_connection()
+
+    conn = sqlite3.connect(db_path)
+    for name, sql in (queries if queries is not None else load_queries()):
+        timings[f'sql.{name}'], _ = measure(lambda: conn.execute(sql).fetchall(), repeat=repeat)
+        _report(f'sql.{name}', timings[f'sql.{name}'])
+    conn.close()
+
+    return {'orders': counts['orders'], 'rows': sum(counts.values()), 'timings': timings}
+
+def run_benchmarks(scale_factors=DEFAULT_SCALE_FACTORS, output=BASELINE_FILE, repeat=3,
+                   workers=1, execution_mode='pandas', work_dir=BENCHMARK_DIR, instrument=False):
+    """
+    Benchmark each scale factor and write the results to output (JSON)
+
+    Databases, exports, CSV files and charts are written under work_dir.
+    With instrument=True the instrumentation summary of each scale factor
+    is stored next to its timings.
+    """
+    queries = load_queries(os.path.abspath(SQLITE_QUERIES_FILE))
+    output = os.path.abspath(output)
+    os.makedirs(work_dir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+
+    results = {'created_at': datetime.now().isoformat(timespec='seconds'),
+               'environment': environment(),
+               'settings': {'repeat': repeat, 'workers': workers,
+                            'execution_mode': execution_mode},
+               'scale_factors': {}}
+    try:
+        for scale_factor in scale_factors:
+            if instrument:
+                instrumentation.enable()
+            result = benchmark_scale_factor(scale_factor, repeat, workers, execution_mode,
+                                            queries=queries)
+            if instrument:
+                result['instrumentation'] = instrumentation.summary()
+                instrumentation.disable()
+            results['scale_factors'][f'{scale_factor:g}'] = result
+    finally:
+        os.chdir(cwd)
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Benchmark results written to {output}")
+    return results
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD,
+                    min_seconds=DEFAULT_MIN_SECONDS):
+    """
+    Compare the timings of two benchmark results
+
+    Returns one row per timing present in both, with its baseline and
+    current best seconds, the ratio and whether it regressed: slower by
+    more than threshold (a fraction) and by more than min_seconds.
+    """
+    rows = []
+    for scale_factor, base in baseline['scale_factors'].items():
+        if scale_factor not in current['scale_factors']:
+            continue
+        timings = current['scale_factors'][scale_factor]['timings']
+        for name, timing in base['timings'].items():
+            if name not in timings:
+                continue
+            before, after = timing['seconds'], timings[name]['seconds']
+            ratio = after / before if before else float('inf')
+            rows.append({'scale_factor': scale_factor, 'name': name, 'baseline': before,
+                         'current': after, 'ratio': ratio,
+                         'regression': after > before * (1 + threshold) and
+                                       after - before > min_seconds})
+    return rows
+
+def print_comparison(rows, threshold=DEFAULT_THRESHOLD):
+    """Print a comparison and return the number of regressions"""
+    regressions = [row for row in rows if row['regression']]
+    print(f"📊 Compared {len(rows)} timings (threshold {threshold:.0%})")
+    for row in rows:
+        status = "❌" if row['regression'] else ("🚀" if row['ratio'] < 1 - threshold else "  ")
+        print(f"   {status} SF {row['scale_factor']:>5} {row['name']:<60} "
+              f"{row['baseline']:9.3f}s -> {row['current']:9.3f}s ({row['ratio']:.2f}x)")
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {threshold:.0%}")
+    else:
+        print("\n✅ No regressions")
+    return len(regressions)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the e-commerce pipelines")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmarks and write a result file")
+    run_parser.add_argument('--scale-factors', type=float, nargs='+',
+                            default=DEFAULT_SCALE_FACTORS,
+                            help="dataset sizes relative to the 15,000-order sample")
+    run_parser.add_argument('--output', default=BASELINE_FILE)
+    run_parser.add_argument('--repeat', type=int, default=3,
+                            help="runs per timing; the best is compared")
+    run_parser.add_argument('--workers', type=int, default=1,
+                            help="processes for data generation, export and rendering")
+    run_parser.add_argument('--execution-mode', choices=['pandas', 'sql'], default='pandas')
+    run_parser.add_argument('--work-dir', default=BENCHMARK_DIR,
+                            help="directory for the generated databases and outputs")
+    run_parser.add_argument('--instrument', action='store_true',
+                            help="store per-method instrumentation with the timings")
+
+    compare_parser = commands.add_parser('compare', help="flag regressions against a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help="allowed slowdown as a fraction (0.10 = 10%%)")
+    compare_parser.add_argument('--min-seconds', type=float, default=DEFAULT_MIN_SECONDS,
+                                help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        print("⏱️ E-Commerce Pipeline Benchmarks")
+        print("=" * 40)
+        run_benchmarks(args.scale_factors, args.output, args.repeat, args.workers,
+                       args.execution_mode, args.work_dir, args.instrument)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare_results(baseline, current, args.threshold, args.min_seconds)
+        sys.exit(1 if print_comparison(rows, args.threshold) else 0)
@@ -9,6 +9,16 @@ ANALYSIS_START_DATE = '2017-01-01'
 ANALYSIS_END_DATE = '2018-12-31'
 MIN_ORDER_VALUE = 0.01
 MAX_ORDER_VALUE = 10000
+# Distinct-customer counts: 'exact' or 'approximate' (HyperLogLog sketches,
+# mergeable across months and shards, relative standard error about
+# 1.04 / sqrt(2**HLL_PRECISION), i.e. 1.6% at precision 12)
+DISTINCT_COUNTS = 'exact'
+HLL_PRECISION = 12
+
+# Ingestion Settings
+# Days before the purchase-timestamp watermark that an incremental load
+# re-reads, to pick up status and delivery updates on recent orders
+INCREMENTAL_LOOKBACK_DAYS = 30
 
 # Visualization Settings
 FIGURE_SIZE = (12, 8)
@@ -20,9 +30,16 @@ EXPORT_FORMAT = 'png'
 DATA_DIR = 'data/'
 RAW_DATA_DIR = 'data/raw/'
 PROCESSED_DATA_DIR = 'data/processed/'
+# 'parquet' (partitioned by order month, needs pyarrow) or 'csv'
+PROCESSED_FORMAT = 'parquet'
 RESULTS_DIR = 'results/'
 VISUALIZATIONS_DIR = 'visualizations/'
 
+# Instrumentation Settings
+# --instrument writes a JSON report of per-call wall time, CPU time, peak
+# RSS and rows processed
+RUN_REPORT_FILE = 'run_report.json'
+
 # Business Logic
 TOP_N_CATEGORIES = 10
 TOP_N_STATES = 15
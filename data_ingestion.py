@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Olist CSV Ingestion Pipeline for E-Commerce Analysis
+"""
+
+import os
+import sqlite3
+import argparse
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+import config
+from setup_database import (BulkLoader, LOAD_PRAGMAS, PRIMARY_KEYS, TABLE_NAMES,
+                            create_tables)
+
+# Rows read from a CSV file at a time; bounds peak memory per table
+DEFAULT_CHUNK_SIZE = 100_000
+
+# All Olist timestamps share this format
+OLIST_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+OLIST_FILES = {
+    'customers': 'olist_customers_dataset.csv',
+    'products': 'olist_products_dataset.csv',
+    'sellers': 'olist_sellers_dataset.csv',
+    'orders': 'olist_orders_dataset.csv',
+    'order_items': 'olist_order_items_dataset.csv',
+    'order_payments': 'olist_order_payments_dataset.csv',
+    'order_reviews': 'olist_order_reviews_dataset.csv'
+}
+
+# Explicit dtypes per source column. Nullable integer columns are read as
+# floats; SQLite's INTEGER affinity stores whole values back as integers.
+OLIST_DTYPES = {
+    'customers': {
+        'customer_id': str,
+        'customer_unique_id': str,
+        'customer_zip_code_prefix': 'int32',
+        'customer_city': str,
+        'customer_state': str
+    },
+    'products': {
+        'product_id': str,
+        'product_category_name': str,
+        'product_name_lenght': 'float32',
+        'product_description_lenght': 'float32',
+        'product_photos_qty': 'float32',
+        'product_weight_g': 'float32',
+        'product_length_cm': 'float32',
+        'product_height_cm': 'float32',
+        'product_width_cm': 'float32'
+    },
+    'sellers': {
+        'seller_id': str,
+        'seller_zip_code_prefix': 'int32',
+        'seller_city': str,
+        'seller_state': str
+    },
+    'orders': {
+        'order_id': str,
+        'customer_id': str,
+        'order_status': str
+    },
+    'order_items': {
+        'order_id': str,
+        'order_item_id': 'int16',
+        'product_id': str,
+        'seller_id': str,
+        'price': 'float64',
+        'freight_value': 'float64'
+    },
+    'order_payments': {
+        'order_id': str,
+        'payment_sequential': 'int16',
+        'payment_type': str,
+        'payment_installments': 'int16',
+        'payment_value': 'float64'
+    },
+    'order_reviews': {
+        'review_id': str,
+        'order_id': str,
+        'review_score': 'int8',
+        'review_comment_title': str,
+        'review_comment_message': str
+    }
+}
+
+# Timestamp columns, parsed once with OLIST_DATETIME_FORMAT
+OLIST_DATETIME_COLUMNS = {
+    'orders': ['order_purchase_timestamp', 'order_approved_at',
+               'order_delivered_carrier_date', 'order_delivered_customer_date',
+               'order_estimated_delivery_date'],
+    'order_items': ['shipping_limit_date'],
+    'order_reviews': ['review_creation_date', 'review_answer_timestamp']
+}
+
+# Olist column names that differ from the database schema
+OLIST_RENAMES = {
+    'products': {
+        'product_name_lenght': 'product_name_length',
+        'product_description_lenght': 'product_description_length'
+    }
+}
+
+# Bookkeeping for incremental loads: the purchase-timestamp watermark, one
+# row per ingestion run, and every row an incremental run inserted or updated
+METADATA_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS ingestion_watermarks (
+    table_name TEXT PRIMARY KEY,
+    column_name TEXT,
+    watermark DATETIME,
+    updated_at DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS ingestion_batches (
+    batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mode TEXT,
+    started_at DATETIME,
+    finished_at DATETIME,
+    previous_watermark DATETIME,
+    watermark DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS ingestion_changes (
+    batch_id INTEGER,
+    table_name TEXT,
+    row_key TEXT,
+    order_id TEXT,
+    change_type TEXT,
+    FOREIGN KEY (batch_id) REFERENCES ingestion_batches(batch_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_changes_batch ON ingestion_changes(batch_id);
+"""
+
+# Changing temp_store drops every temporary table, so staging leaves it alone
+STAGE_PRAGMAS = {pragma: value for pragma, value in LOAD_PRAGMAS.items()
+                 if pragma != 'temp_store'}
+
+# Order-level tables whose rows are selected by the staged order IDs
+ORDER_CHILD_TABLES = ['order_items', 'order_payments', 'order_reviews']
+
+def read_olist_chunks(table, csv_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream one Olist CSV as typed DataFrame chunks matching the schema"""
+    dtypes = OLIST_DTYPES[table]
+    datetime_cols = OLIST_DATETIME_COLUMNS.get(table, [])
+
+    reader = pd.read_csv(csv_path, dtype=dtypes, usecols=list(dtypes) + datetime_cols,
+                         chunksize=chunk_size)
+    for chunk in reader:
+        for col in datetime_cols:
+            chunk[col] = pd.to_datetime(chunk[col], format=OLIST_DATETIME_FORMAT,
+                                        errors='coerce')
+        yield chunk.rename(columns=OLIST_RENAMES.get(table, {}))
+
+def _create_staging_tables(conn):
+    """Create the schema's tables without secondary indexes; staging is only copied"""
+    create_tables(conn)
+    indexes = conn.execute("SELECT name FROM sqlite_master "
+                           "WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+    for (name,) in indexes:
+        conn.execute(f"DROP INDEX {name}")
+
+def _ingest_table(table, csv_path, staging_path, chunk_size):
+    """Load one CSV into its own staging database (runs in a worker process)"""
+    started = time.perf_counter()
+    conn = sqlite3.connect(staging_path, isolation_level=None)
+    _create_staging_tables(conn)
+
+    rows = 0
+    with BulkLoader(conn, [table], on_conflict='IGNORE', verbose=False) as loader:
+        for chunk in read_olist_chunks(table, csv_path, chunk_size):
+            rows += loader.load(table, chunk)
+
+    loaded = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return table, rows, loaded, time.perf_counter() - started
+
+def ingest_olist_data(raw_dir=config.RAW_DATA_DIR, db_path=config.DATABASE_PATH,
+                      chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """
+    Load the Olist CSVs from raw_dir into the analysis database
+
+    Each table is parsed in its own worker process into a staging database,
+    chunk_size rows at a time, so memory stays bounded whatever the file
+    sizes. The staging tables are then merged into db_path by this process,
+    with BulkLoader keeping the declared schema and rebuilding indexes once.
+    Rows whose primary key was already loaded are skipped.
+    """
+    print("📥 Ingesting Olist CSV files...")
+
+    sources = {}
+    for table in TABLE_NAMES:
+        csv_path = os.path.join(raw_dir, OLIST_FILES[table])
+        if os.path.exists(csv_path):
+            sources[table] = csv_path
+        else:
+            print(f"   • Skipping {table}: {csv_path} not found")
+
+    staging_dir = tempfile.mkdtemp(prefix='olist_staging_')
+    staging = {table: os.path.join(staging_dir, f'{table}.db') for table in sources}
+    counts = {}
+
+    try:
+        workers = workers or min(len(sources), os.cpu_count() or 1) or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_ingest_table, table, csv_path, staging[table], chunk_size)
+                       for table, csv_path in sources.items()]
+            for future in as_completed(futures):
+                table, rows, loaded, seconds = future.result()
+                counts[table] = loaded
+                print(f"   • Parsed {table}: {rows:,} rows in {seconds:.2f}s "
+                      f"({rows - loaded:,} duplicate keys skipped)")
+
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        create_tables(conn, reset=True)
+        for table, path in staging.items():
+            conn.execute("ATTACH DATABASE ? AS ?", (path, f'staging_{table}'))
+
+        with BulkLoader(conn, TABLE_NAMES, on_conflict='IGNORE') as loader:
+            for table in TABLE_NAMES:
+                if table in staging:
+                    loader.copy_table(table, f'staging_{table}')
+
+        for table in staging:
+            conn.execute(f"DETACH DATABASE staging_{table}")
+
+        # A full load resets the watermark; later incremental runs start from it
+        conn.executescript(METADATA_SCHEMA_SQL)
+        conn.execute("BEGIN")
+        batch_id = _start_batch(conn, 'full', None)
+        _finish_batch(conn, batch_id, _max_purchase_timestamp(conn))
+        conn.execute("COMMIT")
+        conn.close()
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    print("✅ Olist data ingested:")
+    for table, count in counts.items():
+        print(f"   • {count:,} {table.replace('_', ' ')}")
+
+    return counts
+
+def _max_purchase_timestamp(conn):
+    return conn.execute("SELECT MAX(order_purchase_timestamp) FROM orders").fetchone()[0]
+
+def get_watermark(conn):
+    """High-water mark on orders.order_purchase_timestamp, or None for an empty database
+
+    Falls back to the newest loaded order when no ingestion run has recorded
+    one yet, e.g. for databases built by setup_database.py.
+    """
+    conn.executescript(METADATA_SCHEMA_SQL)
+    row = conn.execute("SELECT watermark FROM ingestion_watermarks "
+                       "WHERE table_name = 'orders'").fetchone()
+    if row and row[0]:
+        return row[0]
+    return _max_purchase_timestamp(conn)
+
+def _start_batch(conn, mode, previous_watermark):
+    return conn.execute(
+        "INSERT INTO ingestion_batches (mode, started_at, previous_watermark) "
+        "VALUES (?, datetime('now'), ?)", (mode, previous_watermark)).lastrowid
+
+def _finish_batch(conn, batch_id, watermark):
+    conn.execute("UPDATE ingestion_batches SET finished_at = datetime('now'), watermark = ? "
+                 "WHERE batch_id = ?", (watermark, batch_id))
+    conn.execute(
+        "INSERT INTO ingestion_watermarks (table_name, column_name, watermark, updated_at) "
+        "VALUES ('orders', 'order_purchase_timestamp', ?, datetime('now')) "
+        "ON CONFLICT(table_name) DO UPDATE SET watermark = excluded.watermark, "
+        "updated_at = excluded.updated_at", (watermark,))
+
+def _stage_rows(conn, table, chunks):
+    """Load filtered CSV chunks into a temporary stage table shaped like the target
+
+    Rows repeating a primary key keep their first occurrence, matching the
+    INSERT OR IGNORE behaviour of a full load.
+    """
+    conn.execute(f"DROP TABLE IF EXISTS temp.stage_{table}")
+    conn.execute(f"CREATE TEMP TABLE stage_{table} AS SELECT * FROM main.{table} WHERE 0")
+    with BulkLoader(conn, [f'stage_{table}'], verbose=False, pragmas=STAGE_PRAGMAS) as loader:
+        for chunk in chunks:
+            if len(chunk):
+                loader.load(f'stage_{table}', chunk)
+
+    keys = ', '.join(PRIMARY_KEYS[table])
+    conn.execute(f"DELETE FROM temp.stage_{table} WHERE rowid NOT IN "
+                 f"(SELECT MIN(rowid) FROM temp.stage_{table} GROUP BY {keys})")
+
+def _upsert_stage(conn, table, batch_id):
+    """Record and apply the staged rows that are new or differ from the stored ones"""
+    keys = PRIMARY_KEYS[table]
+    columns = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+    values = [col for col in columns if col not in keys]
+    key_match = ' AND '.join(f"s.{key} = m.{key}" for key in keys)
+    differs = ' OR '.join(f"s.{col} IS NOT m.{col}" for col in values)
+    row_key = " || '|' || ".join(f"s.{key}" for key in keys)
+    order_id = 's.order_id' if 'order_id' in columns else 'NULL'
+
+    conn.execute(
+        f"INSERT INTO ingestion_changes (batch_id, table_name, row_key, order_id, change_type) "
+        f"SELECT ?, ?, {row_key}, {order_id}, "
+        f"CASE WHEN m.{keys[0]} IS NULL THEN 'insert' ELSE 'update' END "
+        f"FROM temp.stage_{table} s LEFT JOIN main.{table} m ON {key_match} "
+        f"WHERE m.{keys[0]} IS NULL OR {differs}", (batch_id, table))
+
+    conn.execute(
+        f"INSERT INTO main.{table} ({', '.join(columns)}) "
+        f"SELECT {', '.join(columns)} FROM temp.stage_{table} WHERE true "
+        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+        f"{', '.join(f'{col} = excluded.{col}' for col in values)} "
+        f"WHERE {' OR '.join(f'{col} IS NOT excluded.{col}' for col in values)}")
+    conn.execute(f"DROP TABLE temp.stage_{table}")
+
+    counts = dict(conn.execute(
+        "SELECT change_type, COUNT(*) FROM ingestion_changes "
+        "WHERE batch_id = ? AND table_name = ? GROUP BY change_type", (batch_id, table)))
+    return {'insert': counts.get('insert', 0), 'update': counts.get('update', 0)}
+
+def _filtered_chunks(table, csv_path, chunk_size, column, keep):
+    for chunk in read_olist_chunks(table, csv_path, chunk_size):
+        yield chunk[chunk[column].isin(keep)]
+
+def ingest_incremental(raw_dir=config.RAW_DATA_DIR, db_path=config.DATABASE_PATH,
+                       chunk_size=DEFAULT_CHUNK_SIZE,
+                       lookback_days=config.INCREMENTAL_LOOKBACK_DAYS):
+    """
+    Upsert only new or changed orders and their dependent rows
+
+    Orders purchased after (watermark - lookback_days) are staged from the
+    CSVs, together with their items, payments and reviews and the customers,
+    products and sellers they reference. Staged rows that are new or differ
+    from the stored ones are recorded in ingestion_changes under a new
+    batch_id and upserted; everything else is left untouched. The watermark
+    then advances to the newest purchase timestamp seen.
+
+    Returns the batch_id, the new watermark and insert/update counts per table.
+    """
+    print("📥 Incremental Olist ingestion...")
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    create_tables(conn)
+    previous_watermark = get_watermark(conn)
+    cutoff = (pd.Timestamp(previous_watermark) - pd.Timedelta(days=lookback_days)
+              if previous_watermark else None)
+    print(f"   • Watermark: {previous_watermark or 'none (first load)'}")
+
+    paths = {table: os.path.join(raw_dir, OLIST_FILES[table]) for table in TABLE_NAMES}
+    missing = [table for table, path in paths.items() if not os.path.exists(path)]
+    if 'orders' in missing:
+        conn.close()
+        raise FileNotFoundError(f"{paths['orders']} is required for an incremental load")
+
+    def recent_orders():
+        for chunk in read_olist_chunks('orders', paths['orders'], chunk_size):
+            if cutoff is not None:
+                chunk = chunk[chunk['order_purchase_timestamp'] > cutoff]
+            yield chunk
+
+    # Stage the window of orders first; every other table is selected by the
+    # IDs they reference. Stage tables are temporary, so nothing is visible
+    # in the database until the upserts below commit.
+    _stage_rows(conn, 'orders', recent_orders())
+    order_ids = {row[0] for row in conn.execute("SELECT order_id FROM temp.stage_orders")}
+    customer_ids = {row[0] for row in
+                    conn.execute("SELECT DISTINCT customer_id FROM temp.stage_orders")}
+    staged_watermark = conn.execute("SELECT MAX(order_purchase_timestamp) "
+                                    "FROM temp.stage_orders").fetchone()[0]
+
+    for table in ORDER_CHILD_TABLES:
+        if table not in missing:
+            _stage_rows(conn, table, _filtered_chunks(table, paths[table], chunk_size,
+                                                      'order_id', order_ids))
+
+    referenced = {'customers': ('customer_id', customer_ids)}
+    if 'order_items' not in missing:
+        for table, column in [('products', 'product_id'), ('sellers', 'seller_id')]:
+            referenced[table] = (column, {row[0] for row in conn.execute(
+                f"SELECT DISTINCT {column} FROM temp.stage_order_items")})
+    for table, (column, ids) in referenced.items():
+        if table not in missing:
+            _stage_rows(conn, table, _filtered_chunks(table, paths[table], chunk_size,
+                                                      column, ids))
+
+    staged = [table for table in TABLE_NAMES
+              if conn.execute("SELECT 1 FROM sqlite_temp_master WHERE name = ?",
+                              (f'stage_{table}',)).fetchone()]
+    watermark = max(filter(None, [previous_watermark, staged_watermark]), default=None)
+
+    changes = {}
+    conn.execute("BEGIN")
+    try:
+        batch_id = _start_batch(conn, 'incremental', previous_watermark)
+        for table in staged:
+            changes[table] = _upsert_stage(conn, table, batch_id)
+        _finish_batch(conn, batch_id, watermark)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        conn.close()
+        raise
+
+    conn.close()
+
+    print(f"✅ Batch {batch_id} applied (watermark {previous_watermark} → {watermark}):")
+    for table, counts in changes.items():
+        print(f"   • {table}: {counts['insert']:,} inserted, {counts['update']:,} updated")
+
+    return {'batch_id': batch_id, 'watermark': watermark, 'changes': changes}
+
+def changed_order_ids(conn, after_batch=0):
+    """Order IDs touched by incremental batches newer than after_batch"""
+    rows = conn.execute("SELECT DISTINCT order_id FROM ingestion_changes "
+                        "WHERE batch_id > ? AND order_id IS NOT NULL", (after_batch,))
+    return {row[0] for row in rows}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the Olist CSV files into the database")
+    parser.add_argument('--raw-dir', default=config.RAW_DATA_DIR)
+    parser.add_argument('--db-path', default=config.DATABASE_PATH)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="CSV rows parsed per chunk")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processes used to parse tables (default: one per table)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="upsert only orders newer than the stored watermark")
+    parser.add_argument('--lookback-days', type=int, default=config.INCREMENTAL_LOOKBACK_DAYS,
+                        help="days before the watermark re-read in incremental mode")
+    args = parser.parse_args()
+
+    print("🚀 Olist Data Ingestion")
+    print("=" * 40)
+
+    if args.incremental:
+        ingest_incremental(args.raw_dir, args.db_path, args.chunk_size, args.lookback_days)
+    else:
+        ingest_olist_data(args.raw_dir, args.db_path, args.chunk_size, args.workers)
+
+    print("\n✅ Ingestion complete!")
@@ -3,58 +3,324 @@
 Data Preprocessing Utilities for E-Commerce Analysis
 """
 
+import io
+import os
+import argparse
+import shutil
+import importlib.util
+import pathlib
+from contextlib import redirect_stdout
 import pandas as pd
 import numpy as np
 from datetime import datetime
 import sqlite3
 
+import config
+import instrumentation
+from data_profiler import TableProfile, write_report
+from setup_database import PRIMARY_KEYS
+from task_graph import TaskGraph
+
+# Tables exported by DataPreprocessor.export_clean_data()
+EXPORT_TABLES = ['customers', 'orders', 'order_items', 'products']
+
+# Cross-table checks on the exported data: (child table, column, parent
+# table). Each runs once both tables have been exported.
+REFERENCE_CHECKS = [
+    ('orders', 'customer_id', 'customers'),
+    ('order_items', 'order_id', 'orders'),
+    ('order_items', 'product_id', 'products')
+]
+
+# Columnar exports of these tables are partitioned by order month; order
+# items borrow the purchase date of their order for this
+PARTITIONED_TABLES = ['orders', 'order_items']
+PARTITION_COLUMNS = ['order_year', 'order_month']
+PARQUET_COMPRESSION = 'zstd'
+
+# Row-level cleaning rules, compiled into the WHERE clause of each export
+# query so rejected rows are never read into pandas. Each rule is
+# (description, predicate over table alias {a}, parameters).
+CLEANING_RULES = {
+    'orders': [
+        ('missing order_id', "{a}.order_id IS NOT NULL", ()),
+        ('missing customer_id', "{a}.customer_id IS NOT NULL", ()),
+        ('missing order_status', "{a}.order_status IS NOT NULL", ())
+    ],
+    'order_items': [
+        ('non-positive price', "{a}.price > 0", ()),
+        ('negative freight_value', "{a}.freight_value >= 0", ()),
+        ('item value outside MIN/MAX_ORDER_VALUE', "{a}.price + {a}.freight_value BETWEEN ? AND ?",
+         (config.MIN_ORDER_VALUE, config.MAX_ORDER_VALUE))
+    ]
+}
+
+# Of several valid rows sharing these columns only the first (lowest rowid)
+# is kept
+DEDUPLICATE_KEYS = {
+    'order_items': ['order_id', 'order_item_id']
+}
+
+# Data quality reports of an export, one entry per table
+QUALITY_REPORT_FILE = 'quality_report.json'
+
+def parquet_available():
+    """Whether pyarrow, needed for the Parquet output format, is installed"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+def processed_path(table, output_format, processed_dir=config.PROCESSED_DATA_DIR):
+    """Location of a cleaned table: a CSV file or a Parquet dataset directory"""
+    if output_format == 'parquet':
+        return os.path.join(processed_dir, f'{table}_clean')
+    return os.path.join(processed_dir, f'{table}_clean.csv')
+
+class _CsvWriter:
+    """Write DataFrame chunks to one CSV file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.first = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode='w' if self.first else 'a', header=self.first, index=False)
+        self.first = False
+
+class _ParquetWriter:
+    """
+    Write DataFrame chunks to a Parquet dataset directory
+
+    Partitioned tables are laid out as order_year=YYYY/order_month=M/
+    subdirectories. The schema of the first chunk is kept for every later
+    chunk so all files in the dataset agree on column types.
+    """
+
+    def __init__(self, path, partition_cols=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.partition_cols = partition_cols
+        self.schema = None
+        self.part = 0
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+    def write(self, df):
+        if self.partition_cols:
+            df = df.astype({col: 'Int32' for col in self.partition_cols})
+
+        if self.schema is None:
+            table = self.pa.Table.from_pandas(df, preserve_index=False)
+            # An all-null column in the first chunk would otherwise pin a null type
+            self.schema = self.pa.schema([
+                field.with_type(self.pa.string()) if self.pa.types.is_null(field.type) else field
+                for field in table.schema])
+            table = table.cast(self.schema)
+        else:
+            table = self.pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+
+        if self.partition_cols:
+            self.pq.write_to_dataset(table, self.path, partition_cols=self.partition_cols,
+                                     basename_template=f'part-{self.part:05d}-{{i}}.parquet',
+                                     existing_data_behavior='overwrite_or_ignore',
+                                     compression=PARQUET_COMPRESSION)
+        else:
+            self.pq.write_table(table, os.path.join(self.path, f'part-{self.part:05d}.parquet'),
+                                compression=PARQUET_COMPRESSION)
+        self.part += 1
+
+def processed_format(table, processed_dir=config.PROCESSED_DATA_DIR):
+    """
+    Format of the cleaned table on disk: the newer of a CSV file and a
+    Parquet dataset when both exist, else whichever exists, else
+    config.PROCESSED_FORMAT
+    """
+    exported = {fmt: processed_path(table, fmt, processed_dir) for fmt in ('parquet', 'csv')}
+    exported = {fmt: os.path.getmtime(path) for fmt, path in exported.items()
+                if os.path.exists(path)}
+    if not exported:
+        return config.PROCESSED_FORMAT
+    return max(exported, key=exported.get)
+
+def load_processed_table(table, columns=None, months=None,
+                         processed_dir=config.PROCESSED_DATA_DIR, output_format=None):
+    """
+    Read a cleaned table written by DataPreprocessor.export_clean_data()
+
+    columns limits the columns read; months, a list of (year, month) pairs,
+    limits partitioned tables to those order months. With the Parquet format
+    only the requested columns and month directories are touched. The format
+    is detected with processed_format() unless output_format is given.
+    CSV exports of order_items carry no order month, so filtering them by
+    month raises ValueError. Rows without an order date (an item of a
+    missing order, an unparsable timestamp) have null order_year and
+    order_month and are left out by month filters.
+    """
+    if output_format is None:
+        output_format = processed_format(table, processed_dir)
+    filter_months = bool(months) and table in PARTITIONED_TABLES
+
+    if output_format == 'parquet':
+        filters = partitioning = None
+        if filter_months:
+            filters = [[('order_year', '=', int(year)), ('order_month', '=', int(month))]
+                       for year, month in months]
+        if table in PARTITIONED_TABLES:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+            # Typed partitions, so rows without an order date (orphaned
+            # items, unparsable timestamps) read back as nulls
+            partitioning = ds.partitioning(
+                pa.schema([(col, pa.int32()) for col in PARTITION_COLUMNS]), flavor='hive')
+        options = {'partitioning': partitioning} if partitioning is not None else {}
+        df = pd.read_parquet(processed_path(table, 'parquet', processed_dir), columns=columns,
+                             filters=filters, **options)
+        for col in PARTITION_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('Int32')
+        return df
+
+    path = processed_path(table, 'csv', processed_dir)
+    if not filter_months:
+        return pd.read_csv(path, usecols=columns)
+
+    header = pd.read_csv(path, nrows=0).columns
+    if not set(PARTITION_COLUMNS) <= set(header):
+        raise ValueError(f"{path} has no {'/'.join(PARTITION_COLUMNS)} columns to filter "
+                         "months on; export it with the Parquet format")
+    usecols = None
+    if columns is not None:
+        usecols = list(columns) + [col for col in PARTITION_COLUMNS if col not in columns]
+    df = pd.read_csv(path, usecols=usecols)
+    wanted = pd.MultiIndex.from_tuples([(int(y), int(m)) for y, m in months])
+    df = df[pd.MultiIndex.from_frame(df[PARTITION_COLUMNS]).isin(wanted)]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.reset_index(drop=True)
+
+def _rule_predicate(table, alias):
+    """All cleaning rules of a table ANDed together, with their parameters"""
+    rules = CLEANING_RULES.get(table, [])
+    if not rules:
+        return None, []
+    sql = ' AND '.join(f"({predicate.format(a=alias)})" for _, predicate, _ in rules)
+    return sql, [param for _, _, params in rules for param in params]
+
+def _first_key_predicate(table, alias):
+    """True for the first valid row of each DEDUPLICATE_KEYS group"""
+    key = DEDUPLICATE_KEYS.get(table)
+    if not key:
+        return None, []
+    # IS compares NULL keys as equal, like pandas drop_duplicates
+    conditions = [f"d.{col} IS {alias}.{col}" for col in key]
+    rules, params = _rule_predicate(table, 'd')
+    if rules:
+        conditions.append(rules)
+    sql = (f"{alias}.rowid = (SELECT MIN(d.rowid) FROM {table} d "
+           f"WHERE {' AND '.join(conditions)})")
+    return sql, params
+
+def compile_filters(table, alias='t'):
+    """
+    WHERE clause (without the keyword) and parameters applying a table's
+    CLEANING_RULES and DEDUPLICATE_KEYS; (None, []) if it has neither
+    """
+    clauses, params = [], []
+    for sql, clause_params in (_rule_predicate(table, alias), _first_key_predicate(table, alias)):
+        if sql:
+            clauses.append(sql)
+            params.extend(clause_params)
+    if not clauses:
+        return None, []
+    return ' AND '.join(clauses), params
+
+def _export_table_task(db_path, table, chunk_size, output_format, profile_sample):
+    """Export one table on a read-only connection, capturing its report text"""
+    log = io.StringIO()
+    with redirect_stdout(log):
+        preprocessor = DataPreprocessor(db_path, read_only=True)
+        try:
+            rows, report = preprocessor.export_table(table, chunk_size, output_format,
+                                                     profile_sample)
+        finally:
+            preprocessor.close_connection()
+    return rows, report, log.getvalue()
+
+def _check_references_task(child, column, parent, output_format):
+    """Count exported child rows whose key has no row in the exported parent"""
+    parent_keys = load_processed_table(parent, columns=[column],
+                                       output_format=output_format)[column]
+    child_keys = load_processed_table(child, columns=[column],
+                                      output_format=output_format)[column]
+    return int((~child_keys.isin(parent_keys)).sum())
+
+@instrumentation.instrument_methods
 class DataPreprocessor:
     """
     Utility class for data preprocessing and cleaning operations
     """
 
-    def __init__(self, db_path='ecommerce_analysis.db'):
+    def __init__(self, db_path=config.DATABASE_PATH, read_only=False):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        if read_only:
+            uri = pathlib.Path(db_path).resolve().as_uri() + '?mode=ro'
+            self.conn = sqlite3.connect(uri, uri=True)
+        else:
+            self.conn = sqlite3.connect(db_path)
 
-    def clean_orders_data(self, df):
+    def clean_orders_data(self, df, verbose=True):
         """Clean and validate orders data"""
-        print("🧹 Cleaning orders data...")
+        if verbose:
+            print("🧹 Cleaning orders data...")
 
         # Convert datetime columns
-        datetime_cols = ['order_purchase_timestamp', 'order_approved_at', 
-                        'order_delivered_carrier_date', 'order_delivered_customer_date']
-
-        for col in datetime_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
+        df = self._parse_order_dates(df)
 
         # Remove invalid orders
         initial_rows = len(df)
         df = df.dropna(subset=['order_id', 'customer_id'])
         df = df[df['order_status'].notna()]
 
-        print(f"   • Removed {initial_rows - len(df)} invalid records")
+        if verbose:
+            print(f"   • Removed {initial_rows - len(df)} invalid records")
         return df
 
-    def clean_order_items_data(self, df):
+    def _parse_order_dates(self, df):
+        """Convert the order datetime columns that are present"""
+        datetime_cols = ['order_purchase_timestamp', 'order_approved_at', 
+                        'order_delivered_carrier_date', 'order_delivered_customer_date']
+
+        for col in datetime_cols:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+        return df
+
+    def clean_order_items_data(self, df, verbose=True):
         """Clean and validate order items data"""
-        print("🧹 Cleaning order items data...")
+        if verbose:
+            print("🧹 Cleaning order items data...")
 
         # Remove negative prices
         initial_rows = len(df)
         df = df[df['price'] > 0]
         df = df[df['freight_value'] >= 0]
 
+        # Remove items outside the accepted order value range
+        item_value = df['price'] + df['freight_value']
+        df = df[item_value.between(config.MIN_ORDER_VALUE, config.MAX_ORDER_VALUE)]
+
         # Remove duplicates
         df = df.drop_duplicates(subset=['order_id', 'order_item_id'])
 
-        print(f"   • Removed {initial_rows - len(df)} invalid/duplicate records")
+        if verbose:
+            print(f"   • Removed {initial_rows - len(df)} invalid/duplicate records")
         return df
 
-    def add_calculated_fields(self, df):
+    def add_calculated_fields(self, df, verbose=True):
         """Add calculated fields for analysis"""
-        print("➕ Adding calculated fields...")
+        if verbose:
+            print("➕ Adding calculated fields...")
 
         # Add total amount
         if 'price' in df.columns and 'freight_value' in df.columns:
@@ -69,65 +335,285 @@ class DataPreprocessor:
 
         return df
 
-    def validate_data_quality(self, df, table_name):
-        """Validate data quality and report issues"""
-        print(f"✅ Validating {table_name} data quality...")
-
-        # Check for missing values
-        missing_data = df.isnull().sum()
-        if missing_data.any():
+    def _report_quality(self, report):
+        """Print a data quality summary from a profile report"""
+        columns = report['columns']
+        missing = {col: stats for col, stats in columns.items() if stats['nulls'] > 0}
+        if missing:
             print(f"   • Missing values found:")
-            for col, count in missing_data[missing_data > 0].items():
-                print(f"     - {col}: {count} ({count/len(df)*100:.1f}%)")
+            for col, stats in missing.items():
+                print(f"     - {col}: {stats['nulls']} ({stats['null_fraction']*100:.1f}%)")
 
-        # Check for duplicates
-        duplicates = df.duplicated().sum()
-        if duplicates > 0:
-            print(f"   • Duplicate rows: {duplicates}")
+        if report['duplicate_keys']:
+            print(f"   • Duplicate keys ({', '.join(report['primary_key'])}): "
+                  f"{report['duplicate_keys']}")
 
-        # Data type validation
-        print(f"   • Data types:")
-        for col, dtype in df.dtypes.items():
-            print(f"     - {col}: {dtype}")
-
-        return True
+        if report['sample_fraction'] is not None:
+            print(f"   • Profiled a {report['sample_fraction']:.0%} sample: "
+                  f"{report['rows_profiled']:,} of {report['rows']:,} rows")
 
-    def export_clean_data(self):
-        """Export cleaned data to CSV files"""
-        print("💾 Exporting cleaned data...")
-
-        # Read and clean each table
-        tables = ['customers', 'orders', 'order_items', 'products']
+        print(f"   • Data types:")
+        for col, stats in columns.items():
+            print(f"     - {col}: {stats['dtype']} (~{stats['distinct_estimate']:,} distinct)")
 
-        for table in tables:
-            try:
-                df = pd.read_sql(f"SELECT * FROM {table}", self.conn)
+    def _profile(self, table, sample_fraction=None):
+        return TableProfile(table, PRIMARY_KEYS.get(table), sample_fraction)
 
-                if table == 'orders':
-                    df = self.clean_orders_data(df)
-                    df = self.add_calculated_fields(df)
-                elif table == 'order_items':
-                    df = self.clean_order_items_data(df)
+    def validate_data_quality(self, df, table_name, sample_fraction=None):
+        """
+        Validate data quality, report issues and return the profile report
 
-                self.validate_data_quality(df, table)
+        The report (see data_profiler.TableProfile) holds per-column null
+        counts, min/max and distinct estimates plus duplicate counts on the
+        table's primary key, all gathered in one pass over df.
+        """
+        print(f"✅ Validating {table_name} data quality...")
 
-                # Export to CSV
-                df.to_csv(f'data/processed/{table}_clean.csv', index=False)
-                print(f"   • Exported {table}: {len(df):,} records")
+        report = self._profile(table_name, sample_fraction).update(df).to_dict()
+        self._report_quality(report)
+
+        return report
+
+    def _clean_table(self, table, df, verbose=True, filtered=False):
+        """
+        Apply the cleaning steps that belong to a table
+
+        filtered=True means the rows were read with compile_filters()
+        applied, so only type conversion and calculated fields remain.
+        """
+        if table == 'orders':
+            if filtered:
+                df = self._parse_order_dates(df)
+            else:
+                df = self.clean_orders_data(df, verbose)
+            df = self.add_calculated_fields(df, verbose)
+        elif table == 'order_items':
+            if not filtered:
+                df = self.clean_order_items_data(df, verbose)
+            if 'order_purchase_timestamp' in df.columns:
+                df['order_purchase_timestamp'] = pd.to_datetime(df['order_purchase_timestamp'],
+                                                                errors='coerce')
+                df = self.add_calculated_fields(df, verbose)
+        return df
 
-            except Exception as e:
-                print(f"   • Error processing {table}: {str(e)}")
+    def _table_query(self, table, output_format):
+        """SELECT statement and parameters feeding a table's export"""
+        if table == 'order_items' and output_format == 'parquet':
+            query = ("SELECT t.*, o.order_purchase_timestamp FROM order_items t "
+                     "LEFT JOIN orders o ON o.order_id = t.order_id")
+        else:
+            query = f"SELECT * FROM {table} t"
+
+        where, params = compile_filters(table)
+        if where:
+            query += f" WHERE {where}"
+        return query, params
+
+    def rejected_rows(self, table):
+        """
+        Count the rows the cleaning rules reject, in one aggregate query
+
+        Returns a dict with the table's row count, the rows failing each
+        rule (a row can fail several), the duplicates removed among valid
+        rows, and the total rejected.
+        """
+        rules = CLEANING_RULES.get(table, [])
+        valid, valid_params = _rule_predicate(table, 't')
+        first, first_params = _first_key_predicate(table, 't')
+
+        columns, params = ["COUNT(*)"], []
+        for _, predicate, rule_params in rules:
+            columns.append(f"SUM(CASE WHEN {predicate.format(a='t')} THEN 0 ELSE 1 END)")
+            params.extend(rule_params)
+        if first:
+            condition = f"{valid} AND NOT ({first})" if valid else f"NOT ({first})"
+            columns.append(f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END)")
+            params.extend(valid_params + first_params)
+        where, where_params = compile_filters(table)
+        if where:
+            columns.append(f"SUM(CASE WHEN {where} THEN 0 ELSE 1 END)")
+            params.extend(where_params)
+
+        values = self.conn.execute(f"SELECT {', '.join(columns)} FROM {table} t", params).fetchone()
+        values = [int(value or 0) for value in values]
+
+        counts = {'rows': values[0], 'rules': {}, 'duplicates': 0, 'rejected': 0}
+        for (description, _, _), value in zip(rules, values[1:]):
+            counts['rules'][description] = value
+        if first:
+            counts['duplicates'] = values[1 + len(rules)]
+        if where:
+            counts['rejected'] = values[-1]
+        return counts
+
+    def _report_rejected(self, table):
+        """Print how many rows the SQL cleaning filters dropped"""
+        if table not in CLEANING_RULES and table not in DEDUPLICATE_KEYS:
+            return
+        counts = self.rejected_rows(table)
+        print(f"🧹 Cleaning {table} data in SQLite...")
+        print(f"   • Removed {counts['rejected']} invalid/duplicate records")
+        for description, count in counts['rules'].items():
+            if count:
+                print(f"     - {description}: {count}")
+        if counts['duplicates']:
+            print(f"     - duplicate {', '.join(DEDUPLICATE_KEYS[table])}: {counts['duplicates']}")
+
+    def _writer(self, table, output_format):
+        path = processed_path(table, output_format)
+        if output_format == 'parquet':
+            partition_cols = PARTITION_COLUMNS if table in PARTITIONED_TABLES else None
+            return _ParquetWriter(path, partition_cols)
+        return _CsvWriter(path)
+
+    def _export_table(self, table, writer, output_format, profile_sample=None):
+        """Clean, validate and export a whole table in one pass"""
+        self._report_rejected(table)
+        query, params = self._table_query(table, output_format)
+        df = pd.read_sql(query, self.conn, params=params)
+        df = self._clean_table(table, df, verbose=False, filtered=True)
+        report = self.validate_data_quality(df, table, profile_sample)
+        writer.write(df)
+        return len(df), report
+
+    def _export_table_chunked(self, table, writer, output_format, chunk_size,
+                              profile_sample=None):
+        """
+        Clean, validate and export a table chunk_size rows at a time
+
+        Each cleaned chunk is appended to the output file straight away, so
+        peak memory depends on the chunk size rather than the table size.
+        Each chunk updates one data quality profile, reported once at the end.
+        """
+        self._report_rejected(table)
+        query, params = self._table_query(table, output_format)
+
+        rows = 0
+        profile = self._profile(table, profile_sample)
+
+        for chunk in pd.read_sql(query, self.conn, params=params, chunksize=chunk_size):
+            chunk = self._clean_table(table, chunk, verbose=False, filtered=True)
+            rows += len(chunk)
+            profile.update(chunk)
+
+            writer.write(chunk)
+
+        print(f"✅ Validating {table} data quality...")
+        report = profile.to_dict()
+        self._report_quality(report)
+        return rows, report
+
+    def export_table(self, table, chunk_size=None, output_format=config.PROCESSED_FORMAT,
+                     profile_sample=None):
+        """
+        Clean, validate and export one table
+
+        Returns the exported row count and the table's data quality report;
+        profile_sample profiles only that fraction of the rows.
+        """
+        writer = self._writer(table, output_format)
+        if chunk_size:
+            return self._export_table_chunked(table, writer, output_format, chunk_size,
+                                              profile_sample)
+        return self._export_table(table, writer, output_format, profile_sample)
+
+    def export_clean_data(self, chunk_size=None, output_format=config.PROCESSED_FORMAT,
+                          workers=1, profile_sample=None):
+        """
+        Export cleaned data to CSV files or Parquet datasets
+
+        With chunk_size set, every table is streamed from the database and
+        written incrementally instead of being loaded whole. The Parquet
+        format keeps the parsed dtypes, and orders and order items are
+        partitioned by order_year/order_month; load_processed_table() reads
+        them back by column and month.
+
+        Tables are exported as tasks of a TaskGraph, with workers processes
+        each opening its own read-only connection. The REFERENCE_CHECKS run
+        as soon as both of their tables are exported.
+
+        The data quality reports of all tables are written to
+        quality_report.json in the processed data directory.
+        """
+        print("💾 Exporting cleaned data...")
+        os.makedirs(config.PROCESSED_DATA_DIR, exist_ok=True)
+
+        if output_format == 'parquet' and not parquet_available():
+            print("   • pyarrow is not installed, falling back to CSV")
+            output_format = 'csv'
+
+        # Worker processes send their instrumentation records back with the results
+        processes = workers > 1
+        task = instrumentation.in_worker if processes else (lambda func: func)
+
+        graph = TaskGraph()
+        for table in EXPORT_TABLES:
+            graph.add(table, task(_export_table_task), self.db_path, table, chunk_size,
+                      output_format, profile_sample)
+        for child, column, parent in REFERENCE_CHECKS:
+            graph.add(f'{child}.{column} -> {parent}', task(_check_references_task), child,
+                      column, parent, output_format, depends_on=[child, parent])
+
+        results, errors = graph.run(max_workers=workers, processes=processes)
+        if processes:
+            results = {name: instrumentation.gather(value) for name, value in results.items()}
+
+        reports = []
+        for table in EXPORT_TABLES:
+            if table in errors:
+                print(f"   • Error processing {table}: {str(errors[table])}")
+            else:
+                rows, report, log = results[table]
+                print(log, end='')
+                print(f"   • Exported {table}: {rows:,} records")
+                reports.append(report)
+
+        report_path = os.path.join(config.PROCESSED_DATA_DIR, QUALITY_REPORT_FILE)
+        write_report(reports, report_path)
+        print(f"   • Data quality report: {report_path}")
+
+        print("🔗 Checking cross-table references...")
+        for child, column, parent in REFERENCE_CHECKS:
+            name = f'{child}.{column} -> {parent}'
+            if name in errors:
+                print(f"   • {name}: not checked ({str(errors[name])})")
+            else:
+                orphans = results[name]
+                status = "✅" if orphans == 0 else "⚠️"
+                print(f"   • {status} {name}: {orphans:,} rows without a match")
+
+        return results
 
     def close_connection(self):
         """Close database connection"""
         self.conn.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean and export the analysis tables")
+    parser.add_argument('--db-path', default=config.DATABASE_PATH)
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help="stream tables in chunks of this many rows")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default=config.PROCESSED_FORMAT,
+                        help="output format for data/processed")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="processes exporting tables concurrently")
+    parser.add_argument('--profile-sample', type=float, default=None,
+                        help="profile data quality on this fraction of each table's rows")
+    parser.add_argument('--instrument', nargs='?', const=config.RUN_REPORT_FILE, default=None,
+                        metavar='REPORT', help="record timings and memory into a JSON run report")
+    args = parser.parse_args()
+    if args.instrument:
+        instrumentation.enable()
+
     print("🧹 Data Preprocessing Pipeline")
     print("=" * 40)
 
-    preprocessor = DataPreprocessor()
-    preprocessor.export_clean_data()
+    preprocessor = DataPreprocessor(args.db_path)
+    preprocessor.export_clean_data(args.chunk_size, args.format, args.workers,
+                                   args.profile_sample)
     preprocessor.close_connection()
 
     print("\n✅ Data preprocessing complete!")
+    if args.instrument:
+        instrumentation.print_summary(instrumentation.write_report(args.instrument))
+        print(f"   • Run report: {args.instrument}")
@@ -0,0 +1,187 @@
+-- =====================================
+-- E-COMMERCE SALES ANALYSIS PROJECT
+-- Business Analysis Queries, SQLite Dialect
+-- =====================================
+-- The queries of ecommerce_analysis_queries.sql for the SQLite database
+-- built by setup_database.py (timestamps stored as 'YYYY-MM-DD HH:MM:SS'
+-- text). MySQL functions are replaced as follows:
+--   DATE_FORMAT(ts, '%Y-%m')  -> strftime('%Y-%m', ts)
+--   DATEDIFF(a, b)            -> julianday(date(a)) - julianday(date(b))
+--   QUARTER(ts)               -> (CAST(strftime('%m', ts) AS INTEGER) + 2) / 3
+--   MONTH(ts), YEAR(ts)       -> strftime('%m', ts), strftime('%Y', ts)
+--   MONTHNAME(ts)             -> CASE on strftime('%m', ts)
+-- benchmark.py times every query below; each starts with a
+-- "-- QUERY n: title" line.
+
+-- QUERY 1: Revenue Analysis by Month
+SELECT
+    strftime('%Y-%m', o.order_purchase_timestamp) as order_month,
+    COUNT(DISTINCT o.order_id) as total_orders,
+    COUNT(DISTINCT o.customer_id) as unique_customers,
+    SUM(oi.price + oi.freight_value) as total_revenue,
+    AVG(oi.price + oi.freight_value) as avg_order_value
+FROM orders o
+JOIN order_items oi ON o.order_id = oi.order_id
+WHERE o.order_status = 'delivered'
+    AND o.order_purchase_timestamp >= '2017-01-01'
+GROUP BY strftime('%Y-%m', o.order_purchase_timestamp)
+ORDER BY order_month;
+
+-- QUERY 2: Top Product Categories by Revenue
+SELECT
+    p.product_category_name,
+    COUNT(DISTINCT oi.order_id) as total_orders,
+    SUM(oi.price) as total_revenue,
+    AVG(oi.price) as avg_price,
+    SUM(oi.freight_value) as total_shipping,
+    SUM(oi.price + oi.freight_value) as total_revenue_with_shipping
+FROM order_items oi
+JOIN products p ON oi.product_id = p.product_id
+JOIN orders o ON oi.order_id = o.order_id
+WHERE o.order_status = 'delivered'
+GROUP BY p.product_category_name
+ORDER BY total_revenue DESC
+LIMIT 15;
+
+-- QUERY 3: Geographic Sales Analysis
+SELECT
+    c.customer_state,
+    COUNT(DISTINCT o.order_id) as total_orders,
+    COUNT(DISTINCT c.customer_id) as total_customers,
+    SUM(oi.price + oi.freight_value) as total_revenue,
+    AVG(oi.price + oi.freight_value) as avg_order_value,
+    SUM(oi.price + oi.freight_value) / COUNT(DISTINCT c.customer_id) as revenue_per_customer
+FROM customers c
+JOIN orders o ON c.customer_id = o.customer_id
+JOIN order_items oi ON o.order_id = oi.order_id
+WHERE o.order_status = 'delivered'
+GROUP BY c.customer_state
+ORDER BY total_revenue DESC;
+
+-- QUERY 4: Payment Methods Analysis
+SELECT
+    op.payment_type,
+    COUNT(DISTINCT op.order_id) as total_orders,
+    AVG(op.payment_installments) as avg_installments,
+    SUM(op.payment_value) as total_payment_value,
+    AVG(op.payment_value) as avg_payment_value
+FROM order_payments op
+JOIN orders o ON op.order_id = o.order_id
+WHERE o.order_status = 'delivered'
+GROUP BY op.payment_type
+ORDER BY total_payment_value DESC;
+
+-- QUERY 5: Customer Satisfaction Analysis
+SELECT
+    r.review_score,
+    COUNT(*) as review_count,
+    COUNT(*) * 100.0 / (SELECT COUNT(*) FROM order_reviews) as percentage,
+    AVG(oi.price + oi.freight_value) as avg_order_value
+FROM order_reviews r
+JOIN orders o ON r.order_id = o.order_id
+JOIN order_items oi ON o.order_id = oi.order_id
+WHERE o.order_status = 'delivered'
+GROUP BY r.review_score
+ORDER BY r.review_score;
+
+-- QUERY 6: Delivery Performance Analysis
+SELECT
+    CASE
+        WHEN julianday(date(o.order_delivered_customer_date)) - julianday(date(o.order_estimated_delivery_date)) <= 0
+        THEN 'On Time/Early'
+        WHEN julianday(date(o.order_delivered_customer_date)) - julianday(date(o.order_estimated_delivery_date)) BETWEEN 1 AND 7
+        THEN 'Late (1-7 days)'
+        WHEN julianday(date(o.order_delivered_customer_date)) - julianday(date(o.order_estimated_delivery_date)) > 7
+        THEN 'Very Late (>7 days)'
+    END as delivery_performance,
+    COUNT(*) as order_count,
+    COUNT(*) * 100.0 / (SELECT COUNT(*) FROM orders WHERE order_status = 'delivered') as percentage,
+    AVG(r.review_score) as avg_review_score
+FROM orders o
+LEFT JOIN order_reviews r ON o.order_id = r.order_id
+WHERE o.order_status = 'delivered'
+    AND o.order_delivered_customer_date IS NOT NULL
+    AND o.order_estimated_delivery_date IS NOT NULL
+GROUP BY delivery_performance;
+
+-- QUERY 7: Seller Performance Analysis
+SELECT
+    s.seller_state,
+    COUNT(DISTINCT s.seller_id) as total_sellers,
+    COUNT(DISTINCT oi.order_id) as total_orders,
+    SUM(oi.price) as total_revenue,
+    AVG(oi.price) as avg_product_price,
+    SUM(oi.price) / COUNT(DISTINCT s.seller_id) as revenue_per_seller
+FROM sellers s
+JOIN order_items oi ON s.seller_id = oi.seller_id
+JOIN orders o ON oi.order_id = o.order_id
+WHERE o.order_status = 'delivered'
+GROUP BY s.seller_state
+HAVING COUNT(DISTINCT s.seller_id) >= 10  -- States with at least 10 sellers
+ORDER BY total_revenue DESC;
+
+-- QUERY 8: Customer Retention Analysis (RFM-like approach)
+WITH customer_metrics AS (
+    SELECT
+        c.customer_unique_id,
+        COUNT(DISTINCT o.order_id) as frequency,
+        SUM(oi.price + oi.freight_value) as monetary_value,
+        MAX(o.order_purchase_timestamp) as last_purchase_date,
+        julianday('2018-12-31') - julianday(date(MAX(o.order_purchase_timestamp))) as recency_days
+    FROM customers c
+    JOIN orders o ON c.customer_id = o.customer_id
+    JOIN order_items oi ON o.order_id = oi.order_id
+    WHERE o.order_status = 'delivered'
+    GROUP BY c.customer_unique_id
+)
+SELECT
+    CASE
+        WHEN frequency = 1 THEN 'One-time Customer'
+        WHEN frequency BETWEEN 2 AND 3 THEN 'Returning Customer'
+        WHEN frequency > 3 THEN 'Loyal Customer'
+    END as customer_segment,
+    COUNT(*) as customer_count,
+    AVG(monetary_value) as avg_total_spent,
+    AVG(recency_days) as avg_days_since_last_purchase
+FROM customer_metrics
+GROUP BY customer_segment
+ORDER BY avg_total_spent DESC;
+
+-- QUERY 9: Seasonal Trends Analysis
+SELECT
+    (CAST(strftime('%m', o.order_purchase_timestamp) AS INTEGER) + 2) / 3 as quarter,
+    CASE strftime('%m', o.order_purchase_timestamp)
+        WHEN '01' THEN 'January' WHEN '02' THEN 'February' WHEN '03' THEN 'March'
+        WHEN '04' THEN 'April' WHEN '05' THEN 'May' WHEN '06' THEN 'June'
+        WHEN '07' THEN 'July' WHEN '08' THEN 'August' WHEN '09' THEN 'September'
+        WHEN '10' THEN 'October' WHEN '11' THEN 'November' WHEN '12' THEN 'December'
+    END as month_name,
+    COUNT(DISTINCT o.order_id) as total_orders,
+    SUM(oi.price + oi.freight_value) as total_revenue,
+    AVG(r.review_score) as avg_customer_satisfaction
+FROM orders o
+JOIN order_items oi ON o.order_id = oi.order_id
+LEFT JOIN order_reviews r ON o.order_id = r.order_id
+WHERE o.order_status = 'delivered'
+    AND strftime('%Y', o.order_purchase_timestamp) IN ('2017', '2018')
+GROUP BY quarter, strftime('%m', o.order_purchase_timestamp)
+ORDER BY quarter, strftime('%m', o.order_purchase_timestamp);
+
+-- QUERY 10: Product Performance Analysis
+SELECT
+    p.product_category_name,
+    COUNT(DISTINCT oi.product_id) as unique_products,
+    COUNT(DISTINCT oi.order_id) as total_orders,
+    SUM(oi.price) as total_revenue,
+    AVG(oi.price) as avg_price,
+    AVG(r.review_score) as avg_rating,
+    SUM(oi.price) / COUNT(DISTINCT oi.order_id) as revenue_per_order
+FROM products p
+JOIN order_items oi ON p.product_id = oi.product_id
+JOIN orders o ON oi.order_id = o.order_id
+LEFT JOIN order_reviews r ON o.order_id = r.order_id
+WHERE o.order_status = 'delivered'
+    AND p.product_category_name IS NOT NULL
+GROUP BY p.product_category_name
+HAVING COUNT(DISTINCT oi.order_id) >= 100  -- Categories with at least 100 orders
+ORDER BY total_revenue DESC;
@@ -3,37 +3,1061 @@
 # Python Data Analysis & Visualization
 # =====================================
 
+import io
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sqlite3
+import threading
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+import config
+import instrumentation
+from aggregation_cache import AggregationCache
+from fact_table import load_fact_frame, record_refresh_state, refresh_fact_table, refresh_state
+from monthly_revenue import MONTHLY_REVENUE_TABLE, MonthlyRevenueStore, create_table
+from order_cube import OrderCube
+from rfm import assign_segments, rfm_density, rfm_scores
+from sketches import HyperLogLog, group_sketches, hash_values
+from task_graph import TaskFailed, TaskGraph
+
 # Set style for better visualizations
 plt.style.use('seaborn-v0_8')
 sns.set_palette("husl")
 
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ['product_category', 'customer_state', 'payment_type']
+
+# High-cardinality identifiers replaced by integer surrogate keys; the
+# original strings are kept once each in EcommerceAnalyzer.dictionaries
+SURROGATE_KEY_COLUMNS = ['order_id', 'customer_id']
+
+def encode_frame(df):
+    '''
+    Encode an analysis frame for memory and groupby speed
+
+    Returns the encoded frame, the surrogate key dictionaries and a
+    per-column memory report. Surrogate keys are assigned in sorted order
+    of the original IDs, so grouping by a key orders groups as the IDs did
+    (IDs first seen in batches added by EcommerceAnalyzer.append_orders()
+    get the next keys, after every ID of the initial load). Missing IDs get
+    the key -1, which EcommerceAnalyzer keeps out of groups and counts.
+    Integer columns are downcast to the smallest type that holds them;
+    monetary floats stay float64 so sums are unchanged.
+    '''
+    before = df.memory_usage(index=False, deep=True)
+    df = df.copy()
+    dictionaries = {}
+
+    for col in SURROGATE_KEY_COLUMNS:
+        if col in df.columns:
+            codes, uniques = pd.factorize(df[col], sort=True)
+            df[col] = codes.astype(np.int32)
+            dictionaries[col] = pd.Index(uniques, name=col)
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    after = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({'bytes_before': before, 'bytes_after': after,
+                           'dtype': df.dtypes.astype(str)})
+    report['bytes_saved'] = report['bytes_before'] - report['bytes_after']
+    return df, dictionaries, report
+
+# Group keys derived from other columns, usable in EcommerceAnalyzer.aggregate()
+DERIVED_KEYS = {
+    'order_month': lambda df: df['order_date'].dt.to_period('M')
+}
+
+# Dimensions and stored measures of the precomputed cube behind aggregate()
+CUBE_DIMENSIONS = ['order_month', 'product_category', 'customer_state', 'payment_type']
+CUBE_MEASURES = {
+    'total_amount': ['sum', 'count'],
+    'quantity': ['sum', 'count'],
+    'review_score': ['sum', 'count'],
+    'order_id': ['count']
+}
+
+# SQL expressions for DERIVED_KEYS in the 'sql' execution mode
+DERIVED_KEY_SQL = {
+    'order_month': "strftime('%Y-%m', order_date)"
+}
+
+# Aggregate functions in the 'sql' execution mode
+SQL_FUNCTIONS = {
+    'sum': 'SUM({})',
+    'mean': 'AVG({})',
+    'count': 'COUNT({})',
+    'nunique': 'COUNT(DISTINCT {})',
+    # SQLite has no sketches; the query computes distinct counts exactly
+    'approx_nunique': 'COUNT(DISTINCT {})',
+    'min': 'MIN({})',
+    'max': 'MAX({})'
+}
+
+# Columns SQLite returns as text that are parsed back to timestamps
+DATETIME_COLUMNS = ['order_date']
+
+# to_sql writes microseconds only when they are non-zero; pad every value to
+# one fixed format before parsing
+SQL_DATETIME_TEXT = "substr({} || '.000000', 1, 26)"
+SQL_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+ANALYSIS_TABLE = 'orders_analysis'
+
+FILTER_OPERATORS = {
+    '==': lambda col, value: col == value,
+    '!=': lambda col, value: col != value,
+    '<': lambda col, value: col < value,
+    '<=': lambda col, value: col <= value,
+    '>': lambda col, value: col > value,
+    '>=': lambda col, value: col >= value,
+    'in': lambda col, value: col.isin(value)
+}
+
+# order_date filters answered by binary search on the sorted analysis frame:
+# operator -> (which end of the frame it bounds, searchsorted side)
+DATE_BOUND_SIDES = {
+    '>=': ('start', 'left'),
+    '>': ('start', 'right'),
+    '<': ('end', 'left'),
+    '<=': ('end', 'right')
+}
+
+def date_bounds(start=None, end=None):
+    '''order_date filters selecting the whole days start to end, both inclusive'''
+    filters = []
+    if start is not None:
+        filters.append(('order_date', '>=', pd.Timestamp(start).normalize()))
+    if end is not None:
+        filters.append(('order_date', '<', pd.Timestamp(end).normalize() + pd.Timedelta(days=1)))
+    return filters
+
+def _sql_value(value):
+    '''Filter value as stored by DataFrame.to_sql, so text comparisons hold'''
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+@instrumentation.instrumented
+def plot_revenue_dashboard(monthly_revenue, path, dpi=config.DPI):
+    '''Draw the revenue dashboard and save it to path'''
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('E-Commerce Business Performance Dashboard', fontsize=16, fontweight='bold')
+
+    # Monthly revenue trend
+    ax1.plot(monthly_revenue.index, monthly_revenue['Total_Revenue'], marker='o', linewidth=2)
+    ax1.set_title('Monthly Revenue Trend')
+    ax1.set_ylabel('Revenue ($)')
+    ax1.grid(True, alpha=0.3)
+    ax1.tick_params(axis='x', rotation=45)
+
+    # Monthly order count
+    ax2.bar(monthly_revenue.index, monthly_revenue['Total_Orders'], alpha=0.7)
+    ax2.set_title('Monthly Order Count')
+    ax2.set_ylabel('Number of Orders')
+    ax2.grid(True, alpha=0.3)
+
+    # Average order value trend
+    ax3.plot(monthly_revenue.index, monthly_revenue['Avg_Order_Value'], 
+            marker='s', color='green', linewidth=2)
+    ax3.set_title('Average Order Value Trend')
+    ax3.set_ylabel('AOV ($)')
+    ax3.grid(True, alpha=0.3)
+
+    # Customer acquisition trend
+    ax4.plot(monthly_revenue.index, monthly_revenue['Unique_Customers'], 
+            marker='^', color='orange', linewidth=2)
+    ax4.set_title('Monthly Unique Customers')
+    ax4.set_ylabel('Unique Customers')
+    ax4.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    return fig
+
+@instrumentation.instrumented
+def plot_category_dashboard(category_stats, path, dpi=config.DPI):
+    '''Draw the product category dashboard and save it to path'''
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
+    fig.suptitle('Product Category Performance Analysis', fontsize=16, fontweight='bold')
+
+    # Top categories by revenue
+    top_categories = category_stats.head(8)
+    ax1.barh(top_categories.index, top_categories['Total_Revenue'])
+    ax1.set_title('Top Categories by Revenue')
+    ax1.set_xlabel('Total Revenue ($)')
+
+    # Average order value by category
+    ax2.bar(top_categories.index, top_categories['Avg_Order_Value'], alpha=0.7)
+    ax2.set_title('Average Order Value by Category')
+    ax2.set_ylabel('AOV ($)')
+    ax2.tick_params(axis='x', rotation=45)
+
+    # Customer satisfaction by category
+    ax3.bar(top_categories.index, top_categories['Avg_Rating'], 
+            color='green', alpha=0.7)
+    ax3.set_title('Average Rating by Category')
+    ax3.set_ylabel('Average Rating (1-5)')
+    ax3.set_ylim(0, 5)
+    ax3.tick_params(axis='x', rotation=45)
+
+    # Order volume by category
+    ax4.pie(top_categories['Order_Count'], labels=top_categories.index, autopct='%1.1f%%')
+    ax4.set_title('Order Distribution by Category')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    return fig
+
+@instrumentation.instrumented
+def plot_geographic_dashboard(geo_stats, path, dpi=config.DPI):
+    '''Draw the geographic dashboard and save it to path'''
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('Geographic Performance Analysis', fontsize=16, fontweight='bold')
+
+    top_states = geo_stats.head(10)
+
+    # Revenue by state
+    ax1.bar(top_states.index, top_states['Total_Revenue'])
+    ax1.set_title('Revenue by State')
+    ax1.set_ylabel('Total Revenue ($)')
+    ax1.tick_params(axis='x', rotation=45)
+
+    # Customer distribution
+    ax2.pie(top_states['Unique_Customers'], labels=top_states.index, autopct='%1.1f%%')
+    ax2.set_title('Customer Distribution by State')
+
+    # Revenue per customer
+    ax3.bar(top_states.index, top_states['Revenue_per_Customer'], color='green')
+    ax3.set_title('Revenue per Customer by State')
+    ax3.set_ylabel('Revenue per Customer ($)')
+    ax3.tick_params(axis='x', rotation=45)
+
+    # Average rating by state
+    ax4.bar(top_states.index, top_states['Avg_Rating'], color='orange', alpha=0.7)
+    ax4.set_title('Average Rating by State')
+    ax4.set_ylabel('Average Rating (1-5)')
+    ax4.set_ylim(0, 5)
+    ax4.tick_params(axis='x', rotation=45)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    return fig
+
+@instrumentation.instrumented
+def plot_segmentation_dashboard(segments, path, dpi=config.DPI):
+    '''
+    Draw the customer segmentation dashboard and save it to path
+
+    segments holds per-segment aggregates ('summary', 'averages') and the
+    binned RFM grid from rfm.rfm_density() ('density'), so the chart costs
+    the same for any number of customers.
+    '''
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
+    fig.suptitle('Customer Segmentation Analysis', fontsize=16, fontweight='bold')
+
+    segment_summary = segments['summary']
+
+    # Customer distribution by segment
+    ax1.pie(segment_summary['customer_id'], labels=segment_summary['Segment'], 
+            autopct='%1.1f%%')
+    ax1.set_title('Customer Distribution by Segment')
+
+    # Revenue by segment
+    ax2.bar(segment_summary['Segment'], segment_summary['Monetary'])
+    ax2.set_title('Total Revenue by Segment')
+    ax2.set_ylabel('Total Revenue ($)')
+    ax2.tick_params(axis='x', rotation=45)
+
+    # RFM density plot: customers binned by Frequency x Monetary, colored by
+    # the mean Recency of each cell
+    density = segments['density']
+    if density is not None:
+        mesh = ax3.pcolormesh(density['frequency_edges'], density['monetary_edges'],
+                              np.ma.masked_invalid(density['mean_recency'].T), cmap='viridis')
+        if density['monetary_edges'][0] > 0:
+            ax3.set_yscale('log')
+        plt.colorbar(mesh, ax=ax3, label='Mean recency (days)')
+    ax3.set_xlabel('Frequency')
+    ax3.set_ylabel('Monetary ($)')
+    ax3.set_title('Customer RFM Analysis')
+
+    # Average metrics by segment
+    avg_metrics = segments['averages']
+    x_pos = range(len(avg_metrics.index))
+    width = 0.25
+
+    ax4.bar([x - width for x in x_pos], avg_metrics['Frequency'], 
+           width, label='Frequency', alpha=0.7)
+    ax4.bar(x_pos, avg_metrics['Monetary']/100, 
+           width, label='Monetary/100', alpha=0.7)
+    ax4.bar([x + width for x in x_pos], avg_metrics['Recency']/10, 
+           width, label='Recency/10', alpha=0.7)
+
+    ax4.set_xlabel('Segment')
+    ax4.set_ylabel('Normalized Values')
+    ax4.set_title('Average RFM Metrics by Segment')
+    ax4.set_xticks(x_pos)
+    ax4.set_xticklabels(avg_metrics.index, rotation=45)
+    ax4.legend()
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    return fig
+
+@instrumentation.instrumented
+def plot_payment_dashboard(payment_stats, path, dpi=config.DPI):
+    '''Draw the payment method dashboard and save it to path'''
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
+    fig.suptitle('Payment Method Analysis', fontsize=16, fontweight='bold')
+
+    # Market share
+    ax1.pie(payment_stats['Market_Share'], labels=payment_stats.index, 
+            autopct='%1.1f%%')
+    ax1.set_title('Payment Method Market Share')
+
+    # Revenue by payment type
+    ax2.bar(payment_stats.index, payment_stats['Total_Revenue'])
+    ax2.set_title('Revenue by Payment Method')
+    ax2.set_ylabel('Total Revenue ($)')
+    ax2.tick_params(axis='x', rotation=45)
+
+    # AOV by payment type
+    ax3.bar(payment_stats.index, payment_stats['AOV'], color='green', alpha=0.7)
+    ax3.set_title('Average Order Value by Payment Method')
+    ax3.set_ylabel('AOV ($)')
+    ax3.tick_params(axis='x', rotation=45)
+
+    # Rating by payment type
+    ax4.bar(payment_stats.index, payment_stats['Avg_Rating'], 
+            color='orange', alpha=0.7)
+    ax4.set_title('Customer Satisfaction by Payment Method')
+    ax4.set_ylabel('Average Rating (1-5)')
+    ax4.set_ylim(0, 5)
+    ax4.tick_params(axis='x', rotation=45)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    return fig
+
+# Dashboard of each analysis section, by output file name
+CHARTS = {
+    'revenue_trend_analysis': plot_revenue_dashboard,
+    'category_analysis': plot_category_dashboard,
+    'geographic_analysis': plot_geographic_dashboard,
+    'customer_segmentation': plot_segmentation_dashboard,
+    'payment_analysis': plot_payment_dashboard
+}
+
+def chart_path(name, export_format=config.EXPORT_FORMAT):
+    '''Output file of a chart'''
+    return f'{name}.{export_format}'
+
+@instrumentation.instrumented(name='render_chart', rows=None)
+def _render_chart(name, data, dpi, export_format):
+    '''Render one chart with the non-interactive Agg backend (pool worker)'''
+    plt.switch_backend('Agg')
+    path = chart_path(name, export_format)
+    fig = CHARTS[name](data, path, dpi)
+    plt.close(fig)
+    return path
+
+# The analysis pipeline: (stage, EcommerceAnalyzer method, stages it needs).
+# Sections only read the analysis frame; insights and the CSV export reuse
+# the aggregates the sections cached, and rendering needs every chart queued.
+ANALYSIS_STAGES = [
+    ('revenue', 'revenue_trend_analysis', []),
+    ('category', 'product_category_analysis', []),
+    ('geographic', 'geographic_analysis', []),
+    ('segmentation', 'customer_segmentation_analysis', []),
+    ('payment', 'payment_analysis', []),
+    ('periods', 'recent_period_analysis', []),
+    ('insights', 'generate_business_insights', ['category', 'geographic']),
+    ('export', 'export_results_to_csv', ['revenue', 'category', 'geographic', 'segmentation']),
+    ('render', 'render_charts', ['revenue', 'category', 'geographic', 'segmentation', 'payment'])
+]
+
+# Stages that start worker processes: they run in the calling thread once
+# the other stages' thread pool has shut down, since forking while other
+# threads hold locks can deadlock the children
+MAIN_THREAD_STAGES = ['render']
+
+@instrumentation.instrument_methods
 class EcommerceAnalyzer:
     '''
     A comprehensive e-commerce data analysis class that combines SQL querying
     with Python data analysis and visualization capabilities.
     '''
 
-    def __init__(self, db_path='ecommerce_data.db'):
-        '''Initialize the analyzer with database connection'''
+    def __init__(self, db_path='ecommerce_data.db', execution_mode='pandas', headless=False,
+                 period=(config.ANALYSIS_START_DATE, config.ANALYSIS_END_DATE),
+                 distinct_counts=config.DISTINCT_COUNTS):
+        '''
+        Initialize the analyzer with database connection
+
+        execution_mode='pandas' aggregates the in-memory self.df;
+        execution_mode='sql' runs every aggregate as a query on the
+        orders_analysis table and only reads back the small result, so
+        the table never has to fit in memory.
+
+        headless=True switches matplotlib to the non-interactive Agg
+        backend and never calls plt.show(); sections queue their chart
+        data, and render_charts() draws all charts in worker processes.
+
+        Only orders placed within period, a (start, end) pair of inclusive
+        dates, are analyzed; pass period=None to keep every order.
+
+        distinct_counts='approximate' counts distinct customers per month,
+        state and in the CSV export with HyperLogLog sketches of
+        config.HLL_PRECISION (see sketches.HyperLogLog for the error bound)
+        instead of exact per-group hash sets.
+        '''
+        if execution_mode not in ('pandas', 'sql'):
+            raise ValueError(f"Unknown execution mode: {execution_mode}")
+        if distinct_counts not in ('exact', 'approximate'):
+            raise ValueError(f"Unknown distinct count mode: {distinct_counts}")
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
-        print(f"Connected to database: {db_path}")
+        self.execution_mode = execution_mode
+        # Pipeline stages may query from worker threads; db_lock serializes them
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.db_lock = threading.Lock()
+        self.dictionaries = {}
+        self.memory_report = None
+        self.cache = AggregationCache()
+        self._df = None
+        self.df_version = 0
+        self.cube = None
+        self.cube_lock = threading.Lock()
+        self.revenue_store = None
+        # Months of revenue_store not written to the monthly_revenue table
+        # (None: the whole store)
+        self.unsaved_months = None
+        # df_version whose aggregate cache holds the store's counts
+        self.store_cached_version = None
+        # Ingestion batch the loaded fact table reflects (None for sample data)
+        self.fact_batch = None
+        # hash_values() of each surrogate key dictionary, computed on first use
+        self.id_hashes = {}
+        # Surrogate keys of the IDs added by append_orders(), per column
+        self.appended_keys = {}
+        self.headless = headless
+        self.period = period
+        self.distinct_counts = distinct_counts
+        self.distinct_func = 'approx_nunique' if distinct_counts == 'approximate' else 'nunique'
+        self.pending_charts = []
+        # Per-thread report buffer of the stage running in that thread
+        self.output = threading.local()
+        if headless:
+            plt.switch_backend('Agg')
+        self._print(f"Connected to database: {db_path}")
+        if execution_mode == 'sql':
+            self.create_indexes()
+
+    @property
+    def df(self):
+        '''The analysis frame; assigning a new frame invalidates cached aggregates'''
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        # Kept sorted by order_date so date ranges are found by binary search
+        if df is not None and 'order_date' in df.columns and \
+                not df['order_date'].is_monotonic_increasing:
+            df = df.sort_values('order_date', kind='stable', ignore_index=True)
+        self._df = df
+        self.revenue_store = None
+        self.invalidate()
+
+    def invalidate(self):
+        '''Forget cached aggregates; call after modifying self.df in place'''
+        self.df_version += 1
+        self.cache.clear()
+        self.cube = None
+
+    @staticmethod
+    def _date_slice(df, op, value):
+        '''Rows of a frame sorted by order_date within one bound, by binary search'''
+        bound, side = DATE_BOUND_SIDES[op]
+        position = df['order_date'].searchsorted(pd.Timestamp(value), side=side)
+        return df.iloc[position:] if bound == 'start' else df.iloc[:position]
+
+    def window(self, start=None, end=None):
+        '''
+        The orders of self.df placed from day start to day end (both
+        inclusive, either open when None) as a row slice of the sorted
+        frame, located in O(log n) without scanning the other orders
+        '''
+        df = self.df
+        for _, op, value in date_bounds(start, end):
+            df = self._date_slice(df, op, value)
+        return df
+
+    def prune_to_period(self):
+        '''Drop the orders of self.df placed outside self.period'''
+        if self.period is None or self.df is None:
+            return
+        start, end = self.period
+        window = self.window(start, end)
+        if len(window) < len(self.df):
+            self._print(f"✂️ Kept {len(window):,} of {len(self.df):,} orders placed "
+                        f"from {start} to {end}")
+            self.df = window.reset_index(drop=True)
+
+    def key_hashes(self, column):
+        '''hash_values() of the original IDs of a surrogate key column, indexed by key'''
+        if column not in self.id_hashes:
+            self.id_hashes[column] = hash_values(self.dictionaries[column])
+        return self.id_hashes[column]
+
+    def _store_update(self, store, df):
+        '''Fold orders of the analysis frame into a MonthlyRevenueStore'''
+        hashes = self.key_hashes('customer_id') if 'customer_id' in self.dictionaries else None
+        return store.update(df, hashes)
+
+    def _write_revenue_store(self, store, months=None):
+        '''
+        Write a store's unsaved months and the given months (all of them
+        when unsaved_months is None) to the monthly_revenue table within the
+        caller's transaction and, for a fact table, record the ingestion
+        batch it reflects
+        '''
+        months = (None if self.unsaved_months is None
+                  else sorted(self.unsaved_months | set(months or ())))
+        store.write(self.conn, months)
+        if self.fact_batch is not None:
+            record_refresh_state(self.conn, MONTHLY_REVENUE_TABLE, self.fact_batch,
+                                 sum(store.orders.values()))
+
+    def save_revenue_store(self):
+        '''
+        Write the monthly revenue store to the monthly_revenue table, for
+        load_fact_data() of a later run to restore instead of rebuilding it
+
+        Only the months changed since the store was restored are written;
+        a store built in this run replaces the table contents.
+        '''
+        if self.execution_mode == 'sql':
+            raise ValueError("The 'sql' execution mode keeps no monthly revenue store")
+        store = self.monthly_revenue_store()
+        with self.db_lock:
+            create_table(self.conn)
+            with self.conn:
+                self._write_revenue_store(store)
+        self.unsaved_months = set()
+        self._print(f"💾 Saved monthly revenue for {len(store)} months")
+
+    def monthly_revenue_store(self):
+        '''
+        The MonthlyRevenueStore of self.df: the one restored by
+        load_fact_data() or built with one pass on first use, then kept up
+        to date by append_orders(). Building it writes nothing to the
+        database; see save_revenue_store().
+        '''
+        with self.cube_lock:
+            if self.revenue_store is None:
+                store = MonthlyRevenueStore(self.distinct_counts, config.HLL_PRECISION)
+                self._store_update(store, self.df)
+                self.revenue_store = store
+                self.unsaved_months = None
+            if self.store_cached_version != self.df_version:
+                self._cache_revenue_store(self.revenue_store)
+        return self.revenue_store
+
+    def _cache_revenue_store(self, store):
+        '''
+        Put the store's monthly revenue, orders and distinct customers (and,
+        when every order is dated, its overall distinct customers) in the
+        aggregate cache, so aggregate() serves them without a scan
+        '''
+        monthly = store.to_frame().set_index('Month').rename_axis('order_month')
+        measures = {('total_amount', 'sum'): 'Total_Revenue', ('order_id', 'count'): 'Total_Orders',
+                    ('customer_id', self.distinct_func): 'Unique_Customers'}
+        for pair, column in measures.items():
+            self.cache.put((self.df_version, ('order_month',), ()) + pair, monthly[column])
+        if self.df['order_date'].notna().all():
+            self.cache.put((self.df_version, (), (), 'customer_id', self.distinct_func),
+                           pd.Series([store.distinct_customers()]))
+        self.store_cached_version = self.df_version
+
+    def _restore_revenue_store(self, refresh):
+        '''
+        Reuse the monthly_revenue table saved by an earlier run on this fact table
+
+        The saved store is kept if it has the same distinct count settings
+        and was saved at the ingestion batch the fact table had before
+        refresh (the refresh_fact_table() result). Months a partial refresh
+        rebuilt are recomputed from self.df and left unsaved; when the
+        store's order count then disagrees with self.df (e.g. after a
+        different period), or after a full refresh, the store is rebuilt on
+        first use instead.
+        '''
+        with self.db_lock:
+            store = MonthlyRevenueStore.load(self.conn)
+            state = refresh_state(self.conn, MONTHLY_REVENUE_TABLE)
+        if store is None or state is None or refresh['mode'] == 'full' or \
+                (store.distinct_counts, store.precision) != (self.distinct_counts,
+                                                             config.HLL_PRECISION):
+            return None
+        if state[0] != (refresh['batch_id'] if refresh['mode'] == 'up-to-date'
+                        else refresh['previous_batch_id']):
+            return None
+
+        months = [pd.Period(month, freq='M') for month in refresh['months']]
+        store.drop(months)
+        for month in months:
+            self._store_update(store, self.window(month.start_time, month.end_time))
+        if sum(store.orders.values()) != int(self.df['order_date'].notna().sum()):
+            return None
+
+        self.revenue_store = store
+        self.unsaved_months = set(months)
+        self._print(f"♻️ Restored monthly revenue for {len(store)} months"
+                    + (f", recomputed {len(months)}" if months else ""))
+        return store
+
+    def _lookup_keys(self, col, ids):
+        '''
+        Surrogate keys of IDs, -1 for IDs not in the dictionary
+
+        IDs of the encoded frame are looked up in the dictionary built by
+        encode(), whose hash table pandas builds on the first lookup and
+        keeps; IDs added since are found in appended_keys.
+        '''
+        codes = self.encoded_dictionaries[col].get_indexer(ids)
+        appended = self.appended_keys[col]
+        missing = np.flatnonzero(codes < 0)
+        if appended and len(missing):
+            codes[missing] = [appended.get(value, -1) for value in ids.to_numpy()[missing]]
+        return codes
+
+    def _encode_batch(self, orders):
+        '''
+        A batch of orders in the layout of the encoded frame, extending the
+        surrogate key dictionaries and the categories with its new values
+        '''
+        batch = orders.reindex(columns=self.df.columns)
+        for col, dictionary in list(self.dictionaries.items()):
+            ids = orders[col]
+            codes = self._lookup_keys(col, ids)
+            new = ids[(codes < 0) & ids.notna().to_numpy()].unique()
+            if len(new):
+                start = len(dictionary)
+                self.dictionaries[col] = dictionary.append(pd.Index(new, name=col))
+                self.appended_keys[col].update(zip(new, range(start, start + len(new))))
+                if col in self.id_hashes:
+                    self.id_hashes[col] = np.concatenate([self.id_hashes[col], hash_values(new)])
+                codes = self._lookup_keys(col, ids)
+            batch[col] = codes.astype(np.int32)
+
+        for col in batch.columns:
+            dtype = self.df[col].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                categories = dtype.categories.union(pd.Index(batch[col].dropna().unique()),
+                                                    sort=False)
+                batch[col] = pd.Categorical(batch[col], categories=categories)
+            elif pd.api.types.is_integer_dtype(dtype) and batch[col].notna().all():
+                batch[col] = pd.to_numeric(batch[col], downcast='integer')
+        return batch
+
+    def _merge_sorted(self, batch):
+        '''self.df with a batch sorted by order_date merged in, still sorted'''
+        df = self.df
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype) and \
+                    len(batch[col].cat.categories) > len(df[col].cat.categories):
+                df = df.assign(**{col: df[col].cat.set_categories(batch[col].cat.categories)})
+
+        merged = pd.concat([df, batch], ignore_index=True)
+        inserts = df['order_date'].searchsorted(batch['order_date'], side='right')
+        if len(batch) and inserts[0] < len(df):
+            # Batch row j lands before frame row inserts[j]; frame rows shift
+            # down by the batch rows landing at or before them
+            order = np.empty(len(merged), dtype=np.intp)
+            order[inserts + np.arange(len(batch))] = np.arange(len(df), len(merged))
+            order[np.arange(len(df)) + np.searchsorted(inserts, np.arange(len(df)),
+                                                       side='right')] = np.arange(len(df))
+            merged = merged.take(order).reset_index(drop=True)
+        return merged
+
+    def _insert_orders(self, orders):
+        '''Append orders (original IDs) to orders_analysis, in the caller's transaction'''
+        columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({ANALYSIS_TABLE})")]
+        if not columns:
+            raise ValueError(f"No {ANALYSIS_TABLE} table to append orders to")
+        rows = orders.reindex(columns=[col for col in columns if col != 'order_month'])
+        # Timestamps as the sqlite3 adapter writes them, microseconds only if set
+        dates = rows['order_date']
+        text = dates.dt.strftime('%Y-%m-%d %H:%M:%S')
+        micro = dates.dt.microsecond.fillna(0).astype(int)
+        rows['order_date'] = text.where(micro == 0, text + '.' + micro.astype(str).str.zfill(6))
+        if 'order_month' in columns:
+            rows['order_month'] = dates.dt.strftime('%Y-%m')
+        rows = rows.astype(object).where(rows.notna(), None)
+        self.conn.executemany(f"INSERT INTO {ANALYSIS_TABLE} ({', '.join(rows.columns)}) "
+                              f"VALUES ({', '.join('?' * len(rows.columns))})",
+                              rows.itertuples(index=False, name=None))
+
+    def append_orders(self, orders):
+        '''
+        Add a batch of new orders (with the columns of the analysis table
+        and the original IDs) to the analysis and to orders_analysis
+
+        Orders placed outside self.period are ignored. In the pandas
+        execution mode the batch is encoded with the frame's dictionaries
+        (extended with the IDs it introduces), merged into the sorted frame
+        by binary search, and folded into the monthly revenue store, which
+        touches only the months the batch falls in. The batch rows and the
+        store's changed (and unsaved) months are written in one transaction.
+        In the 'sql'
+        mode the batch is only written to the table. Cached aggregates and
+        the cube are rebuilt on their next use. Returns the months updated.
+        '''
+        orders = orders.copy()
+        orders['order_date'] = pd.to_datetime(orders['order_date'], format='ISO8601')
+        if 'total_amount' not in orders.columns:
+            orders['total_amount'] = orders['price'] * orders['quantity']
+        if self.period is not None:
+            for _, op, value in date_bounds(*self.period):
+                orders = orders[FILTER_OPERATORS[op](orders['order_date'], value)]
+        orders = orders.sort_values('order_date', kind='stable', ignore_index=True)
+
+        if self.execution_mode == 'sql':
+            months = sorted(orders['order_date'].dropna().dt.to_period('M').unique())
+            with self.db_lock, self.conn:
+                self._insert_orders(orders)
+        else:
+            if self.df is None:
+                raise ValueError("No analysis frame to append orders to; load data first")
+            store = self.monthly_revenue_store()
+            batch = self._encode_batch(orders) if self.dictionaries else orders.reindex(
+                columns=self.df.columns)
+            months = self._store_update(store, batch)
+            try:
+                with self.db_lock:
+                    create_table(self.conn)
+                    with self.conn:
+                        self._insert_orders(orders)
+                        self._write_revenue_store(store, months)
+            except Exception:
+                # The store already holds the batch; rebuild it from the frame
+                self.revenue_store = None
+                raise
+            self.unsaved_months = set()
+            self._df = self._merge_sorted(batch)
+
+        self.invalidate()
+        self._print(f"➕ Appended {len(orders):,} orders"
+                    + (f", updated months: {', '.join(str(month) for month in months)}"
+                       if months else ""))
+        return months
+
+    def _group_key(self, df, key):
+        if key in DERIVED_KEYS:
+            return DERIVED_KEYS[key](df).rename(key)
+        return df[key]
+
+    def build_cube(self):
+        '''
+        Scan self.df once into an OrderCube over CUBE_DIMENSIONS
+
+        Unfiltered sums, counts and means grouped by any subset of the
+        dimensions are afterwards rolled up from the cube cells instead of
+        rescanning the orders. Built on first use by aggregate().
+        '''
+        with self.cube_lock:
+            if self.cube is None:
+                df = self.df
+                keys = {key: self._group_key(df, key) for key in CUBE_DIMENSIONS}
+                measures = {col: funcs for col, funcs in CUBE_MEASURES.items() if col in df.columns}
+                df = self._without_missing_ids(df, (), set(measures))
+                self.cube = OrderCube.build(df, keys, measures)
+                self._print(f"🧊 Built aggregate cube: {len(self.cube):,} cells from {len(df):,} orders "
+                            f"({self.cube.memory_usage()/1e6:.2f} MB)")
+        return self.cube
+
+    def create_indexes(self):
+        '''Index orders_analysis on order_date for date-range filters'''
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                   (ANALYSIS_TABLE,)).fetchone()
+        if exists:
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{ANALYSIS_TABLE}_order_date "
+                              f"ON {ANALYSIS_TABLE}(order_date)")
+            self.conn.commit()
+
+    def _aggregate_sql(self, keys, pairs, filters):
+        '''Compute aggregates with one GROUP BY query on orders_analysis'''
+        if self.period is not None:
+            filters = tuple(date_bounds(*self.period)) + filters
+        key_exprs = [DERIVED_KEY_SQL.get(key, key) for key in keys]
+        columns = [f"{expr} AS k{i}" for i, expr in enumerate(key_exprs)]
+        for i, (col, func) in enumerate(pairs):
+            expr = SQL_FUNCTIONS[func].format(col)
+            if col in DATETIME_COLUMNS and func in ('min', 'max'):
+                expr = SQL_DATETIME_TEXT.format(expr)
+            columns.append(f"{expr} AS m{i}")
+        query = f"SELECT {', '.join(columns)} FROM {ANALYSIS_TABLE}"
+
+        clauses, params = [], []
+        for col, op, value in filters:
+            if op == 'in':
+                clauses.append(f"{col} IN ({', '.join('?' * len(value))})")
+                params.extend(_sql_value(v) for v in value)
+            else:
+                clauses.append(f"{col} {'=' if op == '==' else op} ?")
+                params.append(_sql_value(value))
+        # Like a pandas groupby, drop rows whose group key is missing
+        clauses += [f"{expr} IS NOT NULL" for expr in key_exprs]
+        if clauses:
+            query += f" WHERE {' AND '.join(clauses)}"
+        if keys:
+            positions = ', '.join(str(i + 1) for i in range(len(keys)))
+            query += f" GROUP BY {positions} ORDER BY {positions}"
+
+        with self.db_lock:
+            raw = pd.read_sql(query, self.conn, params=params)
+
+        index = None
+        if keys:
+            levels = []
+            for i, key in enumerate(keys):
+                level = raw[f'k{i}']
+                if key == 'order_month':
+                    level = pd.PeriodIndex(level, freq='M')
+                elif key in CATEGORICAL_COLUMNS:
+                    level = level.astype('category')
+                levels.append(pd.Index(level, name=key))
+            index = levels[0] if len(levels) == 1 else pd.MultiIndex.from_arrays(levels)
+
+        result = {}
+        for i, (col, func) in enumerate(pairs):
+            values = raw[f'm{i}']
+            if col in DATETIME_COLUMNS and func in ('min', 'max'):
+                values = pd.to_datetime(values, format=SQL_DATETIME_FORMAT)
+            result[(col, func)] = values.to_numpy()
+        return pd.DataFrame(result, index=index)
+
+    def _approx_distinct(self, df, keys, col):
+        '''
+        HyperLogLog estimates of the distinct values of col per group of keys
+
+        Surrogate keys are hashed as the original IDs they stand for (see
+        key_hashes()), like the sketches of the MonthlyRevenueStore.
+        '''
+        values = df[col].to_numpy()
+        if col in self.dictionaries:
+            known = values >= 0
+            hashes = self.key_hashes(col)[values[known].astype(np.intp)]
+        else:
+            known = pd.notna(values)
+            hashes = hash_values(values[known])
+        if not keys:
+            return pd.Series([HyperLogLog(config.HLL_PRECISION).add_hashes(hashes).count()])
+
+        grouped = df.groupby([self._group_key(df, key) for key in keys], observed=True)
+        groups = grouped.ngroup().to_numpy()
+        sizes = grouped.size()
+        grouped_known = groups[known] >= 0
+        sketches = group_sketches(groups[known][grouped_known], len(sizes), hashes[grouped_known],
+                                  config.HLL_PRECISION)
+        return pd.Series([sketch.count() for sketch in sketches], index=sizes.index)
+
+    def _without_missing_ids(self, df, keys, measured):
+        '''
+        df with the surrogate key -1 of missing IDs treated as missing: rows
+        without the ID dropped when it is a group key, the key replaced by
+        NaN when it is measured, as groupby and agg treat null IDs
+        '''
+        for col in self.dictionaries:
+            if col not in df.columns or (col not in keys and col not in measured):
+                continue
+            missing = df[col].to_numpy() < 0
+            if not missing.any():
+                continue
+            if col in keys:
+                df = df[~missing]
+            else:
+                df = df.assign(**{col: df[col].where(~missing)})
+        return df
+
+    def _cube_ready(self):
+        return self.df is not None and all(
+            key in DERIVED_KEYS or key in self.df.columns for key in CUBE_DIMENSIONS)
+
+    def aggregate(self, keys, measures, filters=()):
+        '''
+        Group self.df by keys and aggregate measures, reusing cached results
+
+        keys is a list of columns or DERIVED_KEYS names (empty for a grand
+        total); measures maps a column to a function name or list of names,
+        as in DataFrame.agg; filters is a sequence of (column, operator,
+        value) with operators from FILTER_OPERATORS; order_date ranges
+        slice the sorted frame instead of masking it. Every (column,
+        function) result is cached separately, so a section asking for
+        measures another section already computed costs no scan at all.
+        Besides the DataFrame.agg functions, 'approx_nunique' estimates
+        distinct counts with one HyperLogLog sketch per group.
+        Unfiltered aggregates the cube covers are rolled up from it; the
+        rest (distinct counts, per-customer groups) scan self.df.
+        Returns a copy the caller may modify.
+        '''
+        keys = tuple(keys)
+        filters = tuple((col, op, tuple(value) if isinstance(value, list) else value)
+                        for col, op, value in filters)
+        pairs = [(col, func) for col, funcs in measures.items()
+                 for func in (funcs if isinstance(funcs, list) else [funcs])]
+
+        base = (self.df_version, keys, filters)
+        results = {pair: self.cache.get(base + pair) for pair in pairs}
+        missing = [pair for pair, value in results.items() if value is None]
+
+        if missing and self.execution_mode == 'sql':
+            computed = self._aggregate_sql(keys, missing, filters)
+            for pair in missing:
+                results[pair] = computed[pair]
+                self.cache.put(base + pair, computed[pair])
+            missing = []
+
+        if missing and not filters and self._cube_ready() and \
+                self.build_cube().covers(keys, missing):
+            computed = self.cube.rollup(keys, missing)
+            for pair in missing:
+                results[pair] = computed[pair]
+                self.cache.put(base + pair, computed[pair])
+            missing = []
+
+        if missing:
+            df = self.df
+            for col, op, value in filters:
+                if col == 'order_date' and op in DATE_BOUND_SIDES:
+                    df = self._date_slice(df, op, value)
+                else:
+                    df = df[FILTER_OPERATORS[op](df[col], value)]
+            df = self._without_missing_ids(df, keys, {col for col, _ in missing})
+
+            exact = [(col, func) for col, func in missing if func != 'approx_nunique']
+            spec = {}
+            for col, func in exact:
+                spec.setdefault(col, []).append(func)
+            if not exact:
+                computed = {}
+            elif keys:
+                computed = df.groupby([self._group_key(df, key) for key in keys],
+                                      observed=True).agg(spec)
+            else:
+                computed = pd.DataFrame({(col, func): [df[col].agg(func)]
+                                         for col, func in exact})
+            computed = {pair: computed[pair] for pair in exact}
+            for col, func in missing:
+                if func == 'approx_nunique':
+                    computed[(col, func)] = self._approx_distinct(df, keys, col)
+
+            for pair in missing:
+                results[pair] = computed[pair]
+                self.cache.put(base + pair, computed[pair])
+
+        result = pd.concat([results[pair] for pair in pairs], axis=1, keys=pairs)
+        if all(not isinstance(funcs, list) for funcs in measures.values()):
+            result.columns = result.columns.droplevel(1)
+        return result.copy()
+
+    def total(self, column, func, filters=()):
+        '''A cached grand-total aggregate of one column as a scalar'''
+        return self.aggregate((), {column: func}, filters).iloc[0, 0]
+
+    def distinct_customers(self, keys=(), filters=()):
+        '''
+        Distinct customers per group of keys (a scalar without keys),
+        counted as set by distinct_counts
+
+        Every section counts customers here. In the 'pandas' mode monthly
+        and overall counts come from the MonthlyRevenueStore.
+        '''
+        if self.execution_mode == 'pandas' and not filters and \
+                tuple(keys) in ((), ('order_month',)):
+            self.monthly_revenue_store()
+        counts = self.aggregate(keys, {'customer_id': self.distinct_func}, filters)['customer_id']
+        return counts if keys else counts.iloc[0]
+
+    def encode(self):
+        '''Dictionary-encode self.df in place and report the memory saved'''
+        self.df, self.dictionaries, self.memory_report = encode_frame(self.df)
+        self.encoded_dictionaries = dict(self.dictionaries)
+        self.id_hashes = {}
+        self.appended_keys = {col: {} for col in self.dictionaries}
+
+        before = self.memory_report['bytes_before'].sum()
+        after = self.memory_report['bytes_after'].sum()
+        self._print(f"💾 Encoded analysis frame: {before/1e6:.1f} MB -> {after/1e6:.1f} MB")
+        for col, row in self.memory_report[self.memory_report['bytes_saved'] > 0].iterrows():
+            self._print(f"   • {col}: {row['dtype']}, saved {row['bytes_saved']/1e6:.2f} MB")
+        return self.memory_report
+
+    def decode(self, column, codes):
+        '''
+        Map surrogate keys of a column back to the original IDs (query
+        results of the 'sql' execution mode already hold the original IDs)
+        '''
+        if self.execution_mode == 'sql' or column not in self.dictionaries:
+            return codes
+        # The key -1 of a missing ID decodes to NaN
+        return self.dictionaries[column].take(np.asarray(codes), allow_fill=True,
+                                              fill_value=np.nan)
+
+    def _render(self, name, data):
+        '''Draw a section's chart now, or queue it when running headless'''
+        if self.headless:
+            self.pending_charts.append((name, data))
+            return
+        CHARTS[name](data, chart_path(name))
+        plt.show()
 
-    def load_sample_data(self):
+    def render_charts(self, workers=None):
+        '''
+        Render the queued charts of a headless run, one per worker process
+
+        Charts are drawn from the aggregate frames the sections returned,
+        at config.DPI in config.EXPORT_FORMAT. Returns the written paths.
+        '''
+        charts, self.pending_charts = self.pending_charts, []
+        if not charts:
+            return []
+
+        tasks = [(name, data, config.DPI, config.EXPORT_FORMAT) for name, data in charts]
+        if workers == 1:
+            paths = [_render_chart(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers or min(len(tasks), os.cpu_count() or 1)) as pool:
+                futures = [pool.submit(instrumentation.in_worker(_render_chart), *task)
+                           for task in tasks]
+                paths = [instrumentation.gather(future.result()) for future in futures]
+
+        self._print(f"\n🖼️ Rendered {len(paths)} charts:")
+        for path in paths:
+            self._print(f"   • {path}")
+        return paths
+
+    def load_sample_data(self, seed=42, encode=True):
         '''
         Create sample data for demonstration purposes
         In real implementation, you would load actual Olist dataset
+
+        The table is saved with its original IDs; with encode=True the
+        in-memory frame is then dictionary-encoded (see encode()).
         '''
-        np.random.seed(42)
+        rng = np.random.default_rng(seed)
 
         # Generate sample orders data
         n_orders = 10000
@@ -45,98 +1069,106 @@ class EcommerceAnalyzer:
 
         orders_data = {
             'order_id': [f'ORD_{i:06d}' for i in range(n_orders)],
-            'customer_id': [f'CUST_{np.random.randint(1, 5000):06d}' for _ in range(n_orders)],
-            'order_date': np.random.choice(order_dates, n_orders),
-            'product_category': np.random.choice([
+            'customer_id': [f'CUST_{i:06d}' for i in rng.integers(1, 5000, n_orders)],
+            'order_date': rng.choice(order_dates, n_orders),
+            'product_category': rng.choice([
                 'Electronics', 'Home & Garden', 'Fashion', 'Sports & Leisure',
                 'Health & Beauty', 'Auto', 'Books', 'Toys', 'Food & Beverages'
             ], n_orders, p=[0.15, 0.12, 0.18, 0.08, 0.10, 0.07, 0.05, 0.08, 0.17]),
-            'price': np.random.lognormal(3.5, 0.8, n_orders).round(2),
-            'quantity': np.random.choice([1, 2, 3, 4], n_orders, p=[0.7, 0.2, 0.08, 0.02]),
-            'customer_state': np.random.choice([
+            'price': rng.lognormal(3.5, 0.8, n_orders).round(2),
+            'quantity': rng.choice([1, 2, 3, 4], n_orders, p=[0.7, 0.2, 0.08, 0.02]),
+            'customer_state': rng.choice([
                 'SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA', 'DF', 'GO', 'PE'
             ], n_orders, p=[0.4, 0.15, 0.12, 0.08, 0.07, 0.05, 0.04, 0.03, 0.03, 0.03]),
-            'payment_type': np.random.choice([
+            'payment_type': rng.choice([
                 'credit_card', 'boleto', 'debit_card', 'voucher'
             ], n_orders, p=[0.75, 0.15, 0.08, 0.02]),
-            'review_score': np.random.choice([1, 2, 3, 4, 5], n_orders, p=[0.05, 0.05, 0.15, 0.25, 0.5])
+            'review_score': rng.choice([1, 2, 3, 4, 5], n_orders, p=[0.05, 0.05, 0.15, 0.25, 0.5])
         }
 
+        self.fact_batch = None
         self.df = pd.DataFrame(orders_data)
         self.df['total_amount'] = self.df['price'] * self.df['quantity']
         self.df['order_date'] = pd.to_datetime(self.df['order_date'])
 
         # Save to database
-        self.df.to_sql('orders_analysis', self.conn, if_exists='replace', index=False)
+        self.df.to_sql(ANALYSIS_TABLE, self.conn, if_exists='replace', index=False)
+        self.create_indexes()
+
+        self._print(f"✅ Sample dataset created with {len(self.df):,} orders")
+        self.prune_to_period()
+        self._print(f"📊 Dataset shape: {self.df.shape}")
+        if encode:
+            self.encode()
+        return self.df
 
-        print(f"✅ Sample dataset created with {len(self.df):,} orders")
-        print(f"📊 Dataset shape: {self.df.shape}")
+    def load_fact_data(self, encode=True, full_refresh=False):
+        '''
+        Load orders from the normalized tables (customers, orders,
+        order_items, products, order_payments, order_reviews) of this
+        database
+
+        The joined one-row-per-order fact table orders_analysis is kept in
+        the database and only the order months touched by incremental
+        ingestion batches are rebuilt (see fact_table.refresh_fact_table).
+        In the 'sql' execution mode the frame is not read into memory.
+        '''
+        result = refresh_fact_table(self.conn, full=full_refresh)
+        self.fact_batch = result['batch_id']
+        self._print(f"✅ Fact table {ANALYSIS_TABLE}: {result['mode']} refresh, "
+                    f"{result['rows']:,} orders")
+        if result['months']:
+            self._print(f"   • Rebuilt months: {', '.join(result['months'])}")
+
+        if self.execution_mode == 'sql':
+            self.invalidate()
+            return None
+
+        self.df = load_fact_frame(self.conn)
+        self.prune_to_period()
+        self._print(f"📊 Dataset shape: {self.df.shape}")
+        if encode:
+            self.encode()
+        self._restore_revenue_store(result)
         return self.df
 
     def revenue_trend_analysis(self):
         '''Analyze revenue trends over time'''
-        print("\n📈 REVENUE TREND ANALYSIS")
-        print("=" * 50)
-
-        # Monthly revenue analysis
-        monthly_revenue = self.df.groupby(self.df['order_date'].dt.to_period('M')).agg({
-            'total_amount': 'sum',
-            'order_id': 'count',
-            'customer_id': 'nunique'
-        }).reset_index()
-
-        monthly_revenue.columns = ['Month', 'Total_Revenue', 'Total_Orders', 'Unique_Customers']
-        monthly_revenue['Avg_Order_Value'] = monthly_revenue['Total_Revenue'] / monthly_revenue['Total_Orders']
+        self._print("\n📈 REVENUE TREND ANALYSIS")
+        self._print("=" * 50)
+
+        # Monthly revenue analysis, from the incrementally maintained store
+        # in memory or with one GROUP BY query in the 'sql' execution mode
+        if self.execution_mode == 'sql':
+            monthly_revenue = self.aggregate(['order_month'], {
+                'total_amount': 'sum',
+                'order_id': 'count'
+            })
+            monthly_revenue['customer_id'] = self.distinct_customers(['order_month'])
+            monthly_revenue = monthly_revenue.reset_index()
+
+            monthly_revenue.columns = ['Month', 'Total_Revenue', 'Total_Orders', 'Unique_Customers']
+            monthly_revenue['Avg_Order_Value'] = monthly_revenue['Total_Revenue'] / monthly_revenue['Total_Orders']
+        else:
+            monthly_revenue = self.monthly_revenue_store().to_frame()
+        unique_customers = self.distinct_customers()
 
         # Display summary
-        print(f"📊 Total Revenue: ${monthly_revenue['Total_Revenue'].sum():,.2f}")
-        print(f"📦 Total Orders: {monthly_revenue['Total_Orders'].sum():,}")
-        print(f"👥 Unique Customers: {self.df['customer_id'].nunique():,}")
-        print(f"💰 Average Order Value: ${monthly_revenue['Avg_Order_Value'].mean():.2f}")
-
-        # Create visualization
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle('E-Commerce Business Performance Dashboard', fontsize=16, fontweight='bold')
-
-        # Monthly revenue trend
-        ax1.plot(monthly_revenue.index, monthly_revenue['Total_Revenue'], marker='o', linewidth=2)
-        ax1.set_title('Monthly Revenue Trend')
-        ax1.set_ylabel('Revenue ($)')
-        ax1.grid(True, alpha=0.3)
-        ax1.tick_params(axis='x', rotation=45)
-
-        # Monthly order count
-        ax2.bar(monthly_revenue.index, monthly_revenue['Total_Orders'], alpha=0.7)
-        ax2.set_title('Monthly Order Count')
-        ax2.set_ylabel('Number of Orders')
-        ax2.grid(True, alpha=0.3)
-
-        # Average order value trend
-        ax3.plot(monthly_revenue.index, monthly_revenue['Avg_Order_Value'], 
-                marker='s', color='green', linewidth=2)
-        ax3.set_title('Average Order Value Trend')
-        ax3.set_ylabel('AOV ($)')
-        ax3.grid(True, alpha=0.3)
-
-        # Customer acquisition trend
-        ax4.plot(monthly_revenue.index, monthly_revenue['Unique_Customers'], 
-                marker='^', color='orange', linewidth=2)
-        ax4.set_title('Monthly Unique Customers')
-        ax4.set_ylabel('Unique Customers')
-        ax4.grid(True, alpha=0.3)
-
-        plt.tight_layout()
-        plt.savefig('revenue_trend_analysis.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        self._print(f"📊 Total Revenue: ${monthly_revenue['Total_Revenue'].sum():,.2f}")
+        self._print(f"📦 Total Orders: {monthly_revenue['Total_Orders'].sum():,}")
+        self._print(f"👥 Unique Customers: {unique_customers:,}")
+        self._print(f"💰 Average Order Value: ${monthly_revenue['Avg_Order_Value'].mean():.2f}")
+
+        self._render('revenue_trend_analysis', monthly_revenue)
 
         return monthly_revenue
 
     def product_category_analysis(self):
         '''Analyze performance by product category'''
-        print("\n🛍️ PRODUCT CATEGORY ANALYSIS")
-        print("=" * 50)
+        self._print("\n🛍️ PRODUCT CATEGORY ANALYSIS")
+        self._print("=" * 50)
 
-        category_stats = self.df.groupby('product_category').agg({
+        category_stats = self.aggregate(['product_category'], {
             'total_amount': ['sum', 'mean'],
             'order_id': 'count',
             'review_score': 'mean',
@@ -147,127 +1179,65 @@ class EcommerceAnalyzer:
                                 'Avg_Rating', 'Total_Quantity']
         category_stats = category_stats.sort_values('Total_Revenue', ascending=False)
 
-        print("\n🏆 Top Product Categories by Revenue:")
-        print(category_stats.head(10).to_string())
-
-        # Visualization
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
-        fig.suptitle('Product Category Performance Analysis', fontsize=16, fontweight='bold')
-
-        # Top categories by revenue
-        top_categories = category_stats.head(8)
-        ax1.barh(top_categories.index, top_categories['Total_Revenue'])
-        ax1.set_title('Top Categories by Revenue')
-        ax1.set_xlabel('Total Revenue ($)')
-
-        # Average order value by category
-        ax2.bar(top_categories.index, top_categories['Avg_Order_Value'], alpha=0.7)
-        ax2.set_title('Average Order Value by Category')
-        ax2.set_ylabel('AOV ($)')
-        ax2.tick_params(axis='x', rotation=45)
-
-        # Customer satisfaction by category
-        ax3.bar(top_categories.index, top_categories['Avg_Rating'], 
-                color='green', alpha=0.7)
-        ax3.set_title('Average Rating by Category')
-        ax3.set_ylabel('Average Rating (1-5)')
-        ax3.set_ylim(0, 5)
-        ax3.tick_params(axis='x', rotation=45)
-
-        # Order volume by category
-        ax4.pie(top_categories['Order_Count'], labels=top_categories.index, autopct='%1.1f%%')
-        ax4.set_title('Order Distribution by Category')
-
-        plt.tight_layout()
-        plt.savefig('category_analysis.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        self._print("\n🏆 Top Product Categories by Revenue:")
+        self._print(category_stats.head(10).to_string())
+
+        self._render('category_analysis', category_stats)
 
         return category_stats
 
     def geographic_analysis(self):
         '''Analyze performance by geographic region'''
-        print("\n🗺️ GEOGRAPHIC ANALYSIS")
-        print("=" * 50)
+        self._print("\n🗺️ GEOGRAPHIC ANALYSIS")
+        self._print("=" * 50)
 
-        geo_stats = self.df.groupby('customer_state').agg({
+        geo_stats = self.aggregate(['customer_state'], {
             'total_amount': ['sum', 'mean'],
             'order_id': 'count',
-            'customer_id': 'nunique',
             'review_score': 'mean'
-        }).round(2)
+        })
 
-        geo_stats.columns = ['Total_Revenue', 'AOV', 'Total_Orders', 
-                           'Unique_Customers', 'Avg_Rating']
+        geo_stats.columns = ['Total_Revenue', 'AOV', 'Total_Orders', 'Avg_Rating']
+        geo_stats.insert(3, 'Unique_Customers', self.distinct_customers(['customer_state']))
+        geo_stats = geo_stats.round(2)
         geo_stats['Revenue_per_Customer'] = (geo_stats['Total_Revenue'] / 
                                            geo_stats['Unique_Customers']).round(2)
         geo_stats = geo_stats.sort_values('Total_Revenue', ascending=False)
 
-        print("\n🌟 Top States by Revenue:")
-        print(geo_stats.head(10).to_string())
-
-        # Visualization
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle('Geographic Performance Analysis', fontsize=16, fontweight='bold')
-
-        top_states = geo_stats.head(10)
-
-        # Revenue by state
-        ax1.bar(top_states.index, top_states['Total_Revenue'])
-        ax1.set_title('Revenue by State')
-        ax1.set_ylabel('Total Revenue ($)')
-        ax1.tick_params(axis='x', rotation=45)
+        self._print("\n🌟 Top States by Revenue:")
+        self._print(geo_stats.head(10).to_string())
 
-        # Customer distribution
-        ax2.pie(top_states['Unique_Customers'], labels=top_states.index, autopct='%1.1f%%')
-        ax2.set_title('Customer Distribution by State')
-
-        # Revenue per customer
-        ax3.bar(top_states.index, top_states['Revenue_per_Customer'], color='green')
-        ax3.set_title('Revenue per Customer by State')
-        ax3.set_ylabel('Revenue per Customer ($)')
-        ax3.tick_params(axis='x', rotation=45)
-
-        # Average rating by state
-        ax4.bar(top_states.index, top_states['Avg_Rating'], color='orange', alpha=0.7)
-        ax4.set_title('Average Rating by State')
-        ax4.set_ylabel('Average Rating (1-5)')
-        ax4.set_ylim(0, 5)
-        ax4.tick_params(axis='x', rotation=45)
-
-        plt.tight_layout()
-        plt.savefig('geographic_analysis.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        self._render('geographic_analysis', geo_stats)
 
         return geo_stats
 
-    def customer_segmentation_analysis(self):
-        '''Perform RFM-like customer segmentation'''
-        print("\n👥 CUSTOMER SEGMENTATION ANALYSIS")
-        print("=" * 50)
+    def customer_segmentation_analysis(self, rule_set='value', density_bins=50):
+        '''
+        Perform RFM-like customer segmentation
+
+        Customers are scored into quantiles at config.RFM_PERCENTILES and
+        segmented by one of the rfm.RFM_RULE_SETS, all as array operations.
+        The dashboard plots customers as a density_bins x density_bins grid.
+        '''
+        self._print("\n👥 CUSTOMER SEGMENTATION ANALYSIS")
+        self._print("=" * 50)
 
         # Calculate RFM metrics
-        current_date = self.df['order_date'].max()
+        current_date = self.total('order_date', 'max')
 
-        rfm = self.df.groupby('customer_id').agg({
-            'order_date': lambda x: (current_date - x.max()).days,  # Recency
+        rfm = self.aggregate(['customer_id'], {
+            'order_date': 'max',  # Recency, from the last order date
             'order_id': 'count',  # Frequency
             'total_amount': 'sum'  # Monetary
         }).reset_index()
 
         rfm.columns = ['customer_id', 'Recency', 'Frequency', 'Monetary']
+        rfm['Recency'] = (current_date - rfm['Recency']).dt.days
+        rfm['customer_id'] = self.decode('customer_id', rfm['customer_id'])
 
         # Create RFM segments
-        def assign_rfm_segment(row):
-            if row['Frequency'] >= 3 and row['Monetary'] >= 200:
-                return 'High Value'
-            elif row['Frequency'] >= 2 and row['Monetary'] >= 100:
-                return 'Medium Value'
-            elif row['Recency'] <= 90:
-                return 'Recent Customer'
-            else:
-                return 'Low Value'
-
-        rfm['Segment'] = rfm.apply(assign_rfm_segment, axis=1)
+        rfm = rfm_scores(rfm, config.RFM_PERCENTILES)
+        rfm['Segment'] = assign_segments(rfm, rule_set)
 
         segment_stats = rfm.groupby('Segment').agg({
             'customer_id': 'count',
@@ -276,68 +1246,27 @@ class EcommerceAnalyzer:
             'Monetary': ['mean', 'sum']
         }).round(2)
 
-        print("\n📊 Customer Segment Analysis:")
-        print(segment_stats.to_string())
-
-        # Visualization
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle('Customer Segmentation Analysis', fontsize=16, fontweight='bold')
-
-        segment_summary = rfm.groupby('Segment').agg({
-            'customer_id': 'count',
-            'Monetary': 'sum'
-        }).reset_index()
+        self._print("\n📊 Customer Segment Analysis:")
+        self._print(segment_stats.to_string())
 
-        # Customer distribution by segment
-        ax1.pie(segment_summary['customer_id'], labels=segment_summary['Segment'], 
-                autopct='%1.1f%%')
-        ax1.set_title('Customer Distribution by Segment')
-
-        # Revenue by segment
-        ax2.bar(segment_summary['Segment'], segment_summary['Monetary'])
-        ax2.set_title('Total Revenue by Segment')
-        ax2.set_ylabel('Total Revenue ($)')
-        ax2.tick_params(axis='x', rotation=45)
-
-        # RFM scatter plot
-        scatter = ax3.scatter(rfm['Frequency'], rfm['Monetary'], 
-                            c=rfm['Recency'], cmap='viridis', alpha=0.6)
-        ax3.set_xlabel('Frequency')
-        ax3.set_ylabel('Monetary ($)')
-        ax3.set_title('Customer RFM Analysis')
-        plt.colorbar(scatter, ax=ax3, label='Recency (days)')
-
-        # Average metrics by segment
-        avg_metrics = rfm.groupby('Segment')[['Recency', 'Frequency', 'Monetary']].mean()
-        x_pos = range(len(avg_metrics.index))
-        width = 0.25
-
-        ax4.bar([x - width for x in x_pos], avg_metrics['Frequency'], 
-               width, label='Frequency', alpha=0.7)
-        ax4.bar(x_pos, avg_metrics['Monetary']/100, 
-               width, label='Monetary/100', alpha=0.7)
-        ax4.bar([x + width for x in x_pos], avg_metrics['Recency']/10, 
-               width, label='Recency/10', alpha=0.7)
-
-        ax4.set_xlabel('Segment')
-        ax4.set_ylabel('Normalized Values')
-        ax4.set_title('Average RFM Metrics by Segment')
-        ax4.set_xticks(x_pos)
-        ax4.set_xticklabels(avg_metrics.index, rotation=45)
-        ax4.legend()
-
-        plt.tight_layout()
-        plt.savefig('customer_segmentation.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        segments = {
+            'summary': rfm.groupby('Segment').agg({
+                'customer_id': 'count',
+                'Monetary': 'sum'
+            }).reset_index(),
+            'averages': rfm.groupby('Segment')[['Recency', 'Frequency', 'Monetary']].mean(),
+            'density': rfm_density(rfm, density_bins)
+        }
+        self._render('customer_segmentation', segments)
 
         return rfm, segment_stats
 
     def payment_analysis(self):
         '''Analyze payment methods and patterns'''
-        print("\n💳 PAYMENT ANALYSIS")
-        print("=" * 50)
+        self._print("\n💳 PAYMENT ANALYSIS")
+        self._print("=" * 50)
 
-        payment_stats = self.df.groupby('payment_type').agg({
+        payment_stats = self.aggregate(['payment_type'], {
             'total_amount': ['sum', 'mean', 'count'],
             'review_score': 'mean'
         }).round(2)
@@ -346,56 +1275,74 @@ class EcommerceAnalyzer:
         payment_stats['Market_Share'] = (payment_stats['Order_Count'] / 
                                        payment_stats['Order_Count'].sum() * 100).round(1)
 
-        print("\n💰 Payment Method Performance:")
-        print(payment_stats.to_string())
-
-        # Visualization
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
-        fig.suptitle('Payment Method Analysis', fontsize=16, fontweight='bold')
-
-        # Market share
-        ax1.pie(payment_stats['Market_Share'], labels=payment_stats.index, 
-                autopct='%1.1f%%')
-        ax1.set_title('Payment Method Market Share')
-
-        # Revenue by payment type
-        ax2.bar(payment_stats.index, payment_stats['Total_Revenue'])
-        ax2.set_title('Revenue by Payment Method')
-        ax2.set_ylabel('Total Revenue ($)')
-        ax2.tick_params(axis='x', rotation=45)
-
-        # AOV by payment type
-        ax3.bar(payment_stats.index, payment_stats['AOV'], color='green', alpha=0.7)
-        ax3.set_title('Average Order Value by Payment Method')
-        ax3.set_ylabel('AOV ($)')
-        ax3.tick_params(axis='x', rotation=45)
-
-        # Rating by payment type
-        ax4.bar(payment_stats.index, payment_stats['Avg_Rating'], 
-                color='orange', alpha=0.7)
-        ax4.set_title('Customer Satisfaction by Payment Method')
-        ax4.set_ylabel('Average Rating (1-5)')
-        ax4.set_ylim(0, 5)
-        ax4.tick_params(axis='x', rotation=45)
-
-        plt.tight_layout()
-        plt.savefig('payment_analysis.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        self._print("\n💰 Payment Method Performance:")
+        self._print(payment_stats.to_string())
+
+        self._render('payment_analysis', payment_stats)
 
         return payment_stats
 
+    def period_report(self, start=None, end=None, label='Period'):
+        '''
+        Revenue, orders, customers, average order value and top category
+        of the orders placed from day start to day end (both inclusive)
+
+        The date range filters the sorted frame by binary search, so the
+        report costs time proportional to the orders in the window.
+        '''
+        filters = date_bounds(start, end)
+        revenue = self.total('total_amount', 'sum', filters)
+        orders = self.total('order_id', 'count', filters)
+        customers = self.distinct_customers(filters=filters)
+        report = {'label': label, 'start': start, 'end': end, 'revenue': revenue,
+                  'orders': orders, 'customers': customers,
+                  'avg_order_value': revenue / orders if orders else 0.0, 'top_category': None}
+        if orders:
+            category_revenue = self.aggregate(['product_category'], {'total_amount': 'sum'},
+                                              filters)['total_amount']
+            report['top_category'] = category_revenue.idxmax()
+
+        self._print(f"\n📅 {label}: {pd.Timestamp(start):%Y-%m-%d} to {pd.Timestamp(end):%Y-%m-%d}")
+        self._print(f"   • Revenue: ${revenue:,.2f}")
+        self._print(f"   • Orders: {orders:,}")
+        self._print(f"   • Unique Customers: {customers:,}")
+        self._print(f"   • Average Order Value: ${report['avg_order_value']:.2f}")
+        if report['top_category'] is not None:
+            self._print(f"   • Top Category: {report['top_category']}")
+        return report
+
+    def rolling_report(self, days=90, end=None):
+        '''period_report() for the days days up to end (default: the last order date)'''
+        end = pd.Timestamp(end if end is not None else self.total('order_date', 'max')).normalize()
+        start = end - pd.Timedelta(days=days - 1)
+        return self.period_report(start, end, f"Last {days} days")
+
+    def quarter_report(self, quarter=None):
+        '''period_report() for a quarter such as '2018Q2' (default: that of the last order)'''
+        if quarter is None:
+            quarter = self.total('order_date', 'max')
+        quarter = pd.Period(quarter, freq='Q')
+        return self.period_report(quarter.start_time, quarter.end_time, f"Quarter {quarter}")
+
+    def recent_period_analysis(self, days=90):
+        '''Report the rolling last days days and the latest quarter'''
+        self._print("\n📅 RECENT PERIOD ANALYSIS")
+        self._print("=" * 50)
+
+        return {'rolling': self.rolling_report(days), 'quarter': self.quarter_report()}
+
     def generate_business_insights(self):
         '''Generate comprehensive business insights and recommendations'''
-        print("\n🎯 BUSINESS INSIGHTS & RECOMMENDATIONS")
-        print("=" * 60)
+        self._print("\n🎯 BUSINESS INSIGHTS & RECOMMENDATIONS")
+        self._print("=" * 60)
 
         insights = []
 
         # Revenue insights
-        total_revenue = self.df['total_amount'].sum()
-        avg_order_value = self.df['total_amount'].mean()
-        total_orders = len(self.df)
-        unique_customers = self.df['customer_id'].nunique()
+        total_revenue = self.total('total_amount', 'sum')
+        avg_order_value = self.total('total_amount', 'mean')
+        total_orders = self.total('order_id', 'count')
+        unique_customers = self.distinct_customers()
 
         insights.append(f"📊 Business Performance Summary:")
         insights.append(f"   • Total Revenue: ${total_revenue:,.2f}")
@@ -405,24 +1352,26 @@ class EcommerceAnalyzer:
         insights.append(f"   • Customer Lifetime Value: ${total_revenue/unique_customers:.2f}")
 
         # Top category insight
-        top_category = self.df.groupby('product_category')['total_amount'].sum().idxmax()
-        top_category_revenue = self.df.groupby('product_category')['total_amount'].sum().max()
+        category_revenue = self.aggregate(['product_category'], {'total_amount': 'sum'})['total_amount']
+        top_category = category_revenue.idxmax()
+        top_category_revenue = category_revenue.max()
 
         insights.append(f"\n🏆 Product Insights:")
         insights.append(f"   • Top Category: {top_category} (${top_category_revenue:,.2f})")
         insights.append(f"   • Category contributes {top_category_revenue/total_revenue*100:.1f}% of total revenue")
 
         # Geographic insights
-        top_state = self.df.groupby('customer_state')['total_amount'].sum().idxmax()
-        top_state_revenue = self.df.groupby('customer_state')['total_amount'].sum().max()
+        state_revenue = self.aggregate(['customer_state'], {'total_amount': 'sum'})['total_amount']
+        top_state = state_revenue.idxmax()
+        top_state_revenue = state_revenue.max()
 
         insights.append(f"\n🗺️ Geographic Insights:")
         insights.append(f"   • Top State: {top_state} (${top_state_revenue:,.2f})")
         insights.append(f"   • State contributes {top_state_revenue/total_revenue*100:.1f}% of total revenue")
 
         # Customer satisfaction
-        avg_rating = self.df['review_score'].mean()
-        high_rating_orders = len(self.df[self.df['review_score'] >= 4])
+        avg_rating = self.total('review_score', 'mean')
+        high_rating_orders = self.total('order_id', 'count', [('review_score', '>=', 4)])
 
         insights.append(f"\n😊 Customer Satisfaction:")
         insights.append(f"   • Average Rating: {avg_rating:.2f}/5.0")
@@ -437,25 +1386,28 @@ class EcommerceAnalyzer:
         insights.append(f"   5. Optimize inventory based on geographic and seasonal patterns")
 
         for insight in insights:
-            print(insight)
+            self._print(insight)
 
         return insights
 
     def export_results_to_csv(self):
         '''Export all analysis results to CSV files'''
-        print("\n📁 EXPORTING RESULTS")
-        print("=" * 50)
+        self._print("\n📁 EXPORTING RESULTS")
+        self._print("=" * 50)
 
-        # Monthly revenue
-        monthly_revenue = self.df.groupby(self.df['order_date'].dt.to_period('M')).agg({
+        # Monthly revenue (customers first: in the 'pandas' mode that puts
+        # the monthly revenue store's counts in the aggregate cache)
+        monthly_customers = self.distinct_customers(['order_month'])
+        monthly_revenue = self.aggregate(['order_month'], {
             'total_amount': 'sum',
-            'order_id': 'count',
-            'customer_id': 'nunique'
+            'order_id': 'count'
         })
+        monthly_revenue['customer_id'] = monthly_customers
+        monthly_revenue = monthly_revenue.rename_axis('order_date')
         monthly_revenue.to_csv('monthly_revenue_analysis.csv')
 
         # Category performance
-        category_stats = self.df.groupby('product_category').agg({
+        category_stats = self.aggregate(['product_category'], {
             'total_amount': ['sum', 'mean'],
             'order_id': 'count',
             'review_score': 'mean'
@@ -463,31 +1415,101 @@ class EcommerceAnalyzer:
         category_stats.to_csv('category_performance.csv')
 
         # Geographic analysis
-        geo_stats = self.df.groupby('customer_state').agg({
+        geo_stats = self.aggregate(['customer_state'], {
             'total_amount': ['sum', 'mean'],
-            'order_id': 'count',
-            'customer_id': 'nunique'
+            'order_id': 'count'
         })
+        geo_stats[('customer_id', self.distinct_func)] = self.distinct_customers(['customer_state'])
         geo_stats.to_csv('geographic_analysis.csv')
 
         # Customer data
-        customer_summary = self.df.groupby('customer_id').agg({
+        customer_summary = self.aggregate(['customer_id'], {
             'total_amount': 'sum',
             'order_id': 'count',
             'order_date': 'max'
         })
+        customer_summary.index = self.decode('customer_id', customer_summary.index)
         customer_summary.to_csv('customer_summary.csv')
 
-        print("✅ Results exported to CSV files:")
-        print("   • monthly_revenue_analysis.csv")
-        print("   • category_performance.csv")
-        print("   • geographic_analysis.csv")
-        print("   • customer_summary.csv")
+        self._print("✅ Results exported to CSV files:")
+        self._print("   • monthly_revenue_analysis.csv")
+        self._print("   • category_performance.csv")
+        self._print("   • geographic_analysis.csv")
+        self._print("   • customer_summary.csv")
+
+    def _print(self, *values, **kwargs):
+        '''print() to the report buffer of the calling thread's stage, if any'''
+        print(*values, file=getattr(self.output, 'buffer', None), **kwargs)
+
+    def _capture(self, func, *args, **kwargs):
+        '''Run func in this thread and return (result, the report text it printed)'''
+        self.output.buffer = io.StringIO()
+        try:
+            return func(*args, **kwargs), self.output.buffer.getvalue()
+        finally:
+            self.output.buffer = None
+
+    def run_pipeline(self, stages=None, workers=None, render_workers=None):
+        '''
+        Run the ANALYSIS_STAGES as a dependency graph and return their results
+
+        stages names a subset to run (their prerequisites are added).
+        Headless runs execute independent stages concurrently on a pool of
+        workers threads, sharing the frame, cube and aggregate cache; each
+        stage writes its report to a buffer of its own thread, printed
+        whole in pipeline order once the stage is done. MAIN_THREAD_STAGES
+        then run in this thread after the pool has shut down. Interactive
+        runs execute the stages one after another in this thread, since
+        GUI backends must only be driven from the main thread.
+        render_workers is passed on to render_charts().
+        '''
+        graph = TaskGraph()
+        for name, method, depends_on in ANALYSIS_STAGES:
+            kwargs = {'workers': render_workers} if method == 'render_charts' else {}
+            graph.add(name, getattr(self, method), depends_on=depends_on, **kwargs)
+        ordered = graph.order(stages)
+
+        if not self.headless or workers == 1:
+            results, errors = graph.run(max_workers=1, only=stages)
+        else:
+            pooled = [name for name in ordered if name not in MAIN_THREAD_STAGES]
+            for name in pooled:
+                task = graph.tasks[name]
+                task['args'] = (task['func'],) + task['args']
+                task['func'] = self._capture
+            captured, errors = graph.run(max_workers=workers, only=pooled)
+            results = {}
+            for name in pooled:
+                if name in captured:
+                    results[name], text = captured[name]
+                    print(text, end='')
+
+            for name in ordered:
+                if name not in MAIN_THREAD_STAGES:
+                    continue
+                task = graph.tasks[name]
+                failed = [dep for dep in task['depends_on'] if dep in errors]
+                if failed:
+                    errors[name] = TaskFailed(f"dependency failed: {', '.join(failed)}")
+                    continue
+                try:
+                    results[name] = task['func'](*task['args'], **task['kwargs'])
+                except Exception as e:
+                    errors[name] = e
+
+        for name in ordered:
+            if name in errors:
+                self._print(f"❌ Stage {name} failed: {errors[name]}")
+        return results
 
     def close_connection(self):
         '''Close database connection'''
+        stats = self.cache.stats()
+        if stats['hits'] or stats['misses']:
+            self._print(f"\n🧮 Aggregation cache: {stats['hits']} hits, {stats['misses']} misses "
+                        f"({stats['hit_rate']:.0%} hit rate)")
         self.conn.close()
-        print("\n🔐 Database connection closed")
+        self._print("\n🔐 Database connection closed")
 
 # =====================================
 # MAIN EXECUTION SCRIPT
@@ -500,35 +1522,62 @@ if __name__ == "__main__":
     print("🔧 Technologies: Python, SQL, Pandas, Matplotlib, Seaborn")
     print("=" * 60)
 
+    parser = argparse.ArgumentParser(description="Run the e-commerce analysis dashboards")
+    parser.add_argument('--source', choices=['sample', 'normalized'], default='sample',
+                        help="generate sample orders or read the normalized tables")
+    parser.add_argument('--db-path', default=None,
+                        help="database (default: ecommerce_data.db for sample data, "
+                             "config.DATABASE_PATH for the normalized tables)")
+    parser.add_argument('--execution-mode', choices=['pandas', 'sql'], default='pandas',
+                        help="aggregate in memory or inside SQLite")
+    parser.add_argument('--headless', action='store_true',
+                        help="render charts with the Agg backend in worker processes, without show()")
+    parser.add_argument('--render-workers', type=int, default=None,
+                        help="processes rendering charts in headless mode")
+    parser.add_argument('--stages', nargs='+', default=None,
+                        choices=[name for name, _, _ in ANALYSIS_STAGES],
+                        help="run only these stages (and the stages they need)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="threads running independent stages in headless mode")
+    parser.add_argument('--distinct-counts', choices=['exact', 'approximate'],
+                        default=config.DISTINCT_COUNTS,
+                        help="count distinct customers exactly or with HyperLogLog sketches")
+    parser.add_argument('--append', metavar='CSV', default=None,
+                        help="append the orders of a CSV file (analysis table columns, original "
+                             "IDs) to the loaded data before the analysis")
+    parser.add_argument('--save-revenue-store', action='store_true',
+                        help="save the monthly revenue aggregates for later runs on the "
+                             "normalized tables to restore")
+    parser.add_argument('--instrument', nargs='?', const=config.RUN_REPORT_FILE, default=None,
+                        metavar='REPORT', help="record timings and memory into a JSON run report")
+    args = parser.parse_args()
+    if args.instrument:
+        instrumentation.enable()
+
+    db_path = args.db_path or ('ecommerce_data.db' if args.source == 'sample'
+                               else config.DATABASE_PATH)
+
     # Initialize analyzer
-    analyzer = EcommerceAnalyzer()
+    analyzer = EcommerceAnalyzer(db_path, args.execution_mode, args.headless,
+                                 distinct_counts=args.distinct_counts)
+
+    if args.source == 'normalized':
+        df = analyzer.load_fact_data()
+    else:
+        # Load sample data (replace with real data loading in production)
+        df = analyzer.load_sample_data()
 
-    # Load sample data (replace with real data loading in production)
-    df = analyzer.load_sample_data()
+    if args.append:
+        analyzer.append_orders(pd.read_csv(args.append))
 
     # Perform comprehensive analysis
     print("\n🔄 Starting comprehensive analysis...")
 
-    # 1. Revenue trend analysis
-    monthly_revenue = analyzer.revenue_trend_analysis()
-
-    # 2. Product category analysis
-    category_performance = analyzer.product_category_analysis()
-
-    # 3. Geographic analysis
-    geographic_performance = analyzer.geographic_analysis()
-
-    # 4. Customer segmentation
-    rfm_data, segment_stats = analyzer.customer_segmentation_analysis()
-
-    # 5. Payment analysis
-    payment_performance = analyzer.payment_analysis()
-
-    # 6. Generate business insights
-    business_insights = analyzer.generate_business_insights()
-
-    # 7. Export results
-    analyzer.export_results_to_csv()
+    # Revenue, category, geographic, segmentation and payment analysis, then
+    # business insights, the CSV export and (headless) chart rendering
+    analyzer.run_pipeline(args.stages, args.workers, args.render_workers)
+    if args.save_revenue_store:
+        analyzer.save_revenue_store()
 
     # Close connection
     analyzer.close_connection()
@@ -536,3 +1585,6 @@ if __name__ == "__main__":
     print("\n✅ ANALYSIS COMPLETE!")
     print("🎯 Check generated visualizations and CSV files for detailed insights")
     print("📊 Ready for presentation to stakeholders!")
+    if args.instrument:
+        instrumentation.print_summary(instrumentation.write_report(args.instrument))
+        print(f"   • Run report: {args.instrument}")
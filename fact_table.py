@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Denormalized Order Fact Table for the E-Commerce Analyzer
+"""
+
+import sqlite3
+import argparse
+import pandas as pd
+
+import config
+from data_ingestion import METADATA_SCHEMA_SQL, OLIST_DATETIME_FORMAT
+from setup_database import create_tables
+
+FACT_TABLE = 'orders_analysis'
+
+# Columns the analyzer reads; order_month is the refresh partition
+FACT_COLUMNS = ['order_id', 'customer_id', 'order_date', 'product_category', 'price',
+                'quantity', 'customer_state', 'payment_type', 'review_score', 'total_amount']
+
+FACT_SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS {FACT_TABLE} (
+    order_id TEXT PRIMARY KEY,
+    customer_id TEXT,
+    order_date DATETIME,
+    product_category TEXT,
+    price REAL,
+    quantity INTEGER,
+    customer_state TEXT,
+    payment_type TEXT,
+    review_score INTEGER,
+    total_amount REAL,
+    order_month TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_{FACT_TABLE}_order_month ON {FACT_TABLE}(order_month);
+CREATE INDEX IF NOT EXISTS idx_{FACT_TABLE}_order_date ON {FACT_TABLE}(order_date);
+
+CREATE TABLE IF NOT EXISTS fact_refresh_state (
+    table_name TEXT PRIMARY KEY,
+    batch_id INTEGER,
+    source_orders INTEGER,
+    refreshed_at DATETIME
+);
+"""
+
+# One row per order with at least one item, built from the normalized tables
+# for the orders selected by the scope predicates:
+# - customer_id is the customer_unique_id, so repeat buyers count once
+# - product_category is that of the order's first item
+# - price and total_amount sum the items (total_amount includes freight),
+#   quantity counts them
+# - payment_type is that of the largest payment, review_score that of the
+#   latest review
+FACT_SELECT_SQL = """
+WITH ranked_items AS (
+    SELECT order_id, product_id, price, freight_value,
+           ROW_NUMBER() OVER (PARTITION BY order_id ORDER BY order_item_id) AS rn
+    FROM order_items WHERE {scope}
+),
+items AS (
+    SELECT order_id, COUNT(*) AS quantity, SUM(price) AS price,
+           SUM(price + freight_value) AS total_amount,
+           MAX(CASE WHEN rn = 1 THEN product_id END) AS first_product_id
+    FROM ranked_items GROUP BY order_id
+),
+payments AS (
+    SELECT order_id, payment_type,
+           ROW_NUMBER() OVER (PARTITION BY order_id
+                              ORDER BY payment_value DESC, payment_sequential) AS rn
+    FROM order_payments WHERE {scope}
+),
+reviews AS (
+    SELECT order_id, review_score,
+           ROW_NUMBER() OVER (PARTITION BY order_id
+                              ORDER BY review_creation_date DESC, review_id) AS rn
+    FROM order_reviews WHERE {scope}
+)
+SELECT o.order_id, COALESCE(c.customer_unique_id, o.customer_id), o.order_purchase_timestamp,
+       p.product_category_name, it.price, it.quantity, c.customer_state, pay.payment_type,
+       rv.review_score, it.total_amount, strftime('%Y-%m', o.order_purchase_timestamp)
+FROM orders o
+JOIN items it ON it.order_id = o.order_id
+LEFT JOIN products p ON p.product_id = it.first_product_id
+LEFT JOIN customers c ON c.customer_id = o.customer_id
+LEFT JOIN payments pay ON pay.order_id = o.order_id AND pay.rn = 1
+LEFT JOIN reviews rv ON rv.order_id = o.order_id AND rv.rn = 1
+WHERE {order_scope}
+"""
+
+# Orders whose fact row may change with an ingestion batch: orders touched
+# directly, orders of changed customers and orders containing changed products
+AFFECTED_ORDERS_SQL = """
+SELECT order_id FROM ingestion_changes WHERE batch_id > :batch AND order_id IS NOT NULL
+UNION
+SELECT o.order_id FROM ingestion_changes ch JOIN orders o ON o.customer_id = ch.row_key
+WHERE ch.batch_id > :batch AND ch.table_name = 'customers'
+UNION
+SELECT i.order_id FROM ingestion_changes ch JOIN order_items i ON i.product_id = ch.row_key
+WHERE ch.batch_id > :batch AND ch.table_name = 'products'
+"""
+
+def _month_range(month):
+    """[start, end) purchase timestamps of a 'YYYY-MM' month, as stored text"""
+    start = pd.Period(month, freq='M')
+    return (start.start_time.strftime(OLIST_DATETIME_FORMAT),
+            (start + 1).start_time.strftime(OLIST_DATETIME_FORMAT))
+
+def _fill_scope(conn, months):
+    """Put the orders purchased in months into temp.fact_scope"""
+    conn.execute("DROP TABLE IF EXISTS temp.fact_scope")
+    conn.execute("CREATE TEMP TABLE fact_scope (order_id TEXT PRIMARY KEY)")
+    for month in months:
+        conn.execute("INSERT OR IGNORE INTO temp.fact_scope SELECT order_id FROM orders "
+                     "WHERE order_purchase_timestamp >= ? AND order_purchase_timestamp < ?",
+                     _month_range(month))
+
+def _insert_facts(conn, months=None):
+    """Insert the fact rows of every order, or of the orders purchased in months"""
+    if months is None:
+        # Whole-table scans beat per-order index lookups for a full build
+        query = FACT_SELECT_SQL.format(scope='1', order_scope='1')
+    else:
+        _fill_scope(conn, months)
+        scope = "order_id IN (SELECT order_id FROM temp.fact_scope)"
+        query = FACT_SELECT_SQL.format(scope=scope, order_scope=f"o.{scope}")
+
+    conn.execute(f"INSERT INTO {FACT_TABLE} ({', '.join(FACT_COLUMNS)}, order_month) {query}")
+    if months is not None:
+        conn.execute("DROP TABLE temp.fact_scope")
+    return conn.execute(f"SELECT COUNT(*) FROM {FACT_TABLE}").fetchone()[0]
+
+def _affected_months(conn, after_batch):
+    """Order months, old and new, of the orders changed after a batch"""
+    conn.execute("DROP TABLE IF EXISTS temp.fact_changed")
+    conn.execute(f"CREATE TEMP TABLE fact_changed AS {AFFECTED_ORDERS_SQL}", {'batch': after_batch})
+    rows = conn.execute(
+        "SELECT strftime('%Y-%m', o.order_purchase_timestamp) FROM temp.fact_changed ch "
+        "JOIN orders o ON o.order_id = ch.order_id "
+        f"UNION SELECT f.order_month FROM temp.fact_changed ch "
+        f"JOIN {FACT_TABLE} f ON f.order_id = ch.order_id")
+    months = sorted(month for (month,) in rows if month)
+    conn.execute("DROP TABLE temp.fact_changed")
+    return months
+
+def refresh_state(conn, table_name=FACT_TABLE):
+    """(batch_id, source_orders) recorded at the last refresh of a derived table, or None"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                          "AND name = 'fact_refresh_state'").fetchone()
+    if not exists:
+        return None
+    return conn.execute("SELECT batch_id, source_orders FROM fact_refresh_state "
+                        "WHERE table_name = ?", (table_name,)).fetchone()
+
+def record_refresh_state(conn, table_name, batch_id, source_orders):
+    """Record the ingestion batch and order count a derived table now reflects"""
+    conn.execute(
+        "INSERT INTO fact_refresh_state (table_name, batch_id, source_orders, refreshed_at) "
+        "VALUES (?, ?, ?, datetime('now')) ON CONFLICT(table_name) DO UPDATE SET "
+        "batch_id = excluded.batch_id, source_orders = excluded.source_orders, "
+        "refreshed_at = excluded.refreshed_at", (table_name, batch_id, source_orders))
+
+def refresh_fact_table(conn, full=False):
+    """
+    Bring the orders_analysis fact table up to date with the normalized tables
+
+    The first run, or a run after a full ingestion, builds every row with
+    one join over orders, order_items, products, customers, order_payments
+    and order_reviews. Later runs look at the incremental batches recorded
+    in ingestion_changes since the last refresh and rebuild only the order
+    months containing affected orders. If the order count no longer matches
+    the last refresh (e.g. the database was regenerated), the table is
+    rebuilt as well.
+
+    Returns a dict with the refresh mode ('full', 'partial' or
+    'up-to-date'), the months rebuilt, the fact row count and the latest
+    ingestion batch before (previous_batch_id, None on the first run) and
+    after the refresh (batch_id).
+    """
+    create_tables(conn)
+    conn.executescript(METADATA_SCHEMA_SQL)
+    conn.executescript(FACT_SCHEMA_SQL)
+
+    state = refresh_state(conn)
+    latest_batch = conn.execute("SELECT COALESCE(MAX(batch_id), 0) "
+                                "FROM ingestion_batches").fetchone()[0]
+    source_orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    months = None
+    if not full and state is not None:
+        last_batch, last_orders = state
+        full_load = conn.execute("SELECT 1 FROM ingestion_batches WHERE batch_id > ? "
+                                 "AND mode = 'full'", (last_batch,)).fetchone()
+        if not full_load:
+            months = _affected_months(conn, last_batch)
+            if not months and source_orders != last_orders:
+                months = None
+
+    with conn:
+        if months is None:
+            mode = 'full'
+            conn.execute(f"DELETE FROM {FACT_TABLE}")
+            rows = _insert_facts(conn)
+        elif months:
+            mode = 'partial'
+            conn.execute(f"DELETE FROM {FACT_TABLE} WHERE order_month IN "
+                         f"({', '.join('?' * len(months))})", months)
+            rows = _insert_facts(conn, months)
+        else:
+            mode = 'up-to-date'
+            rows = conn.execute(f"SELECT COUNT(*) FROM {FACT_TABLE}").fetchone()[0]
+
+        record_refresh_state(conn, FACT_TABLE, latest_batch, source_orders)
+
+    return {'mode': mode, 'months': months or [], 'rows': rows, 'batch_id': latest_batch,
+            'previous_batch_id': state[0] if state is not None else None}
+
+def load_fact_frame(conn, columns=FACT_COLUMNS):
+    """
+    Read the fact table into a DataFrame with a parsed order_date (Olist
+    timestamps, or ISO timestamps with fractional seconds for orders added
+    by EcommerceAnalyzer.append_orders())
+    """
+    df = pd.read_sql(f"SELECT {', '.join(columns)} FROM {FACT_TABLE}", conn)
+    if 'order_date' in df.columns:
+        df['order_date'] = pd.to_datetime(df['order_date'], format='ISO8601', errors='coerce')
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the order fact table")
+    parser.add_argument('--db-path', default=config.DATABASE_PATH)
+    parser.add_argument('--full', action='store_true', help="rebuild every month")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    result = refresh_fact_table(conn, args.full)
+    conn.close()
+
+    print(f"✅ {FACT_TABLE}: {result['mode']} refresh, {result['rows']:,} rows")
+    if result['months']:
+        print(f"   • Rebuilt months: {', '.join(result['months'])}")
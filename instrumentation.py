@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Timing and Memory Instrumentation for the E-Commerce Pipelines
+"""
+
+import sys
+import json
+import time
+import threading
+import functools
+import inspect
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+import config
+
+class _State:
+    """Process-wide switch and the records collected while enabled"""
+
+    def __init__(self):
+        self.enabled = False
+        self.records = []
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.started_at = None
+
+_state = _State()
+# Names of the instrumented calls in progress, per thread
+_stack = threading.local()
+
+def enable():
+    """Start recording instrumented calls (clears earlier records)"""
+    with _state.lock:
+        _state.records = []
+        _state.started = time.perf_counter()
+        _state.started_at = datetime.now().isoformat(timespec='seconds')
+        _state.enabled = True
+
+def disable():
+    """Stop recording; the records collected so far are kept"""
+    _state.enabled = False
+
+def is_enabled():
+    return _state.enabled
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unknown)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def count_rows(result):
+    """
+    Rows processed, guessed from a return value: the length of a frame,
+    series or array, the first count of a tuple, or the sum of a dict of
+    counts; None when there is nothing to count
+    """
+    if hasattr(result, 'shape') and len(getattr(result, 'shape', ())):
+        return int(result.shape[0])
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, tuple) and result:
+        return count_rows(result[0])
+    if isinstance(result, dict) and result and \
+            all(isinstance(value, int) and not isinstance(value, bool) for value in result.values()):
+        return sum(result.values())
+    return None
+
+def _call(name, rows, func, args, kwargs):
+    stack = getattr(_stack, 'names', None)
+    if stack is None:
+        stack = _stack.names = []
+    record = {'name': name, 'parent': stack[-1] if stack else None,
+              'thread': threading.current_thread().name,
+              'start_seconds': round(time.perf_counter() - _state.started, 6)}
+    peak_before = peak_rss_mb()
+    stack.append(name)
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    result = error = None
+    try:
+        result = func(*args, **kwargs)
+        return result
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record['wall_seconds'] = round(time.perf_counter() - wall, 6)
+        record['cpu_seconds'] = round(time.thread_time() - cpu, 6)
+        stack.pop()
+        peak_after = peak_rss_mb()
+        record['peak_rss_mb'] = round(peak_after, 1) if peak_after is not None else None
+        record['peak_rss_growth_mb'] = (round(peak_after - peak_before, 1)
+                                        if peak_after is not None else None)
+        record['rows'] = rows(result) if error is None and rows is not None else None
+        record['error'] = error
+        with _state.lock:
+            _state.records.append(record)
+
+def instrumented(func=None, *, name=None, rows=count_rows):
+    """
+    Decorator recording each call of a function while instrumentation is
+    enabled: wall time, CPU time of the calling thread, peak RSS after the
+    call (and how much the call raised it), rows processed and the
+    exception raised, if any
+
+    rows takes the return value and returns the row count (default:
+    count_rows). While disabled the wrapper only checks one flag before
+    calling the function. Work done in other threads or processes is not
+    part of a call's CPU time; see in_worker() for process pools.
+    """
+    if func is None:
+        return functools.partial(instrumented, name=name, rows=rows)
+    label = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _state.enabled:
+            return func(*args, **kwargs)
+        return _call(label, rows, func, args, kwargs)
+
+    return wrapper
+
+def instrument_methods(cls):
+    """Class decorator applying instrumented() to every public method"""
+    for attr, value in list(vars(cls).items()):
+        if not attr.startswith('_') and inspect.isfunction(value):
+            setattr(cls, attr, instrumented(value))
+    return cls
+
+def call_recorded(enabled, func, *args, **kwargs):
+    """Run func in a worker process and return (result, records of the call)"""
+    _state.enabled = enabled
+    _state.records = []
+    _state.started = time.perf_counter()
+    # A forked worker inherits the stack of the thread that started it
+    _stack.names = []
+    result = func(*args, **kwargs)
+    return result, _state.records
+
+def in_worker(func):
+    """
+    func wrapped for submission to a process pool, so the records made in
+    the worker come back with its result; unwrap the result with gather()
+    """
+    return functools.partial(call_recorded, _state.enabled, func)
+
+def gather(value):
+    """The result of an in_worker() call, after keeping its records"""
+    result, records = value
+    if records:
+        with _state.lock:
+            _state.records.extend(dict(record, worker=True) for record in records)
+    return result
+
+def summary():
+    """Calls, total wall and CPU seconds, max peak RSS and rows per name"""
+    totals = {}
+    with _state.lock:
+        records = list(_state.records)
+    for record in records:
+        total = totals.setdefault(record['name'], {'calls': 0, 'wall_seconds': 0.0,
+                                                   'cpu_seconds': 0.0, 'peak_rss_mb': None,
+                                                   'rows': 0, 'errors': 0})
+        total['calls'] += 1
+        total['wall_seconds'] += record['wall_seconds']
+        total['cpu_seconds'] += record['cpu_seconds']
+        if record['peak_rss_mb'] is not None:
+            total['peak_rss_mb'] = max(total['peak_rss_mb'] or 0.0, record['peak_rss_mb'])
+        total['rows'] += record['rows'] or 0
+        total['errors'] += record['error'] is not None
+    for total in totals.values():
+        total['wall_seconds'] = round(total['wall_seconds'], 6)
+        total['cpu_seconds'] = round(total['cpu_seconds'], 6)
+    return dict(sorted(totals.items(), key=lambda item: -item[1]['wall_seconds']))
+
+def write_report(path=config.RUN_REPORT_FILE):
+    """Write the JSON run report: per-name summary and every call record"""
+    with _state.lock:
+        records = list(_state.records)
+    report = {
+        'started_at': _state.started_at,
+        'wall_seconds': round(time.perf_counter() - _state.started, 6),
+        'peak_rss_mb': peak_rss_mb(),
+        'summary': summary(),
+        'records': records
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    return report
+
+def print_summary(report, top=10):
+    """Print the slowest instrumented calls of a run report"""
+    print(f"\n⏱️ Run report: {report['wall_seconds']:.2f}s wall")
+    for name, total in list(report['summary'].items())[:top]:
+        rows = f", {total['rows']:,} rows" if total['rows'] else ""
+        print(f"   • {name}: {total['wall_seconds']:.3f}s wall, {total['cpu_seconds']:.3f}s CPU "
+              f"in {total['calls']} call(s){rows}")
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Incrementally Maintained Monthly Revenue Aggregates
+"""
+
+import numpy as np
+import pandas as pd
+
+import config
+from sketches import HyperLogLog, group_sketches, hash_values, sorted_unique
+
+# Columns a batch of orders must provide
+ORDER_COLUMNS = ['order_id', 'customer_id', 'order_date', 'total_amount']
+
+MONTHLY_REVENUE_TABLE = 'monthly_revenue'
+
+MONTHLY_REVENUE_SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS {MONTHLY_REVENUE_TABLE} (
+    month TEXT PRIMARY KEY,
+    revenue REAL,
+    orders INTEGER,
+    customers INTEGER,
+    distinct_counts TEXT,
+    customer_state BLOB
+);
+"""
+
+def create_table(conn):
+    """Create the monthly_revenue table if it does not exist"""
+    conn.executescript(MONTHLY_REVENUE_SCHEMA_SQL)
+
+class MonthlyRevenueStore:
+    """
+    Monthly revenue, order count and distinct customers, maintained batch
+    by batch
+
+    Each month keeps its revenue sum, its order count and its customers:
+    with distinct_counts='exact' the sorted unique 64-bit hashes of their
+    IDs, with 'approximate' a HyperLogLog sketch of 2**precision bytes
+    (relative standard error about 1.04 / sqrt(2**precision)). update()
+    groups a batch of new orders by month and folds it into the months it
+    touches only, so its cost depends on the batch and the months it falls
+    in, not on the history. Stores built on separate batches or shards
+    combine with merge(): sums add and customer states are unioned, so
+    distinct counts over several months or shards count each customer
+    once. Customers are hashed by their original IDs (never by per-load
+    surrogate keys), so hashes match across batches, stores and runs.
+    save() and load() keep the store in SQLite.
+    """
+
+    def __init__(self, distinct_counts=config.DISTINCT_COUNTS, precision=config.HLL_PRECISION):
+        if distinct_counts not in ('exact', 'approximate'):
+            raise ValueError(f"Unknown distinct count mode: {distinct_counts}")
+        self.distinct_counts = distinct_counts
+        self.precision = precision
+        self.revenue = {}
+        self.orders = {}
+        self.customers = {}
+
+    def update(self, orders, customer_hashes=None):
+        """
+        Fold a batch of orders into the store and return the months updated
+
+        orders needs the ORDER_COLUMNS; rows without an order_date are
+        ignored, like the monthly groupby they replace. When
+        orders['customer_id'] holds surrogate keys, customer_hashes gives
+        hash_values() of the original ID of every key (codes below 0 mark
+        unknown customers), so each ID is hashed once per dictionary rather
+        than once per order. Months are grouped as integer month numbers.
+        """
+        dates = orders['order_date'].to_numpy()
+        dated = ~np.isnat(dates)
+        if not dated.any():
+            return []
+        # Months since 1970-01, numbered 0.. in order of the months present
+        month_numbers = dates[dated].astype('datetime64[M]').astype(np.int64)
+        first = month_numbers.min()
+        month_numbers -= first
+        present = np.flatnonzero(np.bincount(month_numbers))
+        position = np.zeros(present[-1] + 1, dtype=np.intp)
+        position[present] = np.arange(len(present))
+        groups = position[month_numbers]
+        numbers = present + first
+        months = [pd.Period(year=1970 + int(number) // 12, month=int(number) % 12 + 1, freq='M')
+                  for number in numbers]
+
+        amounts = np.nan_to_num(orders['total_amount'].to_numpy(dtype=float)[dated])
+        revenue = np.bincount(groups, weights=amounts, minlength=len(months))
+        order_ids = orders['order_id'].to_numpy()[dated]
+        # Surrogate keys mark missing order IDs with -1
+        counted = order_ids >= 0 if order_ids.dtype.kind == 'i' else pd.notna(order_ids)
+        counts = np.bincount(groups[counted], minlength=len(months))
+        for month, month_revenue, count in zip(months, revenue, counts):
+            self.revenue[month] = self.revenue.get(month, 0.0) + float(month_revenue)
+            self.orders[month] = self.orders.get(month, 0) + int(count)
+
+        customers = orders['customer_id'].to_numpy()[dated]
+        if customer_hashes is None:
+            known = pd.notna(customers)
+            hashes = hash_values(customers[known])
+        else:
+            known = customers >= 0
+            hashes = np.asarray(customer_hashes)[customers[known]]
+        groups = groups[known]
+
+        if self.distinct_counts == 'approximate':
+            sketches = group_sketches(groups, len(months), hashes, self.precision)
+            counts = np.bincount(groups, minlength=len(months))
+            for month, sketch, count in zip(months, sketches, counts):
+                if count:
+                    self._add_customers(month, sketch)
+        else:
+            # Group the hashes by month (small integer types sort by radix)
+            order = np.argsort(groups.astype(np.min_scalar_type(len(months))), kind='stable')
+            hashes = hashes[order]
+            bounds = np.searchsorted(groups[order], np.arange(len(months) + 1))
+            for i, month in enumerate(months):
+                if bounds[i] < bounds[i + 1]:
+                    self._add_customers(month, sorted_unique(hashes[bounds[i]:bounds[i + 1]]))
+
+        return months
+
+    def drop(self, months):
+        """Forget months, e.g. before rebuilding them from changed orders"""
+        for month in months:
+            month = pd.Period(month, freq='M')
+            self.revenue.pop(month, None)
+            self.orders.pop(month, None)
+            self.customers.pop(month, None)
+
+    def _add_customers(self, month, state):
+        if month not in self.customers:
+            self.customers[month] = state
+        elif self.distinct_counts == 'approximate':
+            self.customers[month].merge(state)
+        else:
+            self.customers[month] = sorted_unique(np.concatenate([self.customers[month], state]))
+
+    def _count(self, state):
+        return state.count() if self.distinct_counts == 'approximate' else len(state)
+
+    def merge(self, other):
+        """Fold another store, built on other orders, into this one (in place)"""
+        if (other.distinct_counts, other.precision) != (self.distinct_counts, self.precision):
+            raise ValueError("Cannot merge stores with different distinct count settings")
+        for month, revenue in other.revenue.items():
+            self.revenue[month] = self.revenue.get(month, 0.0) + revenue
+        for month, count in other.orders.items():
+            self.orders[month] = self.orders.get(month, 0) + count
+        for month, state in other.customers.items():
+            if self.distinct_counts == 'approximate':
+                state = HyperLogLog(state.precision).merge(state)
+            self._add_customers(month, state)
+        return self
+
+    def distinct_customers(self, months=None):
+        """Distinct customers over months (default: every month)"""
+        months = self.customers if months is None else months
+        states = [self.customers[month] for month in months if month in self.customers]
+        if not states:
+            return 0
+        if self.distinct_counts == 'approximate':
+            union = HyperLogLog(self.precision)
+            for state in states:
+                union.merge(state)
+            return union.count()
+        return len(sorted_unique(np.concatenate(states)))
+
+    def to_frame(self):
+        """Month, Total_Revenue, Total_Orders, Unique_Customers and Avg_Order_Value"""
+        months = sorted(self.orders)
+        monthly = pd.DataFrame({
+            'Month': pd.PeriodIndex(months, freq='M'),
+            'Total_Revenue': [self.revenue[month] for month in months],
+            'Total_Orders': [self.orders[month] for month in months],
+            'Unique_Customers': [self._count(self.customers[month]) if month in self.customers
+                                 else 0 for month in months]
+        })
+        monthly['Avg_Order_Value'] = monthly['Total_Revenue'] / monthly['Total_Orders']
+        return monthly
+
+    def write(self, conn, months=None):
+        """
+        Write months to the monthly_revenue table within the caller's
+        transaction, each with its customer state serialized next to its
+        aggregates
+
+        With months=None the table contents are replaced by the whole
+        store, dropping months it no longer has and rows written with other
+        distinct count settings; otherwise only the given months are
+        replaced, and deleted if the store no longer has them. The table
+        must exist (see create_table()).
+        """
+        if months is None:
+            conn.execute(f"DELETE FROM {MONTHLY_REVENUE_TABLE}")
+            months = sorted(self.orders)
+        gone = [(str(month),) for month in months if month not in self.orders]
+        conn.executemany(f"DELETE FROM {MONTHLY_REVENUE_TABLE} WHERE month = ?", gone)
+        rows = []
+        for month in months:
+            if month not in self.orders:
+                continue
+            state = self.customers.get(month)
+            if state is None:
+                blob = None
+            elif self.distinct_counts == 'approximate':
+                blob = state.to_bytes()
+            else:
+                blob = state.astype('<u8').tobytes()
+            rows.append((str(month), float(self.revenue[month]), int(self.orders[month]),
+                         self._count(state) if state is not None else 0,
+                         self.distinct_counts, blob))
+        conn.executemany(f"INSERT OR REPLACE INTO {MONTHLY_REVENUE_TABLE} "
+                         "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def save(self, conn, months=None):
+        """write() the months (default: the whole store) in a transaction of their own"""
+        create_table(conn)
+        with conn:
+            self.write(conn, months)
+
+    @classmethod
+    def load(cls, conn):
+        """Read a store written by save(); None if there is none"""
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                              (MONTHLY_REVENUE_TABLE,)).fetchone()
+        if not exists:
+            return None
+        rows = conn.execute(f"SELECT month, revenue, orders, distinct_counts, customer_state "
+                            f"FROM {MONTHLY_REVENUE_TABLE} ORDER BY month").fetchall()
+        if not rows:
+            return None
+
+        store = cls(rows[0][3])
+        for month, revenue, orders, _, blob in rows:
+            month = pd.Period(month, freq='M')
+            store.revenue[month] = revenue
+            store.orders[month] = orders
+            if blob is None:
+                continue
+            if store.distinct_counts == 'approximate':
+                store.customers[month] = HyperLogLog.from_bytes(blob)
+                store.precision = store.customers[month].precision
+            else:
+                store.customers[month] = np.frombuffer(blob, dtype='<u8').astype(np.uint64)
+        return store
+
+    def __len__(self):
+        return len(self.orders)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Precomputed Aggregate Cube for the E-Commerce Analysis Sections
+"""
+
+import pandas as pd
+
+# Aggregates a cube answers; means are derived from a sum and a count
+CUBE_FUNCTIONS = ('sum', 'count', 'mean')
+
+class OrderCube:
+    """
+    Additive aggregates of an order frame at the finest grain of a set of
+    dimensions
+
+    build() scans the frame once and keeps one row per observed
+    combination of dimension values, with a sum and a count per measure.
+    Any grouping by a subset of the dimensions (including the grand total)
+    is then a roll-up of these cells, whose size depends on the number of
+    cells rather than the number of orders. Only sums, counts and means
+    roll up exactly; distinct counts and other aggregates are not
+    answered here.
+    """
+
+    def __init__(self, cells, dimensions, measures):
+        self.cells = cells
+        self.dimensions = list(dimensions)
+        self.measures = measures
+
+    @classmethod
+    def build(cls, df, keys, measures):
+        """
+        Build a cube over df
+
+        keys maps each dimension name to the Series to group by; measures
+        maps each column to the functions stored for it ('sum' and/or
+        'count').
+        """
+        spec = {}
+        for col, funcs in measures.items():
+            for func in funcs:
+                spec[f'{col}__{func}'] = (col, func)
+        grouping = [series.rename(name) for name, series in keys.items()]
+        cells = df.groupby(grouping, observed=True, dropna=False).agg(**spec)
+        return cls(cells, keys.keys(), measures)
+
+    def covers(self, keys, pairs):
+        """Whether every (column, function) grouped by keys can be rolled up"""
+        if not set(keys) <= set(self.dimensions):
+            return False
+        for col, func in pairs:
+            stored = self.measures.get(col, [])
+            needed = ['sum', 'count'] if func == 'mean' else [func]
+            if func not in CUBE_FUNCTIONS or not set(needed) <= set(stored):
+                return False
+        return True
+
+    def rollup(self, keys, pairs):
+        """Aggregates grouped by keys, with (column, function) columns"""
+        if keys:
+            rolled = self.cells.groupby(level=list(keys), observed=True).sum()
+        else:
+            rolled = pd.DataFrame({col: [self.cells[col].sum()] for col in self.cells.columns})
+
+        result = {}
+        for col, func in pairs:
+            if func == 'mean':
+                result[(col, func)] = rolled[f'{col}__sum'] / rolled[f'{col}__count']
+            else:
+                result[(col, func)] = rolled[f'{col}__{func}']
+        return pd.DataFrame(result, index=rolled.index)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def memory_usage(self):
+        """Bytes held by the cube cells"""
+        return int(self.cells.memory_usage(deep=True).sum())
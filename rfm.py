@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Vectorized RFM Scoring and Segmentation
+"""
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# Segment rule sets: an ordered list of (label, condition) plus the label
+# for customers matching no condition. Conditions take the RFM frame and
+# return a boolean array; the first matching rule wins.
+RFM_RULE_SETS = {
+    # The analyzer's original value-based segments
+    'value': ([
+        ('High Value', lambda r: (r['Frequency'] >= 3) & (r['Monetary'] >= 200)),
+        ('Medium Value', lambda r: (r['Frequency'] >= 2) & (r['Monetary'] >= 100)),
+        ('Recent Customer', lambda r: r['Recency'] <= 90)
+    ], 'Low Value'),
+    # Segments on the quantile scores from rfm_scores()
+    'score': ([
+        ('Champions', lambda r: (r['R_Score'] >= 4) & (r['F_Score'] >= 4) & (r['M_Score'] >= 4)),
+        ('Loyal Customers', lambda r: (r['F_Score'] >= 4) & (r['M_Score'] >= 3)),
+        ('New Customers', lambda r: (r['R_Score'] >= 4) & (r['F_Score'] <= 2)),
+        ('At Risk', lambda r: (r['R_Score'] <= 2) & (r['F_Score'] >= 3)),
+        ('Needs Attention', lambda r: r['R_Score'] == 3)
+    ], 'Hibernating')
+}
+
+def quantile_scores(values, percentiles=config.RFM_PERCENTILES, higher_is_better=True):
+    """
+    Score values 1..len(percentiles)+1 by the quantile bin they fall in
+
+    Bins are right-closed like pd.qcut. Heavily tied data (such as order
+    counts) may leave some scores unused instead of failing.
+    """
+    values = np.asarray(values, dtype=float)
+    thresholds = np.quantile(values, percentiles) if len(values) else np.zeros(len(percentiles))
+    scores = np.searchsorted(thresholds, values, side='left') + 1
+    if not higher_is_better:
+        scores = len(percentiles) + 2 - scores
+    return scores.astype(np.int8)
+
+def rfm_scores(rfm, percentiles=config.RFM_PERCENTILES):
+    """Add R_Score, F_Score, M_Score and the combined RFM_Score to an RFM frame"""
+    rfm['R_Score'] = quantile_scores(rfm['Recency'], percentiles, higher_is_better=False)
+    rfm['F_Score'] = quantile_scores(rfm['Frequency'], percentiles)
+    rfm['M_Score'] = quantile_scores(rfm['Monetary'], percentiles)
+    rfm['RFM_Score'] = (rfm['R_Score'].astype(np.int16) * 100 + rfm['F_Score'] * 10 +
+                        rfm['M_Score'])
+    return rfm
+
+def assign_segments(rfm, rule_set='value'):
+    """Segment labels for every customer of an RFM frame, as a Series"""
+    rules, default = RFM_RULE_SETS[rule_set]
+    conditions = [np.asarray(condition(rfm), dtype=bool) for _, condition in rules]
+    # Select rule numbers rather than strings, then look the labels up once
+    codes = np.select(conditions, np.arange(len(rules)), default=len(rules))
+    labels = np.array([label for label, _ in rules] + [default], dtype=object)
+    return pd.Series(labels[codes], index=rfm.index, name='Segment')
+
+def rfm_density(rfm, bins=50):
+    """
+    Bin customers on a Frequency x Monetary grid with their mean Recency
+
+    Returns the bin edges, the customer count per cell and the mean
+    Recency per cell (NaN where empty), built with np.histogram2d. The
+    result has bins x bins cells however many customers there are, so
+    drawing it does not depend on the customer count. Monetary bins are
+    log-spaced when every value is positive, since spend is heavy-tailed;
+    Frequency gets one bin per value while it has at most `bins` values.
+    """
+    frequency = rfm['Frequency'].to_numpy(dtype=float)
+    monetary = rfm['Monetary'].to_numpy(dtype=float)
+    recency = rfm['Recency'].to_numpy(dtype=float)
+    if not len(frequency):
+        return None
+
+    low, high = frequency.min(), frequency.max()
+    if high - low + 1 <= bins:
+        frequency_edges = np.arange(low, high + 2) - 0.5
+    else:
+        frequency_edges = np.linspace(low, high, bins + 1)
+
+    low, high = monetary.min(), monetary.max()
+    if low > 0 and high > low:
+        monetary_edges = np.geomspace(low, high, bins + 1)
+    else:
+        monetary_edges = np.linspace(low, high if high > low else low + 1, bins + 1)
+
+    edges = [frequency_edges, monetary_edges]
+    counts, _, _ = np.histogram2d(frequency, monetary, bins=edges)
+    recency_sums, _, _ = np.histogram2d(frequency, monetary, bins=edges, weights=recency)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_recency = np.where(counts > 0, recency_sums / counts, np.nan)
+
+    return {'frequency_edges': frequency_edges, 'monetary_edges': monetary_edges,
+            'counts': counts, 'mean_recency': mean_recency}
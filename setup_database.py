@@ -3,188 +3,687 @@
 Database Setup Script for E-Commerce Analysis Project
 """
 
+import os
 import sqlite3
-import pandas as pd
+import argparse
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from datetime import datetime, timedelta
-import os
 
-def create_database_schema():
-    """Create database schema for e-commerce analysis"""
-
-    conn = sqlite3.connect('ecommerce_analysis.db')
-    cursor = conn.cursor()
-
-    # Create tables
-    schema_sql = """
-    -- Customers table
-    CREATE TABLE IF NOT EXISTS customers (
-        customer_id TEXT PRIMARY KEY,
-        customer_unique_id TEXT,
-        customer_zip_code_prefix INTEGER,
-        customer_city TEXT,
-        customer_state TEXT
-    );
-
-    -- Orders table
-    CREATE TABLE IF NOT EXISTS orders (
-        order_id TEXT PRIMARY KEY,
-        customer_id TEXT,
-        order_status TEXT,
-        order_purchase_timestamp DATETIME,
-        order_approved_at DATETIME,
-        order_delivered_carrier_date DATETIME,
-        order_delivered_customer_date DATETIME,
-        order_estimated_delivery_date DATETIME,
-        FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
-    );
-
-    -- Order items table
-    CREATE TABLE IF NOT EXISTS order_items (
-        order_id TEXT,
-        order_item_id INTEGER,
-        product_id TEXT,
-        seller_id TEXT,
-        shipping_limit_date DATETIME,
-        price REAL,
-        freight_value REAL,
-        PRIMARY KEY (order_id, order_item_id),
-        FOREIGN KEY (order_id) REFERENCES orders(order_id)
-    );
-
-    -- Products table
-    CREATE TABLE IF NOT EXISTS products (
-        product_id TEXT PRIMARY KEY,
-        product_category_name TEXT,
-        product_name_length INTEGER,
-        product_description_length INTEGER,
-        product_photos_qty INTEGER,
-        product_weight_g INTEGER,
-        product_length_cm INTEGER,
-        product_height_cm INTEGER,
-        product_width_cm INTEGER
-    );
-
-    -- Create indexes for better performance
-    CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders(customer_id);
-    CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(order_purchase_timestamp);
-    CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
-    CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(product_id);
-    """
+import config
+import instrumentation
+
+# Table sizes at scale factor 1 (the original 15,000-order sample)
+BASE_CUSTOMERS = 5000
+BASE_PRODUCTS = 1000
+BASE_ORDERS = 15000
+BASE_SELLERS = 1000
+
+# Rows generated per chunk (shard); bounds peak memory at any scale factor.
+# Part of the dataset's identity: the same seed and chunk size always
+# produce the same rows.
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Rows inserted between commits during a bulk load
+DEFAULT_COMMIT_ROWS = 1_000_000
+
+# Connection settings applied for the duration of a bulk load. The rollback
+# journal stays in memory and nothing is fsynced until the load is committed.
+LOAD_PRAGMAS = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'cache_size': -262144,
+    'temp_store': 'MEMORY',
+    'locking_mode': 'EXCLUSIVE'
+}
+
+START_DATE = np.datetime64('2017-01-01T00:00:00', 's')
+END_DATE = np.datetime64('2018-12-31T00:00:00', 's')
+
+CITIES = np.array(['São Paulo', 'Rio de Janeiro', 'Brasília', 'Salvador', 'Fortaleza'])
+STATES = np.array(['SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA'])
+STATE_WEIGHTS = [0.4, 0.15, 0.12, 0.1, 0.08, 0.08, 0.07]
+CATEGORIES = np.array(['Electronics', 'Home & Garden', 'Fashion', 'Sports', 'Health & Beauty',
+                       'Auto', 'Books', 'Toys', 'Food & Beverages'])
+ORDER_STATUSES = np.array(['delivered', 'shipped', 'processing', 'cancelled'])
+ORDER_STATUS_WEIGHTS = [0.85, 0.08, 0.04, 0.03]
+ITEMS_PER_ORDER = np.array([1, 2, 3, 4])
+ITEMS_PER_ORDER_WEIGHTS = [0.7, 0.2, 0.08, 0.02]
+
+# Seller fan-out: item i goes to seller floor(n_sellers * u**SELLER_SKEW), so a
+# small head of sellers carries most of the volume, as on the Olist marketplace
+SELLER_SKEW = 2.0
+
+PAYMENT_TYPES = np.array(['credit_card', 'boleto', 'debit_card', 'voucher'])
+PAYMENT_TYPE_WEIGHTS = [0.75, 0.19, 0.02, 0.04]
+# Share of orders paid partly with a voucher and partly with a main method
+SPLIT_PAYMENT_RATE = 0.03
+INSTALLMENTS = np.arange(1, 11)
+INSTALLMENT_WEIGHTS = [0.5, 0.12, 0.1, 0.07, 0.05, 0.04, 0.03, 0.04, 0.02, 0.03]
+
+# Share of orders that receive a review, and the score distribution
+REVIEW_RATE = 0.99
+REVIEW_SCORES = np.array([1, 2, 3, 4, 5])
+REVIEW_SCORE_WEIGHTS = [0.11, 0.03, 0.08, 0.19, 0.59]
+REVIEW_TITLE_RATE = 0.12
+REVIEW_MESSAGE_RATE = 0.41
+# Canned comment text, indexed by review_score - 1
+REVIEW_TITLES = np.array(['Não recomendo', 'Ruim', 'Regular', 'Bom', 'Excelente'], dtype=object)
+REVIEW_MESSAGES = np.array([
+    'Produto não chegou',
+    'Produto veio com defeito',
+    'Entrega demorou, produto ok',
+    'Produto bom, entrega no prazo',
+    'Chegou antes do prazo, recomendo'
+], dtype=object)
+
+# Tables filled by generate_sample_data(), in load order
+TABLE_NAMES = ['customers', 'products', 'sellers', 'orders', 'order_items',
+               'order_payments', 'order_reviews']
+
+# Bookkeeping and derived tables describing the contents of TABLE_NAMES:
+# the incremental ingestion watermark and change log (data_ingestion.py)
+# and the fact table refresh state (fact_table.py). They are dropped
+# whenever the data tables are, so nothing reads state of the old data.
+DERIVED_TABLE_NAMES = ['ingestion_changes', 'ingestion_batches', 'ingestion_watermarks',
+                       'fact_refresh_state']
+
+# Declared primary key columns of each table
+PRIMARY_KEYS = {
+    'customers': ['customer_id'],
+    'products': ['product_id'],
+    'sellers': ['seller_id'],
+    'orders': ['order_id'],
+    'order_items': ['order_id', 'order_item_id'],
+    'order_payments': ['order_id', 'payment_sequential'],
+    'order_reviews': ['review_id']
+}
+
+# Stable per-table stream identifiers for the shard random generators
+TABLE_CODES = {'customers': 1, 'products': 2, 'orders': 3, 'sellers': 4}
+
+SCHEMA_SQL = """
+-- Customers table
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    customer_unique_id TEXT,
+    customer_zip_code_prefix INTEGER,
+    customer_city TEXT,
+    customer_state TEXT
+);
+
+-- Orders table
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    customer_id TEXT,
+    order_status TEXT,
+    order_purchase_timestamp DATETIME,
+    order_approved_at DATETIME,
+    order_delivered_carrier_date DATETIME,
+    order_delivered_customer_date DATETIME,
+    order_estimated_delivery_date DATETIME,
+    FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+);
+
+-- Order items table
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id TEXT,
+    order_item_id INTEGER,
+    product_id TEXT,
+    seller_id TEXT,
+    shipping_limit_date DATETIME,
+    price REAL,
+    freight_value REAL,
+    PRIMARY KEY (order_id, order_item_id),
+    FOREIGN KEY (order_id) REFERENCES orders(order_id)
+);
+
+-- Products table
+CREATE TABLE IF NOT EXISTS products (
+    product_id TEXT PRIMARY KEY,
+    product_category_name TEXT,
+    product_name_length INTEGER,
+    product_description_length INTEGER,
+    product_photos_qty INTEGER,
+    product_weight_g INTEGER,
+    product_length_cm INTEGER,
+    product_height_cm INTEGER,
+    product_width_cm INTEGER
+);
+
+-- Sellers table
+CREATE TABLE IF NOT EXISTS sellers (
+    seller_id TEXT PRIMARY KEY,
+    seller_zip_code_prefix INTEGER,
+    seller_city TEXT,
+    seller_state TEXT
+);
+
+-- Order payments table
+CREATE TABLE IF NOT EXISTS order_payments (
+    order_id TEXT,
+    payment_sequential INTEGER,
+    payment_type TEXT,
+    payment_installments INTEGER,
+    payment_value REAL,
+    PRIMARY KEY (order_id, payment_sequential),
+    FOREIGN KEY (order_id) REFERENCES orders(order_id)
+);
+
+-- Order reviews table
+CREATE TABLE IF NOT EXISTS order_reviews (
+    review_id TEXT PRIMARY KEY,
+    order_id TEXT,
+    review_score INTEGER,
+    review_comment_title TEXT,
+    review_comment_message TEXT,
+    review_creation_date DATETIME,
+    review_answer_timestamp DATETIME,
+    FOREIGN KEY (order_id) REFERENCES orders(order_id)
+);
+
+-- Create indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders(customer_id);
+CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(order_purchase_timestamp);
+CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
+CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(product_id);
+CREATE INDEX IF NOT EXISTS idx_order_items_seller ON order_items(seller_id);
+CREATE INDEX IF NOT EXISTS idx_order_payments_order ON order_payments(order_id);
+CREATE INDEX IF NOT EXISTS idx_order_reviews_order ON order_reviews(order_id);
+"""
 
-    cursor.executescript(schema_sql)
+@instrumentation.instrumented
+def create_tables(conn, reset=False):
+    """Create all tables and indexes, optionally dropping existing tables first"""
+    if reset:
+        for table in DERIVED_TABLE_NAMES + list(reversed(TABLE_NAMES)):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.executescript(SCHEMA_SQL)
     conn.commit()
+
+@instrumentation.instrumented
+def create_database_schema(db_path=config.DATABASE_PATH):
+    """Create database schema for e-commerce analysis"""
+
+    conn = sqlite3.connect(db_path)
+    create_tables(conn)
     conn.close()
 
     print("✅ Database schema created successfully")
 
-def generate_sample_data():
-    """Generate sample data for testing purposes"""
+def table_sizes(scale_factor=1.0):
+    """Row counts for the generated tables at a given scale factor
 
-    np.random.seed(42)
+    Scale factor 1 reproduces the original sample size (15,000 orders);
+    every table grows linearly with it, TPC-H style.
+    """
+    return {
+        'customers': max(1, int(round(BASE_CUSTOMERS * scale_factor))),
+        'products': max(1, int(round(BASE_PRODUCTS * scale_factor))),
+        'orders': max(1, int(round(BASE_ORDERS * scale_factor))),
+        'sellers': max(1, int(round(BASE_SELLERS * scale_factor))),
+    }
 
-    # Generate sample data
-    n_customers = 5000
-    n_orders = 15000
-    n_products = 1000
-
-    # Sample customers
-    customers_data = {
-        'customer_id': [f'CUST_{i:06d}' for i in range(n_customers)],
-        'customer_unique_id': [f'UNIQUE_{i:06d}' for i in range(n_customers)],
-        'customer_zip_code_prefix': np.random.randint(10000, 99999, n_customers),
-        'customer_city': np.random.choice(['São Paulo', 'Rio de Janeiro', 'Brasília', 
-                                         'Salvador', 'Fortaleza'], n_customers),
-        'customer_state': np.random.choice(['SP', 'RJ', 'MG', 'RS', 'PR', 'SC', 'BA'], 
-                                         n_customers, p=[0.4, 0.15, 0.12, 0.1, 0.08, 0.08, 0.07])
+def format_ids(prefix, ids, width):
+    """Vectorized equivalent of f'{prefix}{i:0{width}d}' for an integer array"""
+    ids = np.asarray(ids, dtype=np.int64)
+    width = max(width, len(str(int(ids.max())))) if len(ids) else width
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    digits = (ids[:, None] // powers % 10 + ord('0')).astype(np.uint8)
+    prefix_bytes = np.frombuffer(prefix.encode('ascii'), dtype=np.uint8)
+    raw = np.hstack([np.broadcast_to(prefix_bytes, (len(ids), len(prefix_bytes))), digits])
+    return np.ascontiguousarray(raw).view(f'S{raw.shape[1]}').ravel().astype(str)
+
+def _id_width(default_width, n_rows):
+    """Zero-padding width that keeps every ID of a table the same length"""
+    return max(default_width, len(str(max(n_rows - 1, 0))))
+
+def _shard_rng(seed, table, shard_index):
+    """Random stream derived from (seed, table, shard index)
+
+    Every shard owns its stream, so a shard's rows do not depend on which
+    worker generates it or in which order shards are produced.
+    """
+    return np.random.default_rng([seed, TABLE_CODES[table], shard_index])
+
+def shard_count(table, scale_factor=1.0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Number of chunk_size shards the table's ID space is split into"""
+    return -(-table_sizes(scale_factor)[table] // chunk_size)
+
+def _customer_shard(sizes, start, stop, rng):
+    n = stop - start
+    ids = np.arange(start, stop)
+    width = _id_width(6, sizes['customers'])
+    return {'customers': {
+        'customer_id': format_ids('CUST_', ids, width),
+        'customer_unique_id': format_ids('UNIQUE_', ids, width),
+        'customer_zip_code_prefix': rng.integers(10000, 99999, n),
+        'customer_city': rng.choice(CITIES, n),
+        'customer_state': rng.choice(STATES, n, p=STATE_WEIGHTS)
+    }}
+
+def _product_shard(sizes, start, stop, rng):
+    n = stop - start
+    return {'products': {
+        'product_id': format_ids('PROD_', np.arange(start, stop), _id_width(6, sizes['products'])),
+        'product_category_name': rng.choice(CATEGORIES, n),
+        'product_name_length': rng.integers(10, 100, n),
+        'product_description_length': rng.integers(50, 500, n),
+        'product_photos_qty': rng.integers(1, 10, n),
+        'product_weight_g': rng.integers(50, 5000, n),
+        'product_length_cm': rng.integers(5, 50, n),
+        'product_height_cm': rng.integers(5, 50, n),
+        'product_width_cm': rng.integers(5, 50, n)
+    }}
+
+def _seller_shard(sizes, start, stop, rng):
+    n = stop - start
+    return {'sellers': {
+        'seller_id': format_ids('SELLER_', np.arange(start, stop), _id_width(4, sizes['sellers'])),
+        'seller_zip_code_prefix': rng.integers(10000, 99999, n),
+        'seller_city': rng.choice(CITIES, n),
+        'seller_state': rng.choice(STATES, n, p=STATE_WEIGHTS)
+    }}
+
+def _order_shard(sizes, start, stop, rng):
+    """Orders plus their items, payments and reviews for one range of order IDs"""
+    order_width = _id_width(8, sizes['orders'])
+    customer_width = _id_width(6, sizes['customers'])
+    product_width = _id_width(6, sizes['products'])
+    seller_width = _id_width(4, sizes['sellers'])
+    n_seconds = int((END_DATE - START_DATE) / np.timedelta64(1, 's'))
+    one_day = np.timedelta64(1, 'D')
+    not_a_time = np.datetime64('NaT', 's')
+
+    n = stop - start
+    order_index = np.arange(start, stop)
+    order_ids = format_ids('ORDER_', order_index, order_width)
+    status = rng.choice(ORDER_STATUSES, n, p=ORDER_STATUS_WEIGHTS)
+    purchase = START_DATE + rng.integers(0, n_seconds, n).astype('timedelta64[s]')
+    approved = purchase + rng.integers(600, 2 * 86400, n).astype('timedelta64[s]')
+    carrier = approved + rng.integers(0, 5, n) * one_day
+    delivered = carrier + rng.integers(1, 20, n) * one_day
+    estimated = (purchase.astype('datetime64[D]')
+                 + rng.integers(15, 35, n) * one_day).astype('datetime64[s]')
+
+    # Only delivered orders have reached the customer; only shipped ones
+    # have reached the carrier
+    in_transit = (status == 'delivered') | (status == 'shipped')
+    orders = {
+        'order_id': order_ids,
+        'customer_id': format_ids('CUST_', rng.integers(0, sizes['customers'], n),
+                                  customer_width),
+        'order_status': status,
+        'order_purchase_timestamp': purchase,
+        'order_approved_at': np.where(status == 'cancelled', not_a_time, approved),
+        'order_delivered_carrier_date': np.where(in_transit, carrier, not_a_time),
+        'order_delivered_customer_date': np.where(status == 'delivered', delivered,
+                                                  not_a_time),
+        'order_estimated_delivery_date': estimated
+    }
+
+    # Expand orders into items: item numbers restart at 1 within each order
+    n_items = rng.choice(ITEMS_PER_ORDER, n, p=ITEMS_PER_ORDER_WEIGHTS)
+    total_items = int(n_items.sum())
+    item_order = np.repeat(np.arange(n), n_items)
+    item_offsets = np.repeat(np.cumsum(n_items) - n_items, n_items)
+    seller_index = (sizes['sellers'] * rng.random(total_items) ** SELLER_SKEW).astype(np.int64)
+    price = np.round(rng.lognormal(3.5, 0.8, total_items), 2)
+    freight = np.round(rng.uniform(5, 50, total_items), 2)
+
+    order_items = {
+        'order_id': order_ids[item_order],
+        'order_item_id': np.arange(total_items) - item_offsets + 1,
+        'product_id': format_ids('PROD_', rng.integers(0, sizes['products'], total_items),
+                                 product_width),
+        'seller_id': format_ids('SELLER_', seller_index, seller_width),
+        'shipping_limit_date': (purchase[item_order]
+                                + rng.integers(1, 30, total_items) * one_day),
+        'price': price,
+        'freight_value': freight
+    }
+
+    # Payments cover the order total; a few orders split it between a
+    # voucher (payment_sequential 1) and the main payment method
+    order_total = np.bincount(item_order, weights=price + freight, minlength=n)
+    split = rng.random(n) < SPLIT_PAYMENT_RATE
+    n_payments = 1 + split.astype(np.int64)
+    payment_order = np.repeat(np.arange(n), n_payments)
+    payment_offsets = np.repeat(np.cumsum(n_payments) - n_payments, n_payments)
+    sequential = np.arange(len(payment_order)) - payment_offsets + 1
+    voucher_value = np.where(split, np.round(order_total * rng.uniform(0.1, 0.5, n), 2), 0.0)
+    main_value = np.round(order_total - voucher_value, 2)
+    main_type = rng.choice(PAYMENT_TYPES, n, p=PAYMENT_TYPE_WEIGHTS)
+    installments = rng.choice(INSTALLMENTS, n, p=INSTALLMENT_WEIGHTS)
+
+    is_voucher_part = split[payment_order] & (sequential == 1)
+    payment_type = np.where(is_voucher_part, 'voucher', main_type[payment_order])
+    order_payments = {
+        'order_id': order_ids[payment_order],
+        'payment_sequential': sequential,
+        'payment_type': payment_type,
+        'payment_installments': np.where(payment_type == 'credit_card',
+                                         installments[payment_order], 1),
+        'payment_value': np.where(is_voucher_part, voucher_value[payment_order],
+                                  main_value[payment_order])
     }
 
-    customers_df = pd.DataFrame(customers_data)
-
-    # Sample products
-    categories = ['Electronics', 'Home & Garden', 'Fashion', 'Sports', 'Health & Beauty', 
-                 'Auto', 'Books', 'Toys', 'Food & Beverages']
-
-    products_data = {
-        'product_id': [f'PROD_{i:06d}' for i in range(n_products)],
-        'product_category_name': np.random.choice(categories, n_products),
-        'product_name_length': np.random.randint(10, 100, n_products),
-        'product_description_length': np.random.randint(50, 500, n_products),
-        'product_photos_qty': np.random.randint(1, 10, n_products),
-        'product_weight_g': np.random.randint(50, 5000, n_products),
-        'product_length_cm': np.random.randint(5, 50, n_products),
-        'product_height_cm': np.random.randint(5, 50, n_products),
-        'product_width_cm': np.random.randint(5, 50, n_products)
+    # Reviews are requested the day after delivery (or the estimated date
+    # for orders that never arrived) and answered within a few days
+    reviewed = np.flatnonzero(rng.random(n) < REVIEW_RATE)
+    n_reviews = len(reviewed)
+    score = rng.choice(REVIEW_SCORES, n_reviews, p=REVIEW_SCORE_WEIGHTS)
+    review_basis = np.where(status == 'delivered', delivered, estimated)[reviewed]
+    created = (review_basis.astype('datetime64[D]') + one_day).astype('datetime64[s]')
+    title = np.where(rng.random(n_reviews) < REVIEW_TITLE_RATE,
+                     REVIEW_TITLES[score - 1], None)
+    message = np.where(rng.random(n_reviews) < REVIEW_MESSAGE_RATE,
+                       REVIEW_MESSAGES[score - 1], None)
+
+    order_reviews = {
+        'review_id': format_ids('REVIEW_', order_index[reviewed], order_width),
+        'order_id': order_ids[reviewed],
+        'review_score': score,
+        'review_comment_title': title,
+        'review_comment_message': message,
+        'review_creation_date': created,
+        'review_answer_timestamp': created + rng.integers(3600, 5 * 86400,
+                                                          n_reviews).astype('timedelta64[s]')
     }
 
-    products_df = pd.DataFrame(products_data)
-
-    # Sample orders
-    start_date = datetime(2017, 1, 1)
-    end_date = datetime(2018, 12, 31)
-    date_range = (end_date - start_date).days
-
-    orders_data = {
-        'order_id': [f'ORDER_{i:08d}' for i in range(n_orders)],
-        'customer_id': np.random.choice(customers_df['customer_id'], n_orders),
-        'order_status': np.random.choice(['delivered', 'shipped', 'processing', 'cancelled'], 
-                                       n_orders, p=[0.85, 0.08, 0.04, 0.03]),
-        'order_purchase_timestamp': [
-            start_date + timedelta(days=np.random.randint(0, date_range))
-            for _ in range(n_orders)
-        ]
+    return {
+        'orders': orders,
+        'order_items': order_items,
+        'order_payments': order_payments,
+        'order_reviews': order_reviews
     }
 
-    orders_df = pd.DataFrame(orders_data)
-
-    # Add delivery dates
-    orders_df['order_approved_at'] = orders_df['order_purchase_timestamp'] + pd.Timedelta(days=1)
-    orders_df['order_delivered_carrier_date'] = orders_df['order_approved_at'] + pd.Timedelta(days=2)
-    orders_df['order_delivered_customer_date'] = orders_df['order_delivered_carrier_date'] + pd.Timedelta(days=5)
-    orders_df['order_estimated_delivery_date'] = orders_df['order_delivered_carrier_date'] + pd.Timedelta(days=7)
-
-    # Sample order items
-    order_items_data = []
-    for order_id in orders_df['order_id']:
-        n_items = np.random.choice([1, 2, 3, 4], p=[0.7, 0.2, 0.08, 0.02])
-        for item_id in range(1, n_items + 1):
-            order_items_data.append({
-                'order_id': order_id,
-                'order_item_id': item_id,
-                'product_id': np.random.choice(products_df['product_id']),
-                'seller_id': f'SELLER_{np.random.randint(1, 1000):04d}',
-                'shipping_limit_date': datetime.now() + timedelta(days=np.random.randint(1, 30)),
-                'price': round(np.random.lognormal(3.5, 0.8), 2),
-                'freight_value': round(np.random.uniform(5, 50), 2)
-            })
-
-    order_items_df = pd.DataFrame(order_items_data)
-
-    # Save to database
-    conn = sqlite3.connect('ecommerce_analysis.db')
-
-    customers_df.to_sql('customers', conn, if_exists='replace', index=False)
-    products_df.to_sql('products', conn, if_exists='replace', index=False)
-    orders_df.to_sql('orders', conn, if_exists='replace', index=False)
-    order_items_df.to_sql('order_items', conn, if_exists='replace', index=False)
+# Shard builders keyed by the table whose ID space they split
+SHARD_BUILDERS = {
+    'customers': _customer_shard,
+    'products': _product_shard,
+    'sellers': _seller_shard,
+    'orders': _order_shard
+}
+
+@instrumentation.instrumented(rows=lambda shard: sum(len(next(iter(chunk.values()), ()))
+                                                       for chunk in shard.values()))
+def generate_shard(table, shard_index, scale_factor=1.0, chunk_size=DEFAULT_CHUNK_SIZE, seed=42):
+    """Generate one shard of the synthetic dataset
+
+    Shard i of a table covers IDs [i * chunk_size, (i + 1) * chunk_size). The
+    'orders' shards also carry the items, payments and reviews of those
+    orders. Returns a dict mapping table names to dicts of column arrays.
+    """
+    sizes = table_sizes(scale_factor)
+    start = shard_index * chunk_size
+    stop = min(start + chunk_size, sizes[table])
+    return SHARD_BUILDERS[table](sizes, start, stop, _shard_rng(seed, table, shard_index))
+
+def _ordered_pool_map(func, tasks, workers):
+    """Run func(*task) in a process pool and yield results in task order
+
+    At most 2 * workers tasks are in flight, so results waiting for the
+    writer never pile up in memory.
+    """
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(func, *task) for task in itertools.islice(tasks, 2 * workers))
+        while pending:
+            result = pending.popleft().result()
+            for task in itertools.islice(tasks, 1):
+                pending.append(pool.submit(func, *task))
+            yield result
+
+def iter_shards(scale_factor=1.0, chunk_size=DEFAULT_CHUNK_SIZE, seed=42, workers=1):
+    """Yield every shard of the dataset, in table load order
+
+    With workers > 1 the shards are generated in a process pool; the output
+    is bit-identical for any worker count.
+    """
+    tasks = [(table, i, scale_factor, chunk_size, seed)
+             for table in SHARD_BUILDERS
+             for i in range(shard_count(table, scale_factor, chunk_size))]
+    if workers <= 1:
+        for task in tasks:
+            yield generate_shard(*task)
+    else:
+        for shard in _ordered_pool_map(instrumentation.in_worker(generate_shard), tasks, workers):
+            yield instrumentation.gather(shard)
+
+def iter_customer_chunks(scale_factor=1.0, chunk_size=DEFAULT_CHUNK_SIZE, seed=42):
+    """Yield the customers table as dicts of NumPy column arrays"""
+    for i in range(shard_count('customers', scale_factor, chunk_size)):
+        yield generate_shard('customers', i, scale_factor, chunk_size, seed)['customers']
+
+def iter_product_chunks(scale_factor=1.0, chunk_size=DEFAULT_CHUNK_SIZE, seed=42):
+    """Yield the products table as dicts of NumPy column arrays"""
+    for i in range(shard_count('products', scale_factor, chunk_size)):
+        yield generate_shard('products', i, scale_factor, chunk_size, seed)['products']
+
+def iter_seller_chunks(scale_factor=1.0, chunk_size=DEFAULT_CHUNK_SIZE, seed=42):
+    """Yield the sellers table as dicts of NumPy column arrays"""
+    for i in range(shard_count('sellers', scale_factor, chunk_size)):
+        yield generate_shard('sellers', i, scale_factor, chunk_size, seed)['sellers']
+
+def iter_order_chunks(scale_factor=1.0, chunk_size=DEFAULT_CHUNK_SIZE, seed=42):
+    """Yield the order-level tables as dicts of NumPy column arrays
+
+    Each chunk covers at most chunk_size orders and maps 'orders',
+    'order_items', 'order_payments' and 'order_reviews' to their rows for
+    those orders, so child tables never have to be joined back later.
+    """
+    for i in range(shard_count('orders', scale_factor, chunk_size)):
+        yield generate_shard('orders', i, scale_factor, chunk_size, seed)
+
+def _datetime_text(values):
+    """Render datetime64 values as SQLite 'YYYY-MM-DD HH:MM:SS' text, NaT as None
+
+    The digits are written straight into a byte buffer with integer
+    arithmetic, which is several times faster than np.datetime_as_string.
+    """
+    values = values.astype('datetime64[s]')
+    missing = np.isnat(values)
+    seconds = np.where(missing, np.datetime64(0, 's'), values)
+    days = seconds.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    time_of_day = (seconds - days).astype(np.int64)
+    fields = [
+        ((months.astype('datetime64[Y]').astype(np.int64) + 1970), 4),
+        (months.astype(np.int64) % 12 + 1, 2),
+        ((days - months).astype(np.int64) + 1, 2),
+        (time_of_day // 3600, 2),
+        (time_of_day // 60 % 60, 2),
+        (time_of_day % 60, 2),
+    ]
+
+    raw = np.empty((len(values), 19), dtype=np.uint8)
+    raw[:, [4, 7]] = ord('-')
+    raw[:, 10] = ord(' ')
+    raw[:, [13, 16]] = ord(':')
+    position = 0
+    for field, width in fields:
+        for i in range(width):
+            raw[:, position + i] = field // 10 ** (width - 1 - i) % 10 + ord('0')
+        position += width + 1
+
+    result = raw.view('S19').ravel().astype(str).astype(object)
+    result[missing] = None
+    return result
+
+def _chunk_rows(chunk, columns):
+    """Convert a chunk of column arrays into Python row tuples for executemany"""
+    converted = []
+    for col in columns:
+        values = np.asarray(chunk[col])
+        if np.issubdtype(values.dtype, np.datetime64):
+            values = _datetime_text(values)
+        converted.append(values.tolist())
+    return zip(*converted)
+
+@instrumentation.instrument_methods
+class BulkLoader:
+    """
+    Schema-preserving SQLite bulk loader
+
+    Used as a context manager: on entry it applies LOAD_PRAGMAS (or the given
+    pragmas) and drops the secondary indexes of the given tables (primary
+    keys stay in place), every load() call inserts a chunk with executemany
+    inside a large transaction, and on exit the indexes are rebuilt, the
+    pragmas restored and rows/sec reported per table.
+    """
+
+    def __init__(self, conn, tables, commit_rows=DEFAULT_COMMIT_ROWS, on_conflict=None,
+                 verbose=True, pragmas=None):
+        self.conn = conn
+        self.pragmas = LOAD_PRAGMAS if pragmas is None else pragmas
+        self.tables = list(tables)
+        self.commit_rows = commit_rows
+        self.on_conflict = on_conflict
+        self.verbose = verbose
+        self.stats = {table: {'rows': 0, 'seconds': 0.0} for table in self.tables}
+        self._indexes = []
+        self._saved_pragmas = {}
+        self._pending_rows = 0
+        self._statements = {}
+
+    def __enter__(self):
+        for pragma, value in self.pragmas.items():
+            self._saved_pragmas[pragma] = self.conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+            self.conn.execute(f"PRAGMA {pragma} = {value}")
+
+        placeholders = ','.join('?' * len(self.tables))
+        self._indexes = self.conn.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({placeholders})", self.tables).fetchall()
+        for name, _ in self._indexes:
+            self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+        self.conn.execute("BEGIN")
+        return self
+
+    def _insert_verb(self):
+        return f"INSERT OR {self.on_conflict}" if self.on_conflict else "INSERT"
+
+    def _insert_statement(self, table, columns):
+        key = (table, tuple(columns))
+        if key not in self._statements:
+            self._statements[key] = (f"{self._insert_verb()} INTO {table} ({', '.join(columns)}) "
+                                     f"VALUES ({', '.join('?' * len(columns))})")
+        return self._statements[key]
+
+    def load(self, table, chunk):
+        """Insert one chunk (dict of column arrays or DataFrame) and return its row count"""
+        started = time.perf_counter()
+        columns = list(chunk.keys())
+        n_rows = len(chunk[columns[0]]) if columns else 0
+        self.conn.executemany(self._insert_statement(table, columns),
+                              _chunk_rows(chunk, columns))
+
+        self._pending_rows += n_rows
+        if self._pending_rows >= self.commit_rows:
+            self.conn.execute("COMMIT")
+            self.conn.execute("BEGIN")
+            self._pending_rows = 0
+
+        stats = self.stats.setdefault(table, {'rows': 0, 'seconds': 0.0})
+        stats['rows'] += n_rows
+        stats['seconds'] += time.perf_counter() - started
+        return n_rows
+
+    def copy_table(self, table, source_schema):
+        """Copy a whole table from an attached database with INSERT ... SELECT"""
+        started = time.perf_counter()
+        n_rows = self.conn.execute(
+            f"{self._insert_verb()} INTO main.{table} SELECT * FROM {source_schema}.{table}").rowcount
+
+        stats = self.stats.setdefault(table, {'rows': 0, 'seconds': 0.0})
+        stats['rows'] += n_rows
+        stats['seconds'] += time.perf_counter() - started
+        return n_rows
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+        started = time.perf_counter()
+        for _, sql in self._indexes:
+            self.conn.execute(sql)
+        self.conn.commit()
+        index_seconds = time.perf_counter() - started
+
+        for pragma, value in self._saved_pragmas.items():
+            self.conn.execute(f"PRAGMA {pragma} = {value}")
+
+        if self.verbose and exc_type is None:
+            print("📥 Bulk load throughput:")
+            for table, stats in self.stats.items():
+                rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+                print(f"   • {table}: {stats['rows']:,} rows in {stats['seconds']:.2f}s "
+                      f"({rate:,.0f} rows/sec)")
+            print(f"   • Rebuilt {len(self._indexes)} indexes in {index_seconds:.2f}s")
+        return False
+
+@instrumentation.instrumented
+def generate_sample_data(scale_factor=1.0, chunk_size=DEFAULT_CHUNK_SIZE, seed=42,
+                         db_path=config.DATABASE_PATH, workers=1):
+    """Generate sample data for testing purposes
+
+    All columns are produced as NumPy arrays in chunks of at most chunk_size
+    orders, so memory stays bounded whatever the scale factor. With
+    workers > 1 the shards are generated in parallel; the database content
+    depends only on scale_factor, chunk_size and seed. Existing tables
+    are recreated from SCHEMA_SQL and filled through BulkLoader, so primary
+    keys and indexes survive the load.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    create_tables(conn, reset=True)
+    counts = dict.fromkeys(TABLE_NAMES, 0)
+
+    # Shards may be generated in worker processes, but this process is the
+    # only writer to the database
+    with BulkLoader(conn, TABLE_NAMES) as loader:
+        for shard in iter_shards(scale_factor, chunk_size, seed, workers):
+            for table, chunk in shard.items():
+                counts[table] += loader.load(table, chunk)
 
     conn.close()
 
-    print(f"✅ Sample data generated:")
-    print(f"   • {len(customers_df):,} customers")
-    print(f"   • {len(products_df):,} products")
-    print(f"   • {len(orders_df):,} orders")
-    print(f"   • {len(order_items_df):,} order items")
+    print(f"✅ Sample data generated (scale factor {scale_factor:g}):")
+    for table, count in counts.items():
+        print(f"   • {count:,} {table.replace('_', ' ')}")
+
+    return counts
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Set up the e-commerce analysis database")
+    parser.add_argument('--scale-factor', type=float, default=1.0,
+                        help="dataset size relative to the 15,000-order sample")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="orders generated per chunk")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="processes used to generate shards")
+    parser.add_argument('--db-path', default=config.DATABASE_PATH)
+    parser.add_argument('--instrument', nargs='?', const=config.RUN_REPORT_FILE, default=None,
+                        metavar='REPORT', help="record timings and memory into a JSON run report")
+    args = parser.parse_args()
+    if args.instrument:
+        instrumentation.enable()
+
     print("🚀 Setting up E-Commerce Analysis Database...")
     print("=" * 50)
 
     # Create database schema
-    create_database_schema()
+    create_database_schema(args.db_path)
 
     # Generate sample data
-    generate_sample_data()
+    generate_sample_data(args.scale_factor, args.chunk_size, args.seed, args.db_path,
+                         args.workers)
 
     print("\n✅ Database setup complete!")
+    if args.instrument:
+        instrumentation.print_summary(instrumentation.write_report(args.instrument))
+        print(f"   • Run report: {args.instrument}")
     print("📊 Ready to run analysis scripts")
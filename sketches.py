@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Mergeable Summary Sketches for Chunked and Out-of-Core Analysis
+"""
+
+import numpy as np
+import pandas as pd
+
+def hash_values(values):
+    """64-bit hashes of an array or Series, stable across processes and runs"""
+    if isinstance(values, pd.Series):
+        values = values.to_numpy()
+    return pd.util.hash_array(np.asarray(values))
+
+def sorted_unique(values):
+    """
+    Sorted distinct values of an array, found by sorting (on large uint64
+    arrays this is much faster than np.unique, which builds a hash table)
+    """
+    values = np.sort(values)
+    if len(values):
+        values = values[np.concatenate(([True], values[1:] != values[:-1]))]
+    return values
+
+def hash_rows(df):
+    """One 64-bit hash per row of a DataFrame, combining all of its columns"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def _bit_length(values):
+    """Vectorized int.bit_length() for uint64 arrays"""
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= np.uint64(1 << shift)
+        lengths[high] += shift
+        values[high] >>= np.uint64(shift)
+    lengths += (values > 0).astype(np.uint8)
+    return lengths
+
+def _register_updates(hashes, precision):
+    """Register index and rank of every hash for a sketch of the given precision"""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    tail_bits = 64 - precision
+    index = (hashes >> np.uint64(tail_bits)).astype(np.intp)
+    tail = hashes & np.uint64((1 << tail_bits) - 1)
+    # Rank: position of the first set bit of the tail, counted from the top
+    rank = (tail_bits + 1 - _bit_length(tail)).astype(np.uint8)
+    return index, rank
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count estimator
+
+    Holds m = 2**precision one-byte registers whatever the number of values
+    added. The relative standard error of count() is about 1.04 / sqrt(m):
+    1.6% at precision 12 (4 KB), 0.8% at 14 (16 KB); below 2.5 * m distinct
+    values linear counting is used and is considerably more accurate. Two
+    sketches with the same precision merge by taking the register-wise
+    maximum, so sketches built on separate chunks, months or shards combine
+    into the sketch of their union. to_bytes() and from_bytes() store a
+    sketch, e.g. as a BLOB next to the aggregates it belongs to.
+    """
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        """Add values given as uint64 hashes (see hash_values)"""
+        if not len(hashes):
+            return self
+        index, rank = _register_updates(hashes, self.precision)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def add(self, values):
+        """Add the non-null entries of an array or Series"""
+        values = pd.Series(values)
+        return self.add_hashes(hash_values(values[values.notna()]))
+
+    def merge(self, other):
+        """Fold another sketch into this one (in place)"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    @property
+    def standard_error(self):
+        """Relative standard error of count(): 1.04 / sqrt(2**precision)"""
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def to_bytes(self):
+        """Serialize the sketch: one precision byte followed by the registers"""
+        return bytes([self.precision]) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a sketch serialized by to_bytes()"""
+        sketch = cls(data[0])
+        sketch.registers = np.frombuffer(data, dtype=np.uint8, offset=1).copy()
+        return sketch
+
+    def count(self):
+        """Estimated number of distinct values added"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+def group_sketches(groups, n_groups, hashes, precision=12):
+    """
+    One HyperLogLog per group, built in a single vectorized pass
+
+    groups holds the group number (0..n_groups-1) of each hash. The
+    registers of all groups are updated together, which needs n_groups *
+    2**precision bytes.
+    """
+    registers = np.zeros((n_groups, 1 << precision), dtype=np.uint8)
+    if len(hashes):
+        index, rank = _register_updates(hashes, precision)
+        np.maximum.at(registers, (np.asarray(groups, dtype=np.intp), index), rank)
+    sketches = []
+    for row in registers:
+        sketch = HyperLogLog(precision)
+        sketch.registers = row
+        sketches.append(sketch)
+    return sketches
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Dependency-Aware Task Scheduling for the E-Commerce Analysis Pipelines
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+class TaskFailed(Exception):
+    """Raised for a task that was skipped because a dependency failed"""
+
+class TaskGraph:
+    """
+    A set of named tasks with explicit dependencies
+
+    Each task is a callable with its arguments. run() starts every task as
+    soon as all of its dependencies have finished, on a process or thread
+    pool, so independent tasks overlap and the wall-clock time approaches
+    that of the longest dependency chain.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+
+    def add(self, name, func, *args, depends_on=(), **kwargs):
+        """Register a task; depends_on names tasks that must finish first"""
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        self.tasks[name] = {'func': func, 'args': args, 'kwargs': kwargs,
+                            'depends_on': list(depends_on)}
+        return self
+
+    def _select(self, only):
+        """The requested tasks plus everything they transitively depend on"""
+        if only is None:
+            return set(self.tasks)
+
+        selected = set()
+        pending = list(only)
+        while pending:
+            name = pending.pop()
+            if name not in self.tasks:
+                raise KeyError(f"Unknown task: {name}")
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.tasks[name]['depends_on'])
+        return selected
+
+    def order(self, only=None):
+        """Task names in a valid execution order (raises ValueError on cycles)"""
+        selected = self._select(only)
+        ordered = []
+        state = {}
+
+        def visit(name):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Dependency cycle through task: {name}")
+            state[name] = 'visiting'
+            for dependency in self.tasks[name]['depends_on']:
+                if dependency not in self.tasks:
+                    raise KeyError(f"Task {name} depends on unknown task {dependency}")
+                visit(dependency)
+            state[name] = 'done'
+            ordered.append(name)
+
+        for name in self.tasks:
+            if name in selected:
+                visit(name)
+        return ordered
+
+    def run(self, max_workers=None, processes=False, only=None):
+        """
+        Execute the graph and return (results, errors), both keyed by task name
+
+        max_workers=1 runs every task in the calling thread, in dependency
+        order. Otherwise tasks run on a ProcessPoolExecutor (processes=True;
+        callables and arguments must be picklable) or a ThreadPoolExecutor.
+        A failing task does not stop independent tasks; its dependents are
+        reported in errors as TaskFailed.
+        """
+        ordered = self.order(only)
+        results, errors = {}, {}
+
+        def blocked(name):
+            failed = [dep for dep in self.tasks[name]['depends_on'] if dep in errors]
+            if failed:
+                errors[name] = TaskFailed(f"dependency failed: {', '.join(failed)}")
+            return bool(failed)
+
+        if max_workers == 1:
+            for name in ordered:
+                if blocked(name):
+                    continue
+                task = self.tasks[name]
+                try:
+                    results[name] = task['func'](*task['args'], **task['kwargs'])
+                except Exception as e:
+                    errors[name] = e
+            return results, errors
+
+        executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        waiting = list(ordered)
+        running = {}
+        with executor_class(max_workers=max_workers) as executor:
+            while waiting or running:
+                for name in list(waiting):
+                    dependencies = self.tasks[name]['depends_on']
+                    if any(dep in waiting or dep in running.values() for dep in dependencies):
+                        continue
+                    waiting.remove(name)
+                    if not blocked(name):
+                        task = self.tasks[name]
+                        future = executor.submit(task['func'], *task['args'], **task['kwargs'])
+                        running[future] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        errors[name] = e
+
+        return results, errors
@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+import pytest
+
+from data_preprocessing import (PARTITION_COLUMNS, _CsvWriter, _ParquetWriter,
+                                load_processed_table, parquet_available, processed_path,
+                                processed_format)
+
+MONTHS = [(2017, 1), (2018, 12)]
+
+def _orders():
+    timestamps = pd.to_datetime(['2017-01-05', '2017-01-20', '2017-02-03', '2018-12-31',
+                                 '2018-11-30'])
+    return pd.DataFrame({'order_id': [f'o{i}' for i in range(len(timestamps))],
+                         'order_purchase_timestamp': timestamps,
+                         'order_year': timestamps.year, 'order_month': timestamps.month})
+
+def _write(tmp_path, table, df, output_format):
+    path = processed_path(table, output_format, str(tmp_path))
+    if output_format == 'parquet':
+        _ParquetWriter(path, PARTITION_COLUMNS).write(df.copy())
+    else:
+        _CsvWriter(path).write(df)
+
+@pytest.mark.parametrize('output_format', [
+    'csv', pytest.param('parquet', marks=pytest.mark.skipif(not parquet_available(),
+                                                            reason="needs pyarrow"))])
+@pytest.mark.parametrize('columns', [None, ['order_id']])
+def test_month_filter(tmp_path, output_format, columns):
+    _write(tmp_path, 'orders', _orders(), output_format)
+
+    df = load_processed_table('orders', columns=columns, months=MONTHS,
+                              processed_dir=str(tmp_path), output_format=output_format)
+
+    assert sorted(df['order_id']) == ['o0', 'o1', 'o3']
+    if columns is not None:
+        assert list(df.columns) == columns
+
+def test_csv_month_filter_without_partition_columns(tmp_path):
+    items = pd.DataFrame({'order_id': ['o0', 'o1'], 'price': [1.0, 2.0]})
+    _write(tmp_path, 'order_items', items, 'csv')
+
+    with pytest.raises(ValueError):
+        load_processed_table('order_items', months=MONTHS, processed_dir=str(tmp_path),
+                             output_format='csv')
+    assert len(load_processed_table('order_items', processed_dir=str(tmp_path))) == 2
+
+@pytest.mark.skipif(not parquet_available(), reason="needs pyarrow")
+def test_format_follows_newer_export(tmp_path):
+    _write(tmp_path, 'orders', _orders(), 'parquet')
+    _write(tmp_path, 'orders', _orders().head(2), 'csv')
+    parquet = processed_path('orders', 'parquet', str(tmp_path))
+    csv = processed_path('orders', 'csv', str(tmp_path))
+
+    os.utime(parquet, (1, 1))
+    assert processed_format('orders', str(tmp_path)) == 'csv'
+    assert len(load_processed_table('orders', processed_dir=str(tmp_path))) == 2
+
+    os.utime(csv, (0, 0))
+    assert processed_format('orders', str(tmp_path)) == 'parquet'
+
+@pytest.mark.skipif(not parquet_available(), reason="needs pyarrow")
+def test_rows_without_order_date_read_back(tmp_path):
+    # An order item whose order is missing, and one order with an unparsable date
+    items = pd.DataFrame({'order_id': ['o0', 'orphan'], 'price': [1.0, 2.0],
+                          'order_purchase_timestamp': pd.to_datetime(['2017-01-05', None])})
+    items['order_year'] = items['order_purchase_timestamp'].dt.year
+    items['order_month'] = items['order_purchase_timestamp'].dt.month
+    _write(tmp_path, 'order_items', items, 'parquet')
+
+    df = load_processed_table('order_items', processed_dir=str(tmp_path))
+    assert sorted(df['order_id']) == ['o0', 'orphan']
+    assert str(df['order_year'].dtype) == 'Int32'
+    assert df.loc[df['order_id'] == 'orphan', PARTITION_COLUMNS].isna().all(axis=None)
+
+    df = load_processed_table('order_items', months=MONTHS, processed_dir=str(tmp_path))
+    assert list(df['order_id']) == ['o0']
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_profiler import TableProfile, count_unique_runs, profile_frame
+
+def _table(rows=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'order_id': rng.integers(0, rows // 2, rows).astype(str),
+        'order_item_id': rng.integers(1, 3, rows),
+        'price': np.where(rng.random(rows) < 0.1, np.nan, rng.random(rows) * 100),
+        'order_date': pd.Timestamp('2017-01-01') + pd.to_timedelta(rng.integers(0, 10**7, rows),
+                                                                   unit='s'),
+        'status': pd.Categorical(rng.choice(['delivered', 'shipped', None], rows))
+    })
+
+def _expected_duplicates(df, key):
+    return int(df.duplicated(key).sum())
+
+KEY = ['order_id', 'order_item_id']
+
+@pytest.mark.parametrize('key_buffer_size', [1 << 20, 1000])
+def test_chunked_profile_matches_whole_table(key_buffer_size):
+    df = _table()
+    profile = TableProfile('order_items', KEY, key_buffer_size=key_buffer_size)
+    for start in range(0, len(df), 3000):
+        profile.update(df.iloc[start:start + 3000])
+
+    report = profile.to_dict()
+    assert report == profile_frame(df, 'order_items', KEY)
+    assert report['duplicate_keys'] == _expected_duplicates(df, KEY)
+    if key_buffer_size == 1000:
+        assert profile.key_runs
+
+    price = report['columns']['price']
+    assert price['nulls'] == int(df['price'].isna().sum())
+    assert price['min'] == pytest.approx(df['price'].min())
+    assert price['max'] == pytest.approx(df['price'].max())
+    assert report['columns']['order_date']['min'] == df['order_date'].min().isoformat()
+    assert report['columns']['status']['min'] is None
+    assert report['columns']['status']['distinct_estimate'] == 2
+
+def test_merge_combines_spilled_runs():
+    df = _table(seed=1)
+    left = TableProfile('order_items', KEY, key_buffer_size=500).update(df.iloc[:8000])
+    right = TableProfile('order_items', KEY, key_buffer_size=500).update(df.iloc[8000:])
+
+    report = left.merge(right).to_dict()
+    assert report['rows'] == len(df)
+    assert report['duplicate_keys'] == _expected_duplicates(df, KEY)
+
+def test_count_unique_runs():
+    rng = np.random.default_rng(2)
+    runs = [np.unique(rng.integers(0, 5000, 3000).astype(np.uint64)) for _ in range(4)]
+    expected = len(np.unique(np.concatenate(runs)))
+    assert count_unique_runs(runs, block_size=64) == expected
+    assert count_unique_runs([]) == 0
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from ecommerce_data_analysis import EcommerceAnalyzer
+
+def _orders():
+    return pd.DataFrame({
+        'order_id': ['o1', 'o2', None, 'o4', 'o5', 'o6'],
+        'customer_id': ['x', 'y', 'x', None, None, 'y'],
+        'order_date': pd.to_datetime(['2017-01-05', '2017-01-20', '2017-02-03', '2017-02-10',
+                                      '2017-03-01', '2017-03-02']),
+        'total_amount': [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+        'product_category': ['Books'] * 6,
+        'customer_state': ['SP', 'RJ', 'SP', 'SP', 'RJ', 'RJ'],
+        'payment_type': ['boleto', 'voucher'] * 3
+    })
+
+def _analyzer(tmp_path, name, encode, distinct_counts='exact'):
+    analyzer = EcommerceAnalyzer(str(tmp_path / f'{name}.db'), headless=True,
+                                 distinct_counts=distinct_counts)
+    analyzer.df = _orders()
+    if encode:
+        analyzer.encode()
+    return analyzer
+
+def test_decode_missing_ids(tmp_path):
+    analyzer = _analyzer(tmp_path, 'decode', encode=True)
+    codes = analyzer.df['customer_id']
+    assert codes.tolist() == [0, 1, 0, -1, -1, 1]
+    assert list(analyzer.decode('customer_id', codes).isna()) == [False] * 3 + [True] * 2 + [False]
+    assert list(analyzer.decode('customer_id', codes[:3])) == ['x', 'y', 'x']
+
+@pytest.mark.parametrize('distinct_counts', ['exact', 'approximate'])
+def test_encoding_keeps_results(tmp_path, distinct_counts):
+    plain = _analyzer(tmp_path, 'plain', False, distinct_counts)
+    encoded = _analyzer(tmp_path, 'encoded', True, distinct_counts)
+    measures = {'total_amount': 'sum', 'order_id': 'count', 'customer_id': plain.distinct_func}
+
+    expected = plain.aggregate(['customer_id'], {'total_amount': 'sum', 'order_id': 'count'})
+    actual = encoded.aggregate(['customer_id'], {'total_amount': 'sum', 'order_id': 'count'})
+    actual.index = encoded.decode('customer_id', actual.index)
+    pd.testing.assert_frame_equal(actual, expected, check_names=False, check_index_type=False)
+
+    pd.testing.assert_frame_equal(encoded.aggregate(['order_month'], measures),
+                                  plain.aggregate(['order_month'], measures))
+    # Rolled up from the cube
+    by_state = encoded.aggregate(['customer_state'], {'order_id': 'count'})
+    assert by_state['order_id'].to_dict() == \
+        plain.aggregate(['customer_state'], {'order_id': 'count'})['order_id'].to_dict()
+    assert encoded.total('order_id', 'count') == plain.total('order_id', 'count') == 5
+    assert encoded.distinct_customers() == plain.distinct_customers() == 2
+    pd.testing.assert_frame_equal(encoded.monthly_revenue_store().to_frame(),
+                                  plain.monthly_revenue_store().to_frame())
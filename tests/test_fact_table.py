@@ -0,0 +1,61 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from fact_table import FACT_TABLE, refresh_fact_table
+from setup_database import generate_sample_data
+
+@pytest.fixture(scope='module')
+def sample_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('fact') / 'sample.db')
+    generate_sample_data(scale_factor=0.05, seed=7, db_path=path)
+    return path
+
+def _facts(conn):
+    return pd.read_sql(f"SELECT * FROM {FACT_TABLE} ORDER BY order_id", conn)
+
+def _record_batch(conn, changes):
+    batch_id = conn.execute("INSERT INTO ingestion_batches (mode, started_at) "
+                            "VALUES ('incremental', datetime('now'))").lastrowid
+    conn.executemany("INSERT INTO ingestion_changes (batch_id, table_name, row_key, order_id, "
+                     "change_type) VALUES (?, ?, ?, ?, 'update')",
+                     [(batch_id,) + change for change in changes])
+    conn.commit()
+
+def test_partial_refresh_matches_full_rebuild(sample_db, tmp_path):
+    conn = sqlite3.connect(sample_db)
+    assert refresh_fact_table(conn)['mode'] == 'full'
+    assert refresh_fact_table(conn)['mode'] == 'up-to-date'
+
+    order_id, customer_id = conn.execute(
+        "SELECT o.order_id, o.customer_id FROM orders o "
+        "JOIN order_items i ON i.order_id = o.order_id "
+        "WHERE o.order_purchase_timestamp LIKE '2017-03%' LIMIT 1").fetchone()
+    product_id = conn.execute("SELECT product_id FROM order_items "
+                              "WHERE order_id != ? LIMIT 1", (order_id,)).fetchone()[0]
+    other_customer = conn.execute("SELECT customer_id FROM orders WHERE customer_id != ? "
+                                  "LIMIT 1", (customer_id,)).fetchone()[0]
+
+    # An order moved to another month, a renamed product category and a
+    # customer who moved state
+    conn.execute("UPDATE orders SET order_purchase_timestamp = '2018-06-15 10:00:00' "
+                 "WHERE order_id = ?", (order_id,))
+    conn.execute("UPDATE products SET product_category_name = 'renamed' WHERE product_id = ?",
+                 (product_id,))
+    conn.execute("UPDATE customers SET customer_state = 'XX' WHERE customer_id = ?",
+                 (other_customer,))
+    _record_batch(conn, [('orders', order_id, order_id), ('products', product_id, None),
+                         ('customers', other_customer, None)])
+
+    result = refresh_fact_table(conn)
+    assert result['mode'] == 'partial'
+    assert {'2017-03', '2018-06'} <= set(result['months'])
+    partial = _facts(conn)
+    assert partial.loc[partial['order_id'] == order_id, 'order_month'].item() == '2018-06'
+    assert (partial['product_category'] == 'renamed').any()
+
+    full = refresh_fact_table(conn, full=True)
+    assert full['mode'] == 'full'
+    pd.testing.assert_frame_equal(partial, _facts(conn))
+    conn.close()
@@ -0,0 +1,153 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from monthly_revenue import MONTHLY_REVENUE_TABLE, MonthlyRevenueStore
+from sketches import hash_values
+
+def _orders(rows=6000, seed=0):
+    rng = np.random.default_rng(seed)
+    orders = pd.DataFrame({
+        'order_id': [f'ORD_{seed}_{i:06d}' for i in range(rows)],
+        'customer_id': [f'CUST_{i:05d}' for i in rng.integers(0, 1500, rows)],
+        'order_date': pd.Timestamp('2017-01-01') + pd.to_timedelta(
+            rng.integers(0, 700 * 86400, rows), unit='s'),
+        'total_amount': rng.lognormal(4, 1, rows)
+    })
+    orders.loc[rng.random(rows) < 0.02, 'order_date'] = pd.NaT
+    orders.loc[rng.random(rows) < 0.02, 'customer_id'] = None
+    return orders
+
+def _groupby(orders):
+    months = orders['order_date'].dt.to_period('M')
+    monthly = orders.groupby(months).agg(Total_Revenue=('total_amount', 'sum'),
+                                         Total_Orders=('order_id', 'count'),
+                                         Unique_Customers=('customer_id', 'nunique'))
+    return monthly.rename_axis('Month').reset_index()
+
+def _assert_matches(store, orders):
+    expected = _groupby(orders)
+    actual = store.to_frame()
+    assert list(actual['Month']) == list(expected['Month'])
+    np.testing.assert_allclose(actual['Total_Revenue'], expected['Total_Revenue'])
+    np.testing.assert_array_equal(actual['Total_Orders'], expected['Total_Orders'])
+    np.testing.assert_array_equal(actual['Unique_Customers'], expected['Unique_Customers'])
+    dated = orders['order_date'].notna()
+    assert store.distinct_customers() == orders.loc[dated, 'customer_id'].nunique()
+
+def test_update_matches_groupby():
+    orders = _orders()
+    store = MonthlyRevenueStore('exact')
+    store.update(orders)
+    _assert_matches(store, orders)
+
+def test_batches_and_merge_match_groupby():
+    orders = _orders()
+    batched = MonthlyRevenueStore('exact')
+    for start in range(0, len(orders), 700):
+        batched.update(orders.iloc[start:start + 700])
+    _assert_matches(batched, orders)
+
+    left, right = MonthlyRevenueStore('exact'), MonthlyRevenueStore('exact')
+    left.update(orders.iloc[:2500])
+    right.update(orders.iloc[2500:])
+    _assert_matches(left.merge(right), orders)
+
+def test_customer_hashes_of_surrogate_keys():
+    orders = _orders()
+    codes, uniques = pd.factorize(orders['customer_id'], sort=True)
+    encoded = orders.assign(customer_id=codes.astype(np.int32))
+
+    store = MonthlyRevenueStore('exact')
+    store.update(encoded, hash_values(uniques))
+    _assert_matches(store, orders)
+
+def test_approximate_counts_within_error():
+    orders = _orders(rows=20000)
+    store = MonthlyRevenueStore('approximate', precision=12)
+    store.update(orders)
+    expected = _groupby(orders)['Unique_Customers'].to_numpy()
+    actual = store.to_frame()['Unique_Customers'].to_numpy()
+    error = 1.04 / np.sqrt(2 ** 12)
+    assert (np.abs(actual - expected) / expected <= 4 * error).all()
+
+def test_full_save_replaces_table():
+    conn = sqlite3.connect(':memory:')
+    orders = _orders()
+    old = MonthlyRevenueStore('approximate')
+    old.update(pd.concat([orders, orders.assign(order_date=pd.Timestamp('2015-06-01'))]))
+    old.save(conn)
+
+    store = MonthlyRevenueStore('exact')
+    store.update(orders)
+    store.save(conn)
+    assert conn.execute(f"SELECT COUNT(*), COUNT(DISTINCT distinct_counts) "
+                        f"FROM {MONTHLY_REVENUE_TABLE}").fetchone() == (len(store), 1)
+    pd.testing.assert_frame_equal(MonthlyRevenueStore.load(conn).to_frame(), store.to_frame())
+
+    first = store.to_frame()['Month'].iloc[0]
+    store.drop([first])
+    store.update(orders[orders['order_date'].dt.to_period('M') == first])
+    store.save(conn, [first])
+    pd.testing.assert_frame_equal(MonthlyRevenueStore.load(conn).to_frame(), store.to_frame())
+
+def test_append_orders_matches_rebuild(tmp_path, monkeypatch):
+    from ecommerce_data_analysis import EcommerceAnalyzer
+    monkeypatch.chdir(tmp_path)
+    analyzer = EcommerceAnalyzer('analysis.db', headless=True)
+    analyzer.load_sample_data()
+    analyzer.monthly_revenue_store()
+
+    batch = _orders(rows=300, seed=1).dropna()
+    batch = batch.assign(product_category='Books', price=batch['total_amount'], quantity=1,
+                         customer_state='SP', payment_type='boleto', review_score=5)
+    months = analyzer.append_orders(batch)
+    assert months
+
+    df = analyzer.df
+    assert df['order_date'].is_monotonic_increasing
+    decoded = df.assign(**{col: np.asarray(analyzer.decode(col, df[col]))
+                           for col in analyzer.dictionaries})
+    _assert_matches(analyzer.revenue_store, decoded)
+    assert set(batch['order_id']) <= set(decoded['order_id'])
+
+    table = pd.read_sql("SELECT order_id FROM orders_analysis", analyzer.conn)
+    assert set(batch['order_id']) <= set(table['order_id'])
+    pd.testing.assert_frame_equal(MonthlyRevenueStore.load(analyzer.conn).to_frame(),
+                                  analyzer.revenue_store.to_frame())
+    analyzer.conn.close()
+
+def _table_exists(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (MONTHLY_REVENUE_TABLE,)).fetchone() is not None
+
+def test_revenue_section_writes_nothing(tmp_path, monkeypatch):
+    from ecommerce_data_analysis import EcommerceAnalyzer
+    monkeypatch.chdir(tmp_path)
+    analyzer = EcommerceAnalyzer('analysis.db', headless=True)
+    analyzer.load_sample_data()
+    analyzer.revenue_trend_analysis()
+    assert not _table_exists(analyzer.conn)
+    analyzer.conn.close()
+
+def test_saved_store_is_restored(tmp_path, monkeypatch):
+    from ecommerce_data_analysis import EcommerceAnalyzer
+    from setup_database import generate_sample_data
+    monkeypatch.chdir(tmp_path)
+    generate_sample_data(scale_factor=0.05, seed=7, db_path='sample.db')
+
+    first = EcommerceAnalyzer('sample.db', headless=True)
+    first.load_fact_data()
+    assert first.revenue_store is None
+    expected = first.monthly_revenue_store().to_frame()
+    assert not _table_exists(first.conn)
+    first.save_revenue_store()
+    first.conn.close()
+
+    second = EcommerceAnalyzer('sample.db', headless=True)
+    second.load_fact_data()
+    assert second.revenue_store is not None
+    pd.testing.assert_frame_equal(second.revenue_store.to_frame(), expected)
+    second.conn.close()
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from rfm import assign_segments, quantile_scores, rfm_scores
+
+def _qcut_scores(values, percentiles=config.RFM_PERCENTILES):
+    labels = range(1, len(percentiles) + 2)
+    scores = pd.qcut(values, [0] + list(percentiles) + [1], labels=labels)
+    return np.asarray(scores, dtype=int)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_quantile_scores_match_qcut(seed):
+    values = np.random.default_rng(seed).lognormal(4, 1, 5000)
+    np.testing.assert_array_equal(quantile_scores(values), _qcut_scores(values))
+
+def test_lower_is_better_reverses_scores():
+    values = np.random.default_rng(3).random(1000)
+    np.testing.assert_array_equal(quantile_scores(values, higher_is_better=False),
+                                  len(config.RFM_PERCENTILES) + 2 - _qcut_scores(values))
+
+def test_tied_values_keep_order():
+    values = np.repeat([1, 1, 1, 2, 3], 100)
+    scores = quantile_scores(values)
+    assert scores.min() >= 1 and scores.max() <= len(config.RFM_PERCENTILES) + 1
+    assert len(set(scores[values == 1])) == 1
+    assert (np.diff(scores[np.argsort(values, kind='stable')]) >= 0).all()
+
+def test_rfm_scores_and_segments():
+    rng = np.random.default_rng(4)
+    rfm = pd.DataFrame({'Recency': rng.integers(0, 700, 2000),
+                        'Frequency': rng.integers(1, 6, 2000),
+                        'Monetary': rng.lognormal(4, 1, 2000)})
+    rfm = rfm_scores(rfm)
+
+    np.testing.assert_array_equal(rfm['M_Score'], _qcut_scores(rfm['Monetary']))
+    scores = rfm[['R_Score', 'F_Score', 'M_Score']].astype(int)
+    assert (rfm['RFM_Score'] == scores['R_Score'] * 100 + scores['F_Score'] * 10 +
+            scores['M_Score']).all()
+
+    segments = assign_segments(rfm)
+    high = (rfm['Frequency'] >= 3) & (rfm['Monetary'] >= 200)
+    assert (segments[high] == 'High Value').all()
+    assert (segments[~high & (rfm['Frequency'] < 2) & (rfm['Recency'] > 90)] == 'Low Value').all()
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import HyperLogLog, group_sketches, hash_values, sorted_unique
+
+def _ids(count, offset=0):
+    return np.array([f'CUST_{i:08d}' for i in range(offset, offset + count)], dtype=object)
+
+@pytest.mark.parametrize('precision', [10, 12, 14])
+@pytest.mark.parametrize('distinct', [100, 5000, 200000])
+def test_count_within_standard_error(precision, distinct):
+    sketch = HyperLogLog(precision).add(np.repeat(_ids(distinct), 3))
+    error = abs(sketch.count() - distinct) / distinct
+    # Four standard errors: a spurious failure is a ~1 in 15,000 event
+    assert error <= 4 * sketch.standard_error
+
+def test_merge_equals_union():
+    left, right = _ids(30000), _ids(30000, offset=20000)
+    merged = HyperLogLog(12).add(left).merge(HyperLogLog(12).add(right))
+    union = HyperLogLog(12).add(np.concatenate([left, right]))
+    np.testing.assert_array_equal(merged.registers, union.registers)
+    assert merged.count() == union.count()
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge(HyperLogLog(10))
+
+def test_group_sketches_match_one_sketch_per_group():
+    rng = np.random.default_rng(0)
+    values = _ids(5000)[rng.integers(0, 5000, 20000)]
+    groups = rng.integers(0, 7, len(values))
+    sketches = group_sketches(groups, 7, hash_values(values), precision=11)
+    for group, sketch in enumerate(sketches):
+        expected = HyperLogLog(11).add(values[groups == group])
+        np.testing.assert_array_equal(sketch.registers, expected.registers)
+
+def test_bytes_round_trip():
+    sketch = HyperLogLog(9).add(_ids(1000))
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert restored.precision == 9
+    np.testing.assert_array_equal(restored.registers, sketch.registers)
+
+def test_sorted_unique_matches_np_unique():
+    values = np.random.default_rng(1).integers(0, 1000, 10000).astype(np.uint64)
+    np.testing.assert_array_equal(sorted_unique(values), np.unique(values))
+    assert len(sorted_unique(np.empty(0, dtype=np.uint64))) == 0
+
+def test_analyzer_sketches_hash_original_ids(tmp_path, monkeypatch):
+    from ecommerce_data_analysis import EcommerceAnalyzer
+    monkeypatch.chdir(tmp_path)
+    analyzer = EcommerceAnalyzer('analysis.db', headless=True, distinct_counts='approximate')
+    analyzer.load_sample_data()
+    df = analyzer.df
+    ids = pd.Series(np.asarray(analyzer.decode('customer_id', df['customer_id'])))
+
+    by_state = analyzer.distinct_customers(['customer_state'])
+    for state, count in by_state.items():
+        expected = HyperLogLog().add(ids[(df['customer_state'] == state).to_numpy()].to_numpy())
+        assert count == expected.count()
+
+    monthly = analyzer.distinct_customers(['order_month'])
+    store = analyzer.monthly_revenue_store().to_frame().set_index('Month')
+    pd.testing.assert_series_equal(monthly, store['Unique_Customers'], check_names=False)
+    assert analyzer.distinct_customers() == HyperLogLog().add(ids.to_numpy()).count()
+    analyzer.conn.close()
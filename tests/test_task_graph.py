@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from task_graph import TaskFailed, TaskGraph
+
+def _graph(log, fail=()):
+    lock = threading.Lock()
+
+    def step(name):
+        if name in fail:
+            raise RuntimeError(name)
+        with lock:
+            log.append(name)
+        return name.upper()
+
+    graph = TaskGraph()
+    graph.add('load', step, 'load')
+    graph.add('clean', step, 'clean', depends_on=['load'])
+    graph.add('profile', step, 'profile', depends_on=['load'])
+    graph.add('report', step, 'report', depends_on=['clean', 'profile'])
+    graph.add('other', step, 'other')
+    return graph
+
+def test_order_respects_dependencies():
+    order = _graph([]).order()
+    assert sorted(order) == ['clean', 'load', 'other', 'profile', 'report']
+    assert order.index('load') < order.index('clean') < order.index('report')
+    assert order.index('profile') < order.index('report')
+
+def test_order_selects_dependencies_only():
+    assert _graph([]).order(only=['clean']) == ['load', 'clean']
+
+def test_order_rejects_cycles_and_unknown_tasks():
+    graph = TaskGraph()
+    graph.add('a', print, depends_on=['b'])
+    graph.add('b', print, depends_on=['a'])
+    with pytest.raises(ValueError):
+        graph.order()
+
+    graph = TaskGraph().add('a', print, depends_on=['missing'])
+    with pytest.raises(KeyError):
+        graph.order()
+    with pytest.raises(ValueError):
+        graph.add('a', print)
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_run_follows_dependencies(max_workers):
+    log = []
+    results, errors = _graph(log).run(max_workers=max_workers)
+
+    assert errors == {}
+    assert results == {name: name.upper() for name in log}
+    assert log.index('load') < log.index('clean') < log.index('report')
+    assert log.index('profile') < log.index('report')
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_failure_skips_dependents_only(max_workers):
+    log = []
+    results, errors = _graph(log, fail=['clean']).run(max_workers=max_workers)
+
+    assert sorted(results) == ['load', 'other', 'profile']
+    assert isinstance(errors['clean'], RuntimeError)
+    assert isinstance(errors['report'], TaskFailed)
+    assert 'clean' in str(errors['report'])
+    assert 'report' not in log